@@ -5,62 +5,247 @@ Chainlit frontend for n8n-powered personal assistant.
 import uuid
 import json
 import logging
-import requests
 import time
-import os
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Dict, Any, List, Optional, AsyncIterator
 import chainlit as cl
 import asyncio
 
 # Import configuration
 import config
+import logging_setup
 
 # Import status webhook integration
 import status_webhook_integration
 
+# Import response rendering
+import response_renderer
+
+# Import status update dispatching and metrics
+import status_dispatcher
+import metrics
+
+# Import tracing, traffic capture and profiling
+import tracing
+import traffic_capture
+import profiling
+import loop_monitor
+import health
+
+# Import per-session state and its store
+from session_state import SessionState, SESSION_KEY
+import session_store
+
+# Import cross-worker status routing and the out-of-process ingest channel
+import status_bus
+import status_scheduler
+import ingest_channel
+
 # Import status updates
-from status_updates import (
-    web_search_status,
-    email_status,
-    calendar_status,
-    file_system_status,
-    database_status,
-    api_status,
-    progress_status,
-    success_status,
-    warning_status,
-    error_status,
-    info_status,
-    important_alert,
-    notification_alert,
-    system_alert,
-    animated_progress,
-    StyledTaskList,
-    show_toast
-)
+from status_updates import agent_trace
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[
-        logging.FileHandler("chainlit_app.log"),
-        logging.StreamHandler()
-    ]
+# Configure logging (queued, rotated); the only place logging is configured
+logging_setup.setup_logging(
+    level=config.LOG_LEVEL,
+    log_file=config.LOG_FILE or None,
+    max_bytes=int(config.LOG_MAX_MB * 1024 * 1024),
+    backup_count=config.LOG_BACKUP_COUNT,
+    when=config.LOG_ROTATE_WHEN,
+    module_levels=logging_setup.parse_levels(config.LOG_LEVELS)
 )
 logger = logging.getLogger(__name__)
 
-# Stop any existing webhook server
-status_webhook_integration.stop_webhook_server()
-logger.info("Stopped any existing webhook server")
+# Export per-turn trace spans to a local file
+tracing.configure(
+    config.TRACE_FILE if config.TRACING_ENABLED else None,
+    max_bytes=int(config.TRACE_MAX_MB * 1024 * 1024),
+    backup_count=config.TRACE_BACKUP_COUNT
+)
 
-# Start the webhook server - ONLY ONCE at application startup
-webhook_server_thread = status_webhook_integration.start_webhook_server(port=5679)
-if webhook_server_thread:
-    logger.info("Started status webhook server on port 5679")
-else:
-    logger.error("Failed to start webhook server. Notifications may not work correctly.")
+# Record real traffic for offline replay when a capture directory is configured
+traffic_capture.configure(
+    config.TRAFFIC_CAPTURE_DIR or None,
+    max_bytes=int(config.TRAFFIC_CAPTURE_MAX_MB * 1024 * 1024),
+    max_files=config.TRAFFIC_CAPTURE_MAX_FILES
+)
+
+# Sampling profiler for slow turns; off unless enabled here or with /profile
+profiling.configure(
+    config.PROFILING_DIR,
+    enabled=config.PROFILING_ENABLED,
+    interval=config.PROFILING_INTERVAL_MS / 1000,
+    output_format=config.PROFILING_FORMAT,
+    max_turns_per_minute=config.PROFILING_MAX_TURNS_PER_MINUTE
+)
+
+# Event loop lag and blocking call monitoring (Chainlit and webhook server loops)
+loop_monitor.configure(
+    enabled=config.LOOP_MONITOR_ENABLED,
+    threshold=config.LOOP_BLOCK_THRESHOLD_MS / 1000,
+    reports_per_minute=config.LOOP_BLOCK_REPORTS_PER_MINUTE
+)
+
+# Circuit breaker and readiness thresholds for /livez and /readyz
+health.configure(
+    failure_threshold=config.N8N_CIRCUIT_FAILURES,
+    reset_timeout=config.N8N_CIRCUIT_RESET,
+    max_queue_depth=config.READY_MAX_QUEUE_DEPTH,
+    max_loop_lag=config.READY_MAX_LOOP_LAG_MS / 1000,
+    max_loop_stall=config.LIVE_MAX_LOOP_STALL
+)
+
+def start_services():
+    """Start the session store, the status webhook server, the background n8n probe and the status bus connection."""
+    # Persist session state (modes, profile, custom widgets) across reconnects and restarts
+    session_store.configure(
+        config.SESSION_STORE or None,
+        path=config.SESSION_STORE_PATH,
+        max_age=config.SESSION_STORE_MAX_AGE_DAYS * 86400,
+        max_entries=config.SESSION_CACHE_SIZE,
+        idle_timeout=config.SESSION_IDLE_TIMEOUT
+    )
+    
+    status_webhook_integration.configure_idempotency(config.IDEMPOTENCY_WINDOW, config.IDEMPOTENCY_MAX_KEYS)
+    webhook_server_thread = status_webhook_integration.start_webhook_server(
+        host=config.STATUS_WEBHOOK_HOST,
+        port=config.STATUS_WEBHOOK_PORT
+    )
+    if webhook_server_thread:
+        logger.info(f"Started status webhook server on port {config.STATUS_WEBHOOK_PORT}")
+    else:
+        logger.error("Failed to start webhook server. Notifications may not work correctly.")
+    
+    # Probe n8n in the background so readiness never waits on it
+    health.start_n8n_probe(config.N8N_WEBHOOK_URL, config.N8N_PROBE_INTERVAL, config.N8N_PROBE_TIMEOUT)
+    
+    # With several workers, exchange status updates for sessions owned by other workers
+    status_bus.configure(
+        config.STATUS_BUS or None,
+        config.STATUS_BUS_URL,
+        config.WORKER_ID,
+        on_update=status_webhook_integration.enqueue_status_update,
+        on_broadcast=status_webhook_integration.receive_broadcast,
+        sessions=lambda: list(status_webhook_integration.SESSIONS) + status_dispatcher.PENDING.sessions(),
+        owner_ttl=config.SESSION_OWNER_TTL
+    )
+    
+    # Hold updates posted with deliver_at or every until they are due
+    status_scheduler.configure(
+        status_webhook_integration.route_status_update,
+        tick=config.SCHEDULER_TICK_MS / 1000,
+        max_pending=config.SCHEDULER_MAX_PENDING,
+        min_interval=config.SCHEDULER_MIN_INTERVAL
+    )
+    
+    # Take status updates from scripts/status_webhook_server.py --forward when configured
+    ingest_channel.start_consumer(
+        config.STATUS_INGEST or None,
+        config.STATUS_INGEST_ADDRESS or None,
+        status_webhook_integration.ingest_update,
+        ring_size=int(config.STATUS_INGEST_RING_MB * 1024 * 1024),
+        scheduler_full=status_scheduler.is_full,
+        # Workers on one host must not replace each other's ring or socket
+        worker_id=config.WORKER_ID if config.STATUS_BUS else None
+    )
+
+def stop_services():
+    """Stop what start_services() started."""
+    ingest_channel.stop_consumer()
+    status_scheduler.close()
+    status_bus.close()
+    status_webhook_integration.stop_webhook_server()
+    if health.N8N_PROBE is not None:
+        health.N8N_PROBE.stop()
+    session_store.close()
+
+# Start the services with the Chainlit server rather than at import time
+# (the app lifecycle hooks need chainlit 2.4.400 or later)
+@cl.on_app_startup
+async def on_app_startup():
+    await asyncio.to_thread(start_services)
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    await asyncio.to_thread(stop_services)
+
+def new_session_state() -> SessionState:
+    """Create the state of the current session and route status updates for it here."""
+    state = SessionState(
+        str(uuid.uuid4()),
+        chat_profile=cl.user_session.get("chat_profile"),
+        thread_id=cl.context.session.thread_id
+    )
+    cl.user_session.set(SESSION_KEY, state)
+    session_store.touch(state)
+    print(f"Created new session ID: {state.session_id}")
+    logger.info(f"Created new session ID: {state.session_id}")
+
+    # Route status webhook updates for this session ID to this chat
+    status_dispatcher.register_current_session(state.session_id)
+    return state
+
+def get_session_state() -> SessionState:
+    """The state of the current session (created if on_chat_start did not run)."""
+    state = cl.user_session.get(SESSION_KEY)
+    return state if state is not None else new_session_state()
+
+def build_chat_settings(state: SessionState) -> List[Any]:
+    """The chat settings widgets: the built-in mode switches and the custom toggles, with their current values."""
+    widgets = [
+        cl.input_widget.Switch(
+            id="reasoning_mode",
+            label="🧠 Reasoning Mode",
+            initial=state.reasoning_mode,
+            tooltip="Enable detailed reasoning in responses",
+            description="When enabled, the AI will show its reasoning process"
+        ),
+        cl.input_widget.Switch(
+            id="privacy_mode",
+            label="🛡️ Privacy Mode",
+            initial=state.privacy_mode,
+            tooltip="Enable enhanced privacy for sensitive conversations",
+            description="When enabled, your conversation won't be stored for training"
+        ),
+        cl.input_widget.Switch(
+            id="deep_research_mode",
+            label="🔍 Deep Research Mode",
+            initial=state.deep_research_mode,
+            tooltip="Enable more thorough research for complex questions",
+            description="When enabled, the AI will perform deeper research on your questions"
+        ),
+        cl.input_widget.Switch(
+            id="web_search_mode",
+            label="🌐 Web Search Mode",
+            initial=state.web_search_mode,
+            tooltip="Enable web search for up-to-date information",
+            description="When enabled, the AI will search the web for information"
+        )
+    ]
+    for widget_id, widget_info in state.custom_widgets.items():
+        if widget_info.get("type") == "toggle":
+            widgets.append(
+                cl.input_widget.Switch(
+                    id=widget_id,
+                    label=f"{widget_info.get('icon', '')} {widget_info['label']}".strip(),
+                    initial=state.get_toggle(widget_id),
+                    description=widget_info.get("description")
+                )
+            )
+    return widgets
+
+# Name of the action behind every custom toggle button; the payload carries the widget ID
+TOGGLE_ACTION = "custom_toggle"
+
+def toggle_action(state: SessionState, widget_id: str) -> cl.Action:
+    """A button that flips a custom toggle, labeled with its current value."""
+    widget_info = state.custom_widgets[widget_id]
+    display_label = f"{widget_info.get('icon', '')} {widget_info['label']}".strip()
+    return cl.Action(
+        name=TOGGLE_ACTION,
+        label=f"{display_label}: {'ON' if state.get_toggle(widget_id) else 'OFF'}",
+        description=f"Toggle {widget_info['label']} on/off",
+        payload={"widget_id": widget_id}
+    )
 
 @cl.set_chat_profiles
 def chat_profiles():
@@ -157,51 +342,19 @@ async def on_chat_start():
     It initializes the session with a unique ID and sets up the chat interface.
     """
     try:
-        # Generate a unique session ID
-        session_id = str(uuid.uuid4())
-        cl.user_session.set("session_id", session_id)
-        print(f"Created new session ID: {session_id}")
-        logger.info(f"Created new session ID: {session_id}")
+        # One state object holds everything this session needs per message
+        state = new_session_state()
+        session_id = state.session_id
+        
+        # Watch the Chainlit event loop for lag and blocking calls
+        loop_monitor.ensure_monitor("chainlit")
         
         # Set up the chat settings with input widgets for all modes
-        settings = await cl.ChatSettings(
-            [
-                cl.input_widget.Switch(
-                    id="reasoning_mode",
-                    label="🧠 Reasoning Mode",
-                    initial=False,
-                    tooltip="Enable detailed reasoning in responses",
-                    description="When enabled, the AI will show its reasoning process"
-                ),
-                cl.input_widget.Switch(
-                    id="privacy_mode",
-                    label="🛡️ Privacy Mode",
-                    initial=False,
-                    tooltip="Enable enhanced privacy for sensitive conversations",
-                    description="When enabled, your conversation won't be stored for training"
-                ),
-                cl.input_widget.Switch(
-                    id="deep_research_mode",
-                    label="🔍 Deep Research Mode",
-                    initial=False,
-                    tooltip="Enable more thorough research for complex questions",
-                    description="When enabled, the AI will perform deeper research on your questions"
-                ),
-                cl.input_widget.Switch(
-                    id="web_search_mode",
-                    label="🌐 Web Search Mode",
-                    initial=False,
-                    tooltip="Enable web search for up-to-date information",
-                    description="When enabled, the AI will search the web for information"
-                )
-            ]
-        ).send()
+        settings = await cl.ChatSettings(build_chat_settings(state)).send()
         
-        # Store the initial settings in the session
-        cl.user_session.set("reasoning_mode", settings.get("reasoning_mode", False))
-        cl.user_session.set("privacy_mode", settings.get("privacy_mode", False))
-        cl.user_session.set("deep_research_mode", settings.get("deep_research_mode", False))
-        cl.user_session.set("web_search_mode", settings.get("web_search_mode", False))
+        # Store the initial settings in the session state
+        state.update_modes(settings)
+        session_store.touch(state)
         
         # Create a welcome message
         welcome_message = f"""
@@ -235,11 +388,13 @@ async def on_settings_update(settings):
         settings: The updated settings
     """
     try:
-        # Update the session with the new settings
-        cl.user_session.set("reasoning_mode", settings.get("reasoning_mode", False))
-        cl.user_session.set("privacy_mode", settings.get("privacy_mode", False))
-        cl.user_session.set("deep_research_mode", settings.get("deep_research_mode", False))
-        cl.user_session.set("web_search_mode", settings.get("web_search_mode", False))
+        # Patch the session state (and its payload template) with the new settings
+        state = get_session_state()
+        state.update_modes(settings)
+        for widget_id in state.toggles:
+            if widget_id in settings:
+                state.set_toggle(widget_id, settings[widget_id])
+        session_store.touch(state)
         
         # Log the updated settings
         print(f"Settings updated: {settings}")
@@ -261,16 +416,14 @@ async def on_message(message: cl.Message):
     Args:
         message: The incoming message from the user
     """
+    turn_span = None
+    profile_handle = None
     try:
         print(f"Received message: {message.content}")
         
-        # Get the session ID
-        session_id = cl.user_session.get("session_id")
-        if not session_id:
-            session_id = str(uuid.uuid4())
-            cl.user_session.set("session_id", session_id)
-            print(f"Created new session ID: {session_id}")
-            logger.info(f"Created new session ID: {session_id}")
+        # Get the session state (and ID)
+        state = get_session_state()
+        session_id = state.session_id
         
         # Check if the message is a command to add a custom button or toggle
         if message.content.startswith("/add_button") or message.content.startswith("/add_toggle"):
@@ -287,8 +440,13 @@ async def on_message(message: cl.Message):
             await show_widgets_help()
             return
         
-        # Get the current chat profile from the user session
-        current_profile_name = cl.user_session.get("chat_profile")
+        # Check if the message is a profiling command
+        if message.content.strip().startswith("/profile"):
+            await handle_profile_command(message.content)
+            return
+        
+        # Get the current chat profile from the session state
+        current_profile_name = state.chat_profile
         print(f"Current chat profile from session: {current_profile_name}")
         logger.info(f"Current chat profile from session: {current_profile_name}")
         
@@ -308,9 +466,9 @@ async def on_message(message: cl.Message):
                 print(f"No matching profile found for name: {current_profile_name}")
                 logger.warning(f"No matching profile found for name: {current_profile_name}")
         
-        # Get the provider and model from the user session
-        provider = cl.user_session.get("provider")
-        model_id = cl.user_session.get("model")
+        # Get the provider and model from the session state
+        provider = state.provider
+        model_id = state.model
         
         # If we have a selected profile, update the provider and model
         if selected_profile and hasattr(selected_profile, 'on_select') and callable(selected_profile.on_select):
@@ -324,8 +482,7 @@ async def on_message(message: cl.Message):
                 logger.info(f"Profile on_select returned: {profile_settings}")
                 
                 # Update the session with the new provider and model
-                cl.user_session.set("provider", provider)
-                cl.user_session.set("model", model_id)
+                state.set_model(provider, model_id)
                 print(f"Updated provider to {provider} and model to {model_id}")
                 logger.info(f"Updated provider to {provider} and model to {model_id}")
         
@@ -358,7 +515,7 @@ async def on_message(message: cl.Message):
                     return
                 
                 # Update the session with the new profile
-                cl.user_session.set("chat_profile", matching_profile.name)
+                state.set_profile(matching_profile.name)
                 
                 # Get the provider and model from the profile
                 if hasattr(matching_profile, 'on_select') and callable(matching_profile.on_select):
@@ -368,8 +525,8 @@ async def on_message(message: cl.Message):
                         model_id = profile_settings.get("model_id", model_id)
                         
                         # Update the session with the new provider and model
-                        cl.user_session.set("provider", provider)
-                        cl.user_session.set("model", model_id)
+                        state.set_model(provider, model_id)
+                session_store.touch(state)
                 
                 await cl.Message(
                     content=f"Switched to model: {matching_profile.name}",
@@ -391,144 +548,101 @@ async def on_message(message: cl.Message):
             model_id = config.DEFAULT_MODEL
             
             # Update the session with the defaults
-            cl.user_session.set("provider", provider)
-            cl.user_session.set("model", model_id)
-        
-        # Prepare the request payload for n8n
-        payload = {
-            "chatInput": message.content,
-            "sessionID": session_id,
-            "provider": provider,
-            "model": model_id,  # This is the model ID that n8n expects
-            "temperature": 0.7,
-            "max_tokens": 2048,
-            "reasoning_mode": cl.user_session.get("reasoning_mode", False),
-            "privacy_mode": cl.user_session.get("privacy_mode", False),
-            "deep_research_mode": cl.user_session.get("deep_research_mode", False),
-            "web_search_mode": cl.user_session.get("web_search_mode", False)
-        }
-        
-        # Add any custom toggles to the payload
-        custom_widgets = cl.user_session.get("custom_widgets", {})
-        for widget_id, widget_info in custom_widgets.items():
-            if widget_info.get("type") == "toggle":
-                # Add the toggle value to the payload
-                payload[widget_id] = cl.user_session.get(widget_id, False)
+            state.set_model(provider, model_id)
+        
+        # Record the activity (and save the state if the model changed)
+        session_store.touch(state)
+        
+        # Start the trace for this turn; n8n echoes the trace ID on /status calls
+        turn_span = tracing.start_trace("turn", session_id=session_id, provider=provider, model=model_id)
+        
+        # Sample this turn when profiling is on; the profile is named after the trace
+        profile_handle = profiling.start(turn_span.trace_id)
+        
+        # Prepare the request payload for n8n from the cached template (modes, model and custom toggles)
+        with tracing.span("payload.build"):
+            payload = state.build_payload(message.content, turn_span.trace_id)
         
         # Log the payload for verification
         logger.info(f"Sending payload to n8n: {json.dumps(payload, indent=2)}")
         print(f"Current session settings - provider: {provider}, model: {model_id}")
         logger.info(f"Current session settings - provider: {provider}, model: {model_id}")
         
-        # Create a simple "thinking" message instead of a task list
+        # Send a "thinking" placeholder; it becomes the response container
         thinking_msg = cl.Message(content="Thinking...", author="Assistant")
         await thinking_msg.send()
+        sends = 1
         
         # Measure response time
         start_time = time.time()
         
         # Make the API call to n8n
         try:
-            # Make the request to n8n
-            response = make_n8n_request(payload)
+            if config.N8N_STREAMING:
+                # Stream the answer straight into the placeholder
+                with tracing.span("n8n.call", provider=provider, model=model_id, streaming=True):
+                    sends += await response_renderer.stream_into_placeholder(
+                        thinking_msg,
+                        stream_n8n_request(payload)
+                    )
+                logger.info(f"n8n response streamed in {time.time() - start_time:.2f} seconds")
+                logger.info(f"Turn rendered with {sends} websocket sends")
+                return
+            
+            # Make the request to n8n in a worker thread so the event loop keeps serving other sessions
+            with tracing.span("n8n.call", provider=provider, model=model_id):
+                response = await asyncio.to_thread(make_n8n_request, payload)
             
             # Calculate and log response time
             end_time = time.time()
             response_time = end_time - start_time
             logger.info(f"n8n response received in {response_time:.2f} seconds")
             
-            # Remove the thinking message
-            await thinking_msg.remove()
-            
             # Process the response
-            if response:
-                # Check for agent actions in the response
-                if isinstance(response, dict) and "actions" in response:
-                    actions = response["actions"]
-                    for action in actions:
-                        action_type = action.get("type", "").lower()
-                        action_status = action.get("status", "").lower()
-                        action_message = action.get("message", "")
-                        
-                        # Show appropriate status update based on action type
-                        if action_type == "web_search":
-                            await web_search_status("Web Search", action_message)
-                        elif action_type == "email":
-                            await email_status("Email Action", action_message)
-                        elif action_type == "calendar":
-                            await calendar_status("Calendar Action", action_message)
-                        elif action_type == "file_system":
-                            await file_system_status("File System Action", action_message)
-                        elif action_type == "database":
-                            await database_status("Database Action", action_message)
-                        elif action_type == "api":
-                            await api_status("API Action", action_message)
-                        
-                        # Show appropriate status update based on action status
-                        if action_status == "success":
-                            await success_status(f"{action_type.title()} Success", action_message)
-                        elif action_status == "warning":
-                            await warning_status(f"{action_type.title()} Warning", action_message)
-                        elif action_status == "error":
-                            await error_status(f"{action_type.title()} Error", action_message)
-                        elif action_status == "info":
-                            await info_status(f"{action_type.title()} Info", action_message)
-                
-                # Process the main response
-                if isinstance(response, list) and len(response) > 0:
-                    for item in response:
-                        if isinstance(item, dict):
-                            # Extract the output text
-                            output = item.get("output", "")
-                            
-                            # Extract any elements (images, files, etc.)
-                            elements = item.get("elements", [])
-                            
-                            # Create a message with the output and elements
-                            if output or elements:
-                                await cl.Message(
-                                    content=output,
-                                    elements=elements,
-                                    author="Assistant"
-                                ).send()
-                        else:
-                            # If the item is not a dict, just send it as a string
-                            await cl.Message(content=str(item), author="Assistant").send()
-                elif isinstance(response, dict):
-                    # Extract the output text
-                    output = response.get("output", "")
-                    
-                    # Extract any elements (images, files, etc.)
-                    elements = response.get("elements", [])
+            with tracing.span("response.render"):
+                if response:
+                    # Build the agent trace (if any) as one element for the answer
+                    trace_element = None
+                    if isinstance(response, dict) and response.get("actions"):
+                        trace_element = agent_trace(
+                            response["actions"],
+                            expandable=config.AGENT_TRACE_EXPANDABLE
+                        )
                     
-                    # Create a message with the output and elements
-                    if output or elements:
-                        await cl.Message(
-                            content=output,
-                            elements=elements,
-                            author="Assistant"
-                        ).send()
+                    # Process the main response
+                    if isinstance(response, list) and len(response) > 0:
+                        # Prepare items concurrently; the first one fills the placeholder
+                        sends += await response_renderer.render_items(
+                            response,
+                            concurrency=config.RESPONSE_RENDER_CONCURRENCY,
+                            placeholder=thinking_msg
+                        )
+                    elif isinstance(response, dict):
+                        # Attach the agent trace next to the answer
+                        sends += await response_renderer.fill_placeholder(
+                            thinking_msg,
+                            response,
+                            extra_elements=[trace_element] if trace_element else None
+                        )
+                    else:
+                        # If the response is not a list or dict, just show it as a string
+                        sends += await response_renderer.set_placeholder_content(thinking_msg, str(response))
                 else:
-                    # If the response is not a list or dict, just send it as a string
-                    await cl.Message(content=str(response), author="Assistant").send()
-            else:
-                # Handle empty response
-                await cl.Message(
-                    content="I'm sorry, I didn't receive a response from the backend. Please try again.",
-                    author="System"
-                ).send()
+                    # Handle empty response
+                    sends += await response_renderer.set_placeholder_content(
+                        thinking_msg,
+                        "I'm sorry, I didn't receive a response from the backend. Please try again."
+                    )
+            
+            logger.info(f"Turn rendered with {sends} websocket sends")
         except Exception as e:
             logger.error(f"Error making n8n request: {str(e)}", exc_info=True)
             
-            # Remove the thinking message
-            await thinking_msg.remove()
-            
-            # Send an error message
-            await cl.Message(
-                content=f"I'm sorry, there was an error processing your request: {str(e)}",
-                author="System",
-                type="error"
-            ).send()
+            # Replace the thinking message with a System error message
+            await response_renderer.replace_with_error(
+                thinking_msg,
+                f"I'm sorry, there was an error processing your request: {str(e)}"
+            )
     except Exception as e:
         logger.error(f"Error in on_message: {str(e)}", exc_info=True)
         
@@ -538,6 +652,9 @@ async def on_message(message: cl.Message):
             author="System",
             type="error"
         ).send()
+    finally:
+        profiling.stop(profile_handle)
+        tracing.end_trace(turn_span)
 
 def make_n8n_request(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
@@ -549,6 +666,14 @@ def make_n8n_request(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
     Returns:
         The parsed response from n8n
     """
+    # Imported on first use to keep application startup fast
+    import requests
+    
+    # Fail fast while n8n is known to be down
+    if not health.N8N_BREAKER.allow():
+        metrics.N8N_REQUEST_ERRORS.labels(payload.get("provider"), payload.get("model"), "circuit_open").inc()
+        raise RuntimeError("n8n is currently unavailable, please try again in a moment")
+    
     try:
         # Log the original payload for debugging
         print(f"Original payload to n8n: {json.dumps(payload, indent=2)}")
@@ -576,31 +701,176 @@ def make_n8n_request(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
         logger.info(f"Full payload being sent to n8n: {json.dumps(payload, indent=2)}")
         
         # Make the POST request to the n8n webhook
-        response = requests.post(
-            config.N8N_WEBHOOK_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=config.REQUEST_TIMEOUT
-        )
-        
-        # Check if the request was successful
+        request_start = time.monotonic()
+        try:
+            response = requests.post(
+                config.N8N_WEBHOOK_URL,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=config.REQUEST_TIMEOUT
+            )
+        finally:
+            metrics.N8N_REQUEST_LATENCY.labels(provider, model).observe(time.monotonic() - request_start)
+        
+        # Check if the request was successful; only server-side failures count against the circuit
+        if response.status_code >= 500:
+            health.N8N_BREAKER.record_failure()
+        else:
+            health.N8N_BREAKER.record_success()
         response.raise_for_status()
         
         # Parse the response
         try:
-            response_data = response.json()
+            with tracing.span("n8n.parse"):
+                response_data = response.json()
+            traffic_capture.record_n8n(payload, response_data, response.status_code, time.monotonic() - request_start)
             logger.info(f"Received response from n8n: {json.dumps(response_data, indent=2)}")
             return response_data
         except json.JSONDecodeError:
             logger.error(f"Failed to parse response as JSON: {response.text}")
+            metrics.N8N_REQUEST_ERRORS.labels(provider, model, "invalid_json").inc()
             raise ValueError(f"Invalid JSON response from n8n: {response.text}")
     except requests.exceptions.RequestException as e:
         logger.error(f"Request to n8n failed: {str(e)}")
+        status_code = e.response.status_code if e.response is not None else None
+        traffic_capture.record_n8n(payload, None, status_code, time.monotonic() - request_start)
+        metrics.N8N_REQUEST_ERRORS.labels(payload.get("provider"), payload.get("model"), _request_error_kind(e)).inc()
+        if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            health.N8N_BREAKER.record_failure()
         raise RuntimeError(f"Failed to communicate with n8n: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error in make_n8n_request: {str(e)}")
         raise RuntimeError(f"Unexpected error: {str(e)}")
 
+def _request_error_kind(error: Exception) -> str:
+    """Classify a requests exception for the n8n error counter."""
+    import requests
+    
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(error, requests.exceptions.HTTPError):
+        return "http"
+    return "request"
+
+async def stream_n8n_request(payload: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Stream a response from the n8n webhook.
+    
+    n8n streams newline-delimited JSON chunks ({"type": "begin" | "item" | "end" | "error", ...}).
+    The blocking HTTP read runs in a worker thread and hands chunks to the event loop.
+    
+    Args:
+        payload: The payload to send to n8n
+        
+    Yields:
+        The text content of each "item" chunk
+    """
+    provider = payload.get("provider")
+    model = payload.get("model")
+    
+    # Fail fast while n8n is known to be down
+    if not health.N8N_BREAKER.allow():
+        metrics.N8N_REQUEST_ERRORS.labels(provider, model, "circuit_open").inc()
+        raise RuntimeError("n8n is currently unavailable, please try again in a moment")
+    
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    
+    def read_stream():
+        import requests
+        
+        request_start = time.monotonic()
+        captured = [] if traffic_capture.enabled() else None
+        status_code = None
+        try:
+            with requests.post(
+                config.N8N_WEBHOOK_URL,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=config.REQUEST_TIMEOUT,
+                stream=True
+            ) as response:
+                status_code = response.status_code
+                # Only server-side failures count against the circuit
+                if status_code >= 500:
+                    health.N8N_BREAKER.record_failure()
+                else:
+                    health.N8N_BREAKER.record_success()
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        if captured is not None:
+                            captured.append(chunk)
+                        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+        except requests.exceptions.RequestException as e:
+            metrics.N8N_REQUEST_ERRORS.labels(provider, model, _request_error_kind(e)).inc()
+            if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+                health.N8N_BREAKER.record_failure()
+            loop.call_soon_threadsafe(chunks.put_nowait, e)
+        except json.JSONDecodeError as e:
+            metrics.N8N_REQUEST_ERRORS.labels(provider, model, "invalid_json").inc()
+            loop.call_soon_threadsafe(chunks.put_nowait, e)
+        except Exception as e:
+            loop.call_soon_threadsafe(chunks.put_nowait, e)
+        finally:
+            metrics.N8N_REQUEST_LATENCY.labels(provider, model).observe(time.monotonic() - request_start)
+            loop.call_soon_threadsafe(chunks.put_nowait, None)
+            if captured is not None:
+                traffic_capture.record_n8n(payload, captured, status_code, time.monotonic() - request_start, streamed=True)
+    
+    threading.Thread(target=read_stream, daemon=True).start()
+    
+    while True:
+        chunk = await chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            logger.error(f"Streaming request to n8n failed: {str(chunk)}")
+            raise RuntimeError(f"Failed to communicate with n8n: {str(chunk)}")
+        if chunk.get("type") == "error":
+            metrics.N8N_REQUEST_ERRORS.labels(provider, model, "n8n_error").inc()
+            raise RuntimeError(f"n8n reported an error: {chunk.get('content', '')}")
+        if chunk.get("type") == "item" and chunk.get("content"):
+            yield chunk["content"]
+
+@cl.on_chat_resume
+async def on_chat_resume(thread):
+    """
+    Restore the session state of a resumed thread.
+
+    This function is called when a user returns to an existing thread, after a
+    reconnect or a restart. The state is loaded from the session store only now.
+
+    Args:
+        thread: The resumed thread
+    """
+    try:
+        state = await asyncio.to_thread(session_store.load, thread["id"])
+        if state is None:
+            state = new_session_state()
+        else:
+            cl.user_session.set(SESSION_KEY, state)
+            session_store.touch(state)
+            logger.info(f"Restored session ID {state.session_id} for thread {thread['id']}")
+
+            # Show the status updates that arrived while the user was away, then route new ones here
+            flushed = await status_dispatcher.resume_session(state.session_id)
+            if flushed:
+                logger.info(f"Delivered {flushed} pending status updates to session {state.session_id}")
+
+        loop_monitor.ensure_monitor("chainlit")
+
+        # Show the restored modes and custom toggles in the settings panel
+        await cl.ChatSettings(build_chat_settings(state)).send()
+
+    except Exception as e:
+        error_message = f"Error in on_chat_resume: {str(e)}"
+        print(error_message)
+        logger.error(error_message)
+
 @cl.on_chat_end
 async def on_chat_end():
     """
@@ -609,6 +879,12 @@ async def on_chat_end():
     This function is called when a chat session ends.
     It cleans up any resources used by the chat session.
     """
+    # Stop routing status updates to this chat, and save and release its state
+    state = cl.user_session.get(SESSION_KEY)
+    if state is not None:
+        status_dispatcher.unregister_session(state.session_id)
+        session_store.release(state)
+    
     # Log the chat end
     logger.info("Chat session ended")
 
@@ -619,6 +895,43 @@ def auth_callback(username: str, password: str) -> Optional[cl.User]:
         return cl.User(identifier="admin", metadata={"role": "admin"})
     return None
 
+async def handle_profile_command(command):
+    """
+    Handle the /profile command: `/profile on`, `/profile off` or `/profile` for the status.
+    
+    Only admins may switch profiling when authentication is enabled.
+    
+    Args:
+        command: The command string from the user
+    """
+    parts = command.split()
+    action = parts[1].lower() if len(parts) > 1 else "status"
+    
+    if action in ("on", "off"):
+        user = cl.user_session.get("user")
+        role = (user.metadata or {}).get("role") if user else None
+        if config.ENABLE_AUTH and role != "admin":
+            await cl.Message(content="Only admins can switch profiling.", author="System").send()
+            return
+        profiling.set_enabled(action == "on")
+    elif action != "status":
+        await cl.Message(content="Usage: `/profile on`, `/profile off` or `/profile`", author="System").send()
+        return
+    
+    state = profiling.status()
+    if not state["configured"]:
+        await cl.Message(content="Profiling is not configured (set `PROFILING_DIR`).", author="System").send()
+        return
+    
+    await cl.Message(
+        content=(
+            f"Profiling is **{'on' if state['enabled'] else 'off'}**. "
+            f"Profiles ({state['format']}, every {state['interval_ms']:g} ms) are written to `{state['directory']}`; "
+            f"{state['turns_profiled']} turns profiled, {state['turns_skipped']} skipped by the rate limit."
+        ),
+        author="System"
+    ).send()
+
 async def handle_custom_widget_command(command):
     """
     Handle commands to add custom buttons or toggles.
@@ -653,20 +966,20 @@ async def handle_custom_widget_command(command):
                 if len(parts) > 4 and any(ord(c) > 127 for c in parts[4]) and len(parts[4].strip()) <= 2:
                     widget_icon = parts[4].strip()
         
-        # Get existing custom widgets
-        custom_widgets = cl.user_session.get("custom_widgets", {})
+        # Custom widgets live in the session state
+        state = get_session_state()
         
         # Add the new widget
         if cmd_type == "/add_button":
             # Create an Action for a button
             display_label = f"{widget_icon} {widget_label}".strip()
             
-            custom_widgets[widget_id] = {
+            state.add_widget(widget_id, {
                 "type": "button",
                 "label": widget_label,
                 "icon": widget_icon,
                 "description": widget_description
-            }
+            })
             
             # Create and send the button as an Action
             action = cl.Action(
@@ -685,105 +998,28 @@ async def handle_custom_widget_command(command):
             # Create a Switch for a toggle
             display_label = f"{widget_icon} {widget_label}".strip()
             
-            custom_widgets[widget_id] = {
+            # Adding the toggle also adds it (off) to the payload template
+            state.add_widget(widget_id, {
                 "type": "toggle",
                 "label": widget_label,
                 "icon": widget_icon,
                 "description": widget_description
-            }
+            })
             
-            # Get current chat settings
-            current_settings = cl.user_session.get("chat_settings", [])
-            
-            # Add the new toggle to chat settings
-            new_settings = current_settings + [
-                cl.input_widget.Switch(
-                    id=widget_id,
-                    label=display_label,
-                    initial=False,
-                    description=widget_description
-                )
-            ]
-            
-            # Update chat settings
-            settings = await cl.ChatSettings(new_settings).send()
+            # Update chat settings (the built-in modes plus all custom toggles)
+            settings = await cl.ChatSettings(build_chat_settings(state)).send()
             
             # Store the updated value in the session
-            cl.user_session.set(widget_id, settings.get(widget_id, False))
-            
-            # Create an action button for the toggle
-            toggle_action_name = f"toggle_{widget_id}"
-            action = cl.Action(
-                name=toggle_action_name,
-                label=f"{display_label}: OFF",
-                description=f"Toggle {widget_label} on/off",
-                payload={}
-            )
-            
-            # Register a dynamic action callback for this toggle
-            @cl.action_callback(toggle_action_name)
-            async def on_custom_toggle(action):
-                try:
-                    # Toggle the value
-                    current_value = cl.user_session.get(widget_id, False)
-                    new_value = not current_value
-                    cl.user_session.set(widget_id, new_value)
-                    
-                    # Update the settings in the UI
-                    current_settings = cl.user_session.get("chat_settings", [])
-                    new_settings = [
-                        setting for setting in current_settings 
-                        if not (isinstance(setting, cl.input_widget.Switch) and setting.id == widget_id)
-                    ]
-                    
-                    new_settings.append(
-                        cl.input_widget.Switch(
-                            id=widget_id,
-                            label=display_label,
-                            initial=new_value,
-                            description=widget_description
-                        )
-                    )
-                    
-                    await cl.ChatSettings(new_settings).send()
-                    
-                    # Create a new action button with updated state
-                    status = "ON" if new_value else "OFF"
-                    new_action = cl.Action(
-                        name=toggle_action_name,
-                        label=f"{display_label}: {status}",
-                        description=f"Toggle {widget_label} on/off",
-                        payload={}
-                    )
-                    
-                    # Send a message to confirm the change
-                    await cl.Message(
-                        content=f"{display_label} turned **{status}**",
-                        actions=[new_action]
-                    ).send()
-                    
-                except Exception as e:
-                    error_message = f"Error handling custom toggle action: {str(e)}"
-                    print(error_message)
-                    logger.error(error_message)
-                    await cl.Message(content=f"Error toggling {display_label}: {str(e)}").send()
+            state.set_toggle(widget_id, settings.get(widget_id, False))
             
+            # Send the toggle button; all toggles share the TOGGLE_ACTION callback
             await cl.Message(
                 content=f"Toggle '{display_label}' added with ID '{widget_id}'",
-                actions=[action]
+                actions=[toggle_action(state, widget_id)]
             ).send()
-            
-            # Add the toggle action to custom widgets
-            custom_widgets[toggle_action_name] = {
-                "type": "toggle_action",
-                "toggle_id": widget_id,
-                "label": widget_label,
-                "icon": widget_icon,
-                "description": widget_description
-            }
         
-        # Store the updated custom widgets
-        cl.user_session.set("custom_widgets", custom_widgets)
+        # Save the new widgets with the session state
+        session_store.touch(state)
         
     except Exception as e:
         error_message = f"Error handling custom widget command: {str(e)}"
@@ -791,50 +1027,47 @@ async def handle_custom_widget_command(command):
         logger.error(error_message)
         await cl.Message(content=f"Error adding custom widget: {str(e)}").send()
 
-@cl.action_callback
-async def on_action(action):
+@cl.action_callback(TOGGLE_ACTION)
+async def on_toggle_action(action):
     """
-    Handle custom action callbacks.
+    Handle clicks on custom toggle buttons.
     
-    This function is called when the user clicks a custom action button.
-    It processes the action and performs the corresponding operation.
+    One callback serves every custom toggle of every session: the toggle is
+    looked up by the widget ID in the action payload, in the session's own
+    widget table.
     
     Args:
         action: The action object containing information about the button click
     """
     try:
-        # Get the action name and payload
-        action_name = action.name
-        payload = action.payload
+        widget_id = action.payload.get("widget_id")
+        state = get_session_state()
+        widget_info = state.custom_widgets.get(widget_id)
         
-        print(f"Received action: {action_name} with payload: {payload}")
-        logger.info(f"Received action: {action_name} with payload: {payload}")
+        if not widget_info or widget_info.get("type") != "toggle":
+            logger.warning(f"Toggle action for unknown widget: {widget_id}")
+            await cl.Message(content=f"Unknown toggle: {widget_id}", author="System").send()
+            return
         
-        # Handle custom toggle actions
-        if action_name.startswith("custom_toggle_"):
-            widget_id = action_name.replace("custom_toggle_", "")
-            custom_widgets = cl.user_session.get("custom_widgets", {})
-            
-            if widget_id in custom_widgets:
-                # Toggle the value
-                current_value = cl.user_session.get(widget_id, False)
-                new_value = not current_value
-                cl.user_session.set(widget_id, new_value)
-                
-                # Update the UI
-                status = "ON" if new_value else "OFF"
-                widget_info = custom_widgets[widget_id]
-                
-                await cl.Message(
-                    content=f"**{widget_info.get('label', widget_id)}:** {'Enabled' if new_value else 'Disabled'}",
-                    author="System"
-                ).send()
-                
-                print(f"Toggled custom widget {widget_id} to {new_value}")
-                logger.info(f"Toggled custom widget {widget_id} to {new_value}")
+        # Toggle the value
+        new_value = not state.get_toggle(widget_id)
+        state.set_toggle(widget_id, new_value)
+        session_store.touch(state)
+        
+        # Update the settings in the UI
+        await cl.ChatSettings(build_chat_settings(state)).send()
+        
+        # Send a message with a button showing the new state to confirm the change
+        display_label = f"{widget_info.get('icon', '')} {widget_info['label']}".strip()
+        await cl.Message(
+            content=f"{display_label} turned **{'ON' if new_value else 'OFF'}**",
+            actions=[toggle_action(state, widget_id)]
+        ).send()
+        
+        logger.info(f"Toggled custom widget {widget_id} to {new_value}")
         
     except Exception as e:
-        error_message = f"Error handling action: {str(e)}"
+        error_message = f"Error handling custom toggle action: {str(e)}"
         print(error_message)
         logger.error(error_message)
         await cl.Message(content=f"Error handling action: {str(e)}", author="System").send()
@@ -847,7 +1080,8 @@ async def list_custom_widgets():
     It lists all custom widgets and their current values.
     """
     try:
-        custom_widgets = cl.user_session.get("custom_widgets", {})
+        state = get_session_state()
+        custom_widgets = state.custom_widgets
         
         if not custom_widgets:
             await cl.Message(content="No custom widgets have been added yet.").send()
@@ -862,7 +1096,7 @@ async def list_custom_widgets():
             description = widget_info.get("description", "")
             
             if widget_type == "toggle":
-                value = cl.user_session.get(widget_id, False)
+                value = state.get_toggle(widget_id)
                 status = "ON" if value else "OFF"
                 message += f"- **{label}** ({widget_id}): {status}\n"
                 if description:
@@ -875,15 +1109,10 @@ async def list_custom_widgets():
         # Add information about built-in modes
         message += "\n# Built-in Modes\n\n"
         
-        reasoning_mode = cl.user_session.get("reasoning_mode", False)
-        privacy_mode = cl.user_session.get("privacy_mode", False)
-        deep_research_mode = cl.user_session.get("deep_research_mode", False)
-        web_search_mode = cl.user_session.get("web_search_mode", False)
-        
-        message += f"- **🧠 Reasoning Mode**: {'ON' if reasoning_mode else 'OFF'}\n"
-        message += f"- **🛡️ Privacy Mode**: {'ON' if privacy_mode else 'OFF'}\n"
-        message += f"- **🔍 Deep Research Mode**: {'ON' if deep_research_mode else 'OFF'}\n"
-        message += f"- **🌐 Web Search Mode**: {'ON' if web_search_mode else 'OFF'}\n"
+        message += f"- **🧠 Reasoning Mode**: {'ON' if state.reasoning_mode else 'OFF'}\n"
+        message += f"- **🛡️ Privacy Mode**: {'ON' if state.privacy_mode else 'OFF'}\n"
+        message += f"- **🔍 Deep Research Mode**: {'ON' if state.deep_research_mode else 'OFF'}\n"
+        message += f"- **🌐 Web Search Mode**: {'ON' if state.web_search_mode else 'OFF'}\n"
         
         # Send the message
         await cl.Message(content=message).send()
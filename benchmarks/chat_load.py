@@ -0,0 +1,182 @@
+"""
+Chat path load benchmark.
+
+Drives N simulated Chainlit sessions concurrently through `on_chat_start`,
+`on_message` and `on_chat_end` of app.py against the local mock n8n server,
+and reports throughput, turn latency percentiles, event loop lag and RSS as N
+scales. Results are written as JSON (see bench_utils.write_results) so runs
+can be compared across commits with --baseline.
+
+Sessions are simulated in-process with Chainlit's HTTP context, whose emitter
+discards UI events, so the numbers cover the app's own work per turn (payload,
+n8n round trip, response preparation) rather than browser rendering.
+
+Usage:
+    python benchmarks/chat_load.py --sessions 1,10,50 --turns 5 --profile fast
+    python benchmarks/chat_load.py --sessions 10 --baseline benchmarks/results/chat_load-abc123-....json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BENCHMARK_DIR)
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+
+from bench_utils import LoopLagProbe, rss_bytes, summarize, write_results, load_results
+
+# Keep app logging out of the measurements unless asked for
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from mock_n8n_server import MockN8NServer, PROFILES
+
+
+async def run_session(app, cl, init_http_context, index: int, turns: int, think_time: float, samples: dict) -> None:
+    """Run one simulated chat session."""
+    # Each session task gets its own Chainlit context and user session
+    init_http_context()
+
+    start = time.perf_counter()
+    await app.on_chat_start()
+    samples["chat_start"].append(time.perf_counter() - start)
+
+    for turn in range(turns):
+        message = cl.Message(content=f"Benchmark message {turn} from session {index}", author="User")
+        start = time.perf_counter()
+        await app.on_message(message)
+        samples["turn"].append(time.perf_counter() - start)
+        if think_time:
+            await asyncio.sleep(think_time)
+
+    await app.on_chat_end()
+
+
+async def sample_rss(peak: list, interval: float = 0.25) -> None:
+    while True:
+        peak[0] = max(peak[0], rss_bytes())
+        await asyncio.sleep(interval)
+
+
+async def run_level(app, cl, init_http_context, sessions: int, turns: int, think_time: float, ramp: float) -> dict:
+    """Run one concurrency level and return its measurements."""
+    samples = {"chat_start": [], "turn": []}
+    rss_start = rss_bytes()
+    peak = [rss_start]
+    probe = LoopLagProbe().start()
+    sampler = asyncio.create_task(sample_rss(peak))
+
+    async def delayed(index):
+        if ramp:
+            await asyncio.sleep(ramp * index / sessions)
+        await run_session(app, cl, init_http_context, index, turns, think_time, samples)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[delayed(i) for i in range(sessions)], return_exceptions=True)
+    wall = time.perf_counter() - start
+
+    sampler.cancel()
+    loop_lag = await probe.stop()
+    failures = [r for r in results if isinstance(r, Exception)]
+
+    return {
+        "sessions": sessions,
+        "turns": len(samples["turn"]),
+        "failed_sessions": len(failures),
+        "wall_seconds": wall,
+        "throughput_turns_per_second": len(samples["turn"]) / wall if wall else 0.0,
+        "turn_latency_seconds": summarize(samples["turn"]),
+        "chat_start_latency_seconds": summarize(samples["chat_start"]),
+        "loop_lag_seconds": loop_lag,
+        "rss_bytes": {"start": rss_start, "end": rss_bytes(), "peak": max(peak[0], rss_bytes())}
+    }
+
+
+def print_level(level: dict, baseline: dict = None) -> None:
+    turn = level["turn_latency_seconds"]
+    lag = level["loop_lag_seconds"]
+    line = (f"{level['sessions']:>8} {level['throughput_turns_per_second']:>10.1f} "
+            f"{turn['p50'] * 1000:>9.1f} {turn['p95'] * 1000:>9.1f} {turn['p99'] * 1000:>9.1f} "
+            f"{lag['p99'] * 1000:>10.1f} {level['rss_bytes']['peak'] / 2**20:>9.1f} {level['failed_sessions']:>7}")
+    if baseline:
+        throughput_change = _change(level["throughput_turns_per_second"], baseline["throughput_turns_per_second"])
+        p95_change = _change(turn["p95"], baseline["turn_latency_seconds"]["p95"])
+        line += f"   vs baseline: throughput {throughput_change}, p95 {p95_change}"
+    print(line)
+
+
+def _change(value: float, reference: float) -> str:
+    if not reference:
+        return "n/a"
+    return f"{(value - reference) / reference * 100:+.1f}%"
+
+
+async def main_async(args) -> list:
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    import config
+
+    profile = PROFILES[args.profile]
+    if args.latency_ms is not None:
+        profile.latency_ms = args.latency_ms
+    if args.streaming:
+        profile.streaming = True
+
+    server = MockN8NServer(profile, port=args.n8n_port).start()
+    try:
+        config.N8N_WEBHOOK_URL = server.url
+        config.N8N_STREAMING = args.streaming
+
+        import app
+
+        with open(os.devnull, "w") as devnull:
+            levels = []
+            for sessions in args.sessions:
+                before = dict(server.stats)
+                # The app prints a line per new chat session; keep it off the report
+                with contextlib.redirect_stdout(devnull):
+                    level = await run_level(app, cl, init_http_context, sessions, args.turns, args.think_time, args.ramp)
+                level["mock_n8n"] = {key: value - before[key] for key, value in server.stats.items()}
+                levels.append(level)
+                print_level(level, args.baseline_levels.get(sessions))
+        return levels
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat path with simulated sessions")
+    parser.add_argument("--sessions", default="1,10,50", help="Comma-separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=5, help="Messages sent per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between a session's messages")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Seconds over which sessions are started")
+    parser.add_argument("--profile", default="fast", choices=sorted(PROFILES), help="Mock n8n profile")
+    parser.add_argument("--latency-ms", type=float, help="Override the profile's n8n latency")
+    parser.add_argument("--streaming", action="store_true", help="Use the streaming n8n path")
+    parser.add_argument("--n8n-port", type=int, default=5678, help="Port for the mock n8n server")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    args.sessions = [int(n) for n in args.sessions.split(",") if n.strip()]
+    args.baseline_levels = {}
+    if args.baseline:
+        baseline = load_results(args.baseline)
+        args.baseline_levels = {level["sessions"]: level for level in baseline["results"]}
+        print(f"Comparing against {args.baseline} (commit {baseline.get('commit')})")
+
+    print(f"{'sessions':>8} {'turns/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'lag p99 ms':>10} {'RSS MiB':>9} {'failed':>7}")
+    levels = asyncio.run(main_async(args))
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ("baseline_levels", "output")}
+    path = write_results("chat_load", parameters, levels, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Status ingest transport benchmark.
+
+Compares the in-thread status webhook server with the out-of-process ingestor
+(`scripts/status_webhook_server.py --forward ring|pipe`). For each transport it
+reports how many updates per second reach this ("Chainlit") process and how
+much CPU this process spends per update.
+
+Two levels:
+
+    default   transport only: a child process writes N pre-serialized updates
+              into the ring or pipe; the `thread` baseline is the JSON parsing
+              and validation the in-thread server does for each update
+    --http    end to end: a child process posts N updates over HTTP to the
+              in-thread server (thread) or to the ingestor process (ring, pipe)
+
+Usage:
+    python benchmarks/ingest_transport.py --updates 100000
+    python benchmarks/ingest_transport.py --http --updates 20000 --concurrency 32
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(BENCHMARK_DIR)
+sys.path.append(REPO_DIR)
+
+from bench_utils import write_results
+import ingest_channel
+
+TRANSPORTS = ("thread", "ring", "pipe")
+
+UPDATE = {
+    "type": "progress",
+    "title": "Searching the web",
+    "content": "Found 12 results for the query, ranking them by relevance now",
+    "progress": 42,
+    "target": 100,
+    "sessionID": "3f1c2b9e-1234-4a5b-9c8d-abcdefabcdef",
+    "traceID": "abcdef0123456789"
+}
+
+# Child process writing pre-serialized frames into the channel
+PRODUCER = """
+import sys, time
+sys.path.append({repo!r})
+import ingest_channel
+producer = ingest_channel.IngestProducer({kind!r}, {address!r})
+update = {update!r}
+for i in range({count}):
+    update["progress"] = i
+    while not producer.send(ingest_channel.encode_update(update)):
+        time.sleep(0.0005)
+"""
+
+# Child process posting updates over HTTP
+POSTER = """
+import asyncio, json, httpx
+async def main():
+    update = {update!r}
+    queue = asyncio.Queue()
+    for i in range({count}):
+        queue.put_nowait(i)
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections={concurrency})) as client:
+        async def worker():
+            while not queue.empty():
+                update["progress"] = queue.get_nowait()
+                await client.post({url!r}, content=json.dumps(update))
+        await asyncio.gather(*(worker() for _ in range({concurrency})))
+asyncio.run(main())
+"""
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Counter:
+    """Counts updates and signals when the expected number arrived."""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.count = 0
+        self.done = threading.Event()
+
+    def __call__(self, update=None) -> None:
+        self.count += 1
+        if self.count >= self.expected:
+            self.done.set()
+
+
+def measure(run, counter: Counter, timeout: float):
+    """Run a transport and return updates/s and this process's CPU microseconds per update."""
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    run()
+    if not counter.done.wait(timeout):
+        raise RuntimeError(f"Only {counter.count} of {counter.expected} updates arrived")
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    return {
+        "updates": counter.count,
+        "seconds": elapsed,
+        "updates_per_s": counter.count / elapsed,
+        "cpu_us_per_update": cpu / counter.count * 1e6
+    }
+
+
+def transport_only(kind: str, count: int, timeout: float):
+    counter = Counter(count)
+    if kind == "thread":
+        # What the in-thread server does per update besides HTTP: parse and validate JSON
+        # (a one-type set stands in for STATUS_TYPES; the membership test costs the same)
+        accepted = {UPDATE["type"]}
+        bodies = [json.dumps(dict(UPDATE, progress=i)).encode() for i in range(count)]
+
+        def run():
+            for body in bodies:
+                data = json.loads(body)
+                if isinstance(data, dict) and data.get("type", "info") in accepted:
+                    counter(data)
+        return measure(run, counter, timeout)
+
+    address = f"chainfin-bench-{os.getpid()}" if kind == "ring" else f"/tmp/chainfin-bench-{os.getpid()}.sock"
+    consumer = ingest_channel.IngestConsumer(kind, address, counter)
+    consumer.start()
+    code = PRODUCER.format(repo=REPO_DIR, kind=kind, address=address, update=UPDATE, count=count)
+    try:
+        return measure(lambda: subprocess.Popen([sys.executable, "-c", code]), counter, timeout)
+    finally:
+        consumer.stop()
+
+
+def end_to_end(kind: str, count: int, concurrency: int, timeout: float):
+    import status_webhook_integration
+
+    counter = Counter(count)
+    # Drain the status queue as the dispatcher would, counting arrivals
+    def drain():
+        while status_webhook_integration.get_next_status_update() is not None:
+            counter()
+    status_webhook_integration.set_queue_listener(drain)
+
+    children = []
+    port = free_port()
+    if kind == "thread":
+        status_webhook_integration.start_webhook_server("127.0.0.1", port)
+    else:
+        address = f"chainfin-bench-{os.getpid()}" if kind == "ring" else f"/tmp/chainfin-bench-{os.getpid()}.sock"
+        ingest_channel.start_consumer(kind, address, status_webhook_integration.ingest_update)
+        children.append(subprocess.Popen(
+            [sys.executable, os.path.join(REPO_DIR, "scripts", "status_webhook_server.py"),
+             "--host", "127.0.0.1", "--port", str(port), "--forward", kind, "--address", address],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        # Wait for the ingestor to serve
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+    code = POSTER.format(update=UPDATE, count=count, concurrency=concurrency, url=f"http://127.0.0.1:{port}/status")
+    try:
+        return measure(lambda: children.append(subprocess.Popen([sys.executable, "-c", code])), counter, timeout)
+    finally:
+        for child in children:
+            child.terminate()
+        ingest_channel.stop_consumer()
+        status_webhook_integration.stop_webhook_server()
+        status_webhook_integration.set_queue_listener(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the in-thread status server with the out-of-process ingestor")
+    parser.add_argument("--updates", type=int, default=50000, help="Updates per transport")
+    parser.add_argument("--transports", default=",".join(TRANSPORTS), help="Comma-separated transports to run")
+    parser.add_argument("--http", action="store_true", help="Measure end to end over HTTP")
+    parser.add_argument("--concurrency", type=int, default=32, help="HTTP clients (with --http)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds allowed per transport")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'transport':10} {'updates/s':>12} {'chat CPU us/update':>20}")
+    for kind in args.transports.split(","):
+        if args.http:
+            result = end_to_end(kind, args.updates, args.concurrency, args.timeout)
+        else:
+            result = transport_only(kind, args.updates, args.timeout)
+        results[kind] = result
+        print(f"{kind:10} {result['updates_per_s']:12.0f} {result['cpu_us_per_update']:20.1f}")
+
+    parameters = {"updates": args.updates, "http": args.http, "concurrency": args.concurrency}
+    path = write_results("ingest_transport", parameters, results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
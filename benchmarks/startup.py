@@ -0,0 +1,107 @@
+"""
+Startup time benchmark.
+
+Measures, in a fresh interpreter per run, how long it takes from starting to
+import app.py until the status webhook server accepts its first request:
+
+    import      importing app.py (module-level work)
+    started     import plus the app startup hook (webhook server, n8n probe)
+    first       until the first GET /livez is answered
+
+Usage:
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --baseline benchmarks/results/startup-....json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.append(BENCHMARK_DIR)
+
+from bench_utils import summarize, write_results, load_results
+
+MARKER = "STARTUP_RESULT "
+
+# Runs in the child interpreter
+# Runs in the child interpreter. An app from before the startup hook (for a
+# --baseline run) starts its services on import, on the fixed port 5679, and
+# has no /livez; any HTTP answer counts as the first request.
+CHILD = """
+import json, sys, time, urllib.error, urllib.request
+t0 = time.perf_counter()
+import app
+imported = time.perf_counter() - t0
+port = {port}
+if hasattr(app, "start_services"):
+    # What the Chainlit startup hook runs
+    app.start_services()
+else:
+    port = 5679
+started = time.perf_counter() - t0
+while True:
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{{port}}/livez", timeout=1).read()
+        break
+    except urllib.error.HTTPError:
+        break
+    except Exception:
+        time.sleep(0.002)
+first = time.perf_counter() - t0
+print("{marker}" + json.dumps({{"import": imported, "started": started, "first": first}}), flush=True)
+if hasattr(app, "stop_services"):
+    app.stop_services()
+"""
+
+
+def free_port() -> int:
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_once(timeout: float) -> dict:
+    port = free_port()
+    env = dict(os.environ, STATUS_WEBHOOK_HOST="127.0.0.1", STATUS_WEBHOOK_PORT=str(port), LOG_LEVEL="WARNING")
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD.format(port=port, marker=MARKER)],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(MARKER):
+            return json.loads(line[len(MARKER):])
+    raise RuntimeError(f"Startup run failed:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-to-first-request startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh-interpreter runs")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed per run")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    runs = [run_once(args.timeout) for _ in range(args.runs)]
+    results = {stage: summarize([run[stage] for run in runs]) for stage in ("import", "started", "first")}
+    baseline = load_results(args.baseline)["results"] if args.baseline else None
+
+    print(f"{'stage':10} {'p50 ms':>9} {'min ms':>9} {'max ms':>9}")
+    for stage, summary in results.items():
+        line = f"{stage:10} {summary['p50'] * 1000:9.1f} {min(run[stage] for run in runs) * 1000:9.1f} {summary['max'] * 1000:9.1f}"
+        if baseline:
+            reference = baseline[stage]["p50"]
+            line += f"   vs baseline {(summary['p50'] - reference) / reference * 100:+.1f}%"
+        print(line)
+
+    path = write_results("startup", {"runs": args.runs}, results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Status webhook ingest benchmark.
+
+Replays a traffic profile against the /status webhook at a target rate with
+concurrent async clients, while simulated Chainlit sessions consume the
+updates through the status dispatcher, and reports:
+
+- accepted updates per second and the reject rate
+- status queue depth over time
+- ingest-to-render latency (enqueue on the webhook thread to rendered in the
+  target session)
+
+Profiles:
+    uniform          evenly spaced updates spread over --sessions sessions
+    bursty           bursts of --burst-size updates, same average rate
+    many-sessions    updates spread randomly over 10x --sessions sessions
+    one-hot-session  90% of the updates go to a single session
+
+A schedule is a list of {"offset": seconds, "update": {...}} records; it can
+be saved with --save-schedule and replayed exactly with --schedule. All
+sessions named by the schedule's `sessionID`s are registered before the run.
+
+With --baseline and --threshold the run fails (exit code 1) when throughput,
+reject rate or p95 latency regress by more than the threshold percentage.
+
+Usage:
+    python benchmarks/status_ingest.py --profile uniform --rate 500 --duration 10
+    python benchmarks/status_ingest.py --profile bursty --baseline old.json --threshold 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Any, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BENCHMARK_DIR)
+sys.path.append(os.path.dirname(BENCHMARK_DIR))
+
+from bench_utils import LoopLagProbe, summarize, write_results, load_results
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+PROFILE_NAMES = ["uniform", "bursty", "many-sessions", "one-hot-session"]
+
+# Update types sent by the generated profiles, with relative weights
+UPDATE_MIX = [
+    ("progress", 5),
+    ("info", 2),
+    ("success", 1),
+    ("web-search", 1),
+    ("email", 1),
+    ("warning", 1),
+    ("toast", 1)
+]
+
+
+def make_update(rng: random.Random, session_id: str, index: int) -> Dict[str, Any]:
+    """Build one status update of a weighted random type."""
+    types, weights = zip(*UPDATE_MIX)
+    update_type = rng.choices(types, weights)[0]
+    update = {
+        "type": update_type,
+        "title": f"Benchmark {update_type}",
+        "content": f"Benchmark update {index}",
+        "sessionID": session_id
+    }
+    if update_type == "progress":
+        update["progress"] = index % 101
+    if update_type == "toast":
+        update["toast_type"] = "info"
+    return update
+
+
+def build_schedule(profile: str, rate: float, duration: float, sessions: int,
+                   burst_size: int = 50, reject_fraction: float = 0.0, seed: int = 1) -> List[Dict[str, Any]]:
+    """
+    Generate a traffic schedule.
+
+    Args:
+        profile: One of PROFILE_NAMES
+        rate: Average updates per second
+        duration: Length of the schedule in seconds
+        sessions: Number of target sessions
+        burst_size: Updates per burst for the bursty profile
+        reject_fraction: Fraction of updates with an invalid `every`, which /status rejects with 400
+        seed: Random seed
+
+    Returns:
+        The schedule as a list of {"offset": seconds, "update": {...}}
+    """
+    rng = random.Random(seed)
+    total = int(rate * duration)
+    if profile == "many-sessions":
+        sessions *= 10
+    session_ids = [f"bench-session-{i}" for i in range(max(1, sessions))]
+
+    schedule = []
+    for index in range(total):
+        if profile == "bursty":
+            # All updates of a burst share its start time
+            offset = (index // burst_size) * burst_size / rate
+        else:
+            offset = index / rate
+
+        if profile == "one-hot-session" and rng.random() < 0.9:
+            session_id = session_ids[0]
+        elif profile in ("many-sessions", "one-hot-session"):
+            session_id = rng.choice(session_ids)
+        else:
+            session_id = session_ids[index % len(session_ids)]
+
+        update = make_update(rng, session_id, index)
+        if rng.random() < reject_fraction:
+            # Unknown types are shown as info, so use a schedule that is always refused
+            update["every"] = 0
+        schedule.append({"offset": offset, "update": update})
+    return schedule
+
+
+def save_schedule(schedule: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for record in schedule:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_schedule(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def send_schedule(url: str, schedule: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """
+    Post a schedule to the webhook with `concurrency` async clients.
+
+    Updates are released on time by a pacer (open loop); if the clients fall
+    behind, the lateness is reported instead of silently lowering the rate.
+    """
+    import httpx
+
+    pending: asyncio.Queue = asyncio.Queue()
+    outcome = {"accepted": 0, "rejected": 0, "failed": 0, "lateness": []}
+
+    async def client(http):
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            due, record = item
+            outcome["lateness"].append(max(0.0, time.monotonic() - due))
+            update = dict(record["update"])
+            update["benchSentAt"] = time.monotonic()
+            try:
+                response = await http.post(url, json=update)
+                if response.status_code == 200:
+                    outcome["accepted"] += 1
+                else:
+                    outcome["rejected"] += 1
+            except Exception:
+                outcome["failed"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=10, limits=limits) as http:
+        clients = [asyncio.create_task(client(http)) for _ in range(concurrency)]
+        start = time.monotonic()
+        for record in schedule:
+            due = start + record["offset"]
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.put_nowait((due, record))
+        for _ in clients:
+            pending.put_nowait(None)
+        await asyncio.gather(*clients)
+        outcome["wall_seconds"] = time.monotonic() - start
+    return outcome
+
+
+async def sample_queue_depth(series: List[List[float]], metrics, interval: float) -> None:
+    start = time.monotonic()
+    while True:
+        series.append([round(time.monotonic() - start, 3), metrics.STATUS_QUEUE_DEPTH.value])
+        await asyncio.sleep(interval)
+
+
+async def run_benchmark(schedule: List[Dict[str, Any]], concurrency: int, port: int, drain_timeout: float) -> Dict[str, Any]:
+    """Run one schedule against an in-process webhook server and dispatcher."""
+    from chainlit.context import init_http_context
+
+    import metrics
+    import status_dispatcher
+    import status_webhook_integration
+
+    if status_webhook_integration.start_webhook_server(host="127.0.0.1", port=port) is None:
+        raise RuntimeError(f"Could not start the status webhook server on port {port}")
+
+    # Register every session the schedule addresses
+    session_ids = sorted({record["update"].get("sessionID") for record in schedule} - {None})
+    for session_id in session_ids:
+        status_webhook_integration.register_session(session_id, init_http_context())
+    status_dispatcher.ensure_dispatcher()
+
+    # Time each rendered update from the moment its client sent it
+    render_latencies = []
+    render = status_dispatcher.render_status_update
+
+    async def timed_render(update):
+        await render(update)
+        sent_at = update.get("benchSentAt")
+        if sent_at is not None:
+            render_latencies.append(time.monotonic() - sent_at)
+
+    status_dispatcher.render_status_update = timed_render
+
+    depth_series: List[List[float]] = []
+    sampler = asyncio.create_task(sample_queue_depth(depth_series, metrics, 0.05))
+    probe = LoopLagProbe().start()
+
+    # Clients run on their own loop so they do not compete with the dispatcher
+    outcome: Dict[str, Any] = {}
+    url = f"http://127.0.0.1:{port}/status"
+    sender = threading.Thread(
+        target=lambda: outcome.update(asyncio.run(send_schedule(url, schedule, concurrency))),
+        daemon=True
+    )
+    sender.start()
+    await asyncio.get_running_loop().run_in_executor(None, sender.join)
+
+    # Let the dispatcher drain what is still queued
+    deadline = time.monotonic() + drain_timeout
+    while status_webhook_integration.STATUS_QUEUE and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    drain_seconds = drain_timeout - max(0.0, deadline - time.monotonic())
+
+    sampler.cancel()
+    loop_lag = await probe.stop()
+    status_dispatcher.render_status_update = render
+    for session_id in session_ids:
+        status_webhook_integration.unregister_session(session_id)
+
+    total = len(schedule)
+    wall = outcome["wall_seconds"]
+    return {
+        "updates": total,
+        "sessions": len(session_ids),
+        "accepted": outcome["accepted"],
+        "rejected": outcome["rejected"],
+        "failed": outcome["failed"],
+        "accepted_per_second": outcome["accepted"] / wall if wall else 0.0,
+        "reject_rate": (outcome["rejected"] + outcome["failed"]) / total if total else 0.0,
+        "rendered": len(render_latencies),
+        "ingest_to_render_seconds": summarize(render_latencies),
+        "send_lateness_seconds": summarize(outcome["lateness"]),
+        "queue_depth_max": max((depth for _, depth in depth_series), default=0),
+        "queue_depth_series": depth_series,
+        "drain_seconds": drain_seconds,
+        "loop_lag_seconds": loop_lag,
+        "wall_seconds": wall
+    }
+
+
+def check_regression(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare a run with a baseline run of the same profile.
+
+    Returns:
+        A description of each metric that regressed by more than threshold percent
+    """
+    limit = threshold / 100
+    problems = []
+    if result["accepted_per_second"] < baseline["accepted_per_second"] * (1 - limit):
+        problems.append(f"accepted/s {result['accepted_per_second']:.1f} < baseline {baseline['accepted_per_second']:.1f}")
+    if result["reject_rate"] > baseline["reject_rate"] + limit:
+        problems.append(f"reject rate {result['reject_rate']:.3f} > baseline {baseline['reject_rate']:.3f}")
+    p95 = result["ingest_to_render_seconds"]["p95"]
+    baseline_p95 = baseline["ingest_to_render_seconds"]["p95"]
+    if baseline_p95 and p95 > baseline_p95 * (1 + limit):
+        problems.append(f"p95 ingest-to-render {p95 * 1000:.1f} ms > baseline {baseline_p95 * 1000:.1f} ms")
+    return problems
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /status ingest pipeline")
+    parser.add_argument("--profile", default="uniform", choices=PROFILE_NAMES, help="Traffic profile")
+    parser.add_argument("--rate", type=float, default=200.0, help="Target updates per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of target sessions")
+    parser.add_argument("--burst-size", type=int, default=50, help="Updates per burst (bursty profile)")
+    parser.add_argument("--reject-fraction", type=float, default=0.0, help="Fraction of updates with an invalid 'every' (rejected with 400)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent HTTP clients")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for generated profiles")
+    parser.add_argument("--schedule", help="Replay a saved schedule instead of generating one")
+    parser.add_argument("--save-schedule", help="Save the schedule used for this run")
+    parser.add_argument("--port", type=int, help="Webhook server port (default: a free port)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Seconds to wait for the queue to drain")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    if args.schedule:
+        schedule = load_schedule(args.schedule)
+        name = os.path.basename(args.schedule)
+    else:
+        schedule = build_schedule(args.profile, args.rate, args.duration, args.sessions,
+                                  args.burst_size, args.reject_fraction, args.seed)
+        name = args.profile
+    if args.save_schedule:
+        save_schedule(schedule, args.save_schedule)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = asyncio.run(run_benchmark(schedule, args.concurrency, args.port or free_port(), args.drain_timeout))
+    result["profile"] = name
+
+    latency = result["ingest_to_render_seconds"]
+    print(f"Profile {name}: {result['updates']} updates to {result['sessions']} sessions")
+    print(f"  accepted/s:        {result['accepted_per_second']:.1f}")
+    print(f"  reject rate:       {result['reject_rate']:.3%}")
+    print(f"  rendered:          {result['rendered']}")
+    print(f"  ingest-to-render:  p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, "
+          f"p99 {latency['p99'] * 1000:.1f} ms")
+    print(f"  queue depth max:   {result['queue_depth_max']:.0f}")
+    print(f"  loop lag p99:      {result['loop_lag_seconds']['p99'] * 1000:.1f} ms")
+
+    parameters = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_results("status_ingest", parameters, result, args.output)
+    print(f"Results written to {path}")
+
+    if args.baseline:
+        baseline = load_results(args.baseline)["results"]
+        problems = check_regression(result, baseline, args.threshold)
+        if problems:
+            print(f"❌ Regression against {args.baseline} (threshold {args.threshold}%):")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print(f"✅ No regression against {args.baseline} (threshold {args.threshold}%)")
+
+
+if __name__ == "__main__":
+    main()
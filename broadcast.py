@@ -0,0 +1,73 @@
+"""
+Broadcast Module
+
+Fan-out of one status update to many chat sessions (`POST /broadcast` on the
+status webhook server). Targets are the Chainlit contexts of the active
+sessions, optionally filtered by the user's identifier or role. Sending runs on
+a fixed number of worker tasks, so a broadcast to thousands of sessions keeps
+at most `concurrency` sends in flight.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Iterable, List, Optional, Callable, Awaitable, Collection
+
+logger = logging.getLogger(__name__)
+
+
+def session_user(target: Any) -> Optional[Any]:
+    """The authenticated user of a Chainlit context, if any."""
+    session = getattr(target, "session", None)
+    return getattr(session, "user", None)
+
+
+def matches(target: Any, users: Optional[Collection[str]], roles: Optional[Collection[str]]) -> bool:
+    """
+    Whether a session passes the broadcast filter. Without a filter every session does.
+
+    Args:
+        target: The session's Chainlit context
+        users: User identifiers to include
+        roles: Roles (the user's `role` metadata) to include
+    """
+    if not users and not roles:
+        return True
+    user = session_user(target)
+    if user is None:
+        return False
+    if users and user.identifier in users:
+        return True
+    metadata = getattr(user, "metadata", None) or {}
+    return bool(roles) and metadata.get("role") in roles
+
+
+def select_targets(sessions: Dict[str, Any], users: Optional[Iterable[str]] = None,
+                   roles: Optional[Iterable[str]] = None) -> List[Any]:
+    """The contexts of the active sessions matching the filter."""
+    users = set(users) if users else None
+    roles = set(roles) if roles else None
+    # A snapshot: sessions may connect or end while the broadcast runs
+    return [target for target in list(sessions.values()) if matches(target, users, roles)]
+
+
+async def fan_out(targets: List[Any], send: Callable[[Any], Awaitable[None]], concurrency: int = 50) -> Dict[str, int]:
+    """
+    Call `send` for every target with at most `concurrency` calls in flight.
+
+    Returns:
+        Counts of the targets, and of the sends that succeeded and failed
+    """
+    counts = {"sessions": len(targets), "delivered": 0, "failed": 0}
+    pending = iter(targets)
+
+    async def worker():
+        for target in pending:
+            try:
+                await send(target)
+                counts["delivered"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                logger.warning(f"Broadcast to a session failed: {str(e)}")
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(targets)))))
+    return counts
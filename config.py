@@ -3,10 +3,16 @@ Configuration settings for the Chainlit frontend application.
 """
 
 import os
-from dotenv import load_dotenv
+import json
+import socket
 
-# Load environment variables from .env file if it exists
-load_dotenv()
+# Load environment variables from the .env file next to this module if it exists
+# (an explicit path avoids searching the directory tree at import time)
+ENV_FILE = os.getenv("ENV_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
 
 # n8n Webhook Configuration
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "http://localhost:5678/webhook/macAssistant")
@@ -76,5 +82,146 @@ ENABLE_FEEDBACK = os.getenv("ENABLE_FEEDBACK", "true").lower() == "true"
 # Request Configuration
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "60"))
 
+# Stream n8n responses (newline-delimited JSON chunks) into the placeholder message
+N8N_STREAMING = os.getenv("N8N_STREAMING", "false").lower() == "true"
+
+# Status Webhook Server Configuration
+STATUS_WEBHOOK_HOST = os.getenv("STATUS_WEBHOOK_HOST", "0.0.0.0")
+STATUS_WEBHOOK_PORT = int(os.getenv("STATUS_WEBHOOK_PORT", "5679"))
+
+# Status Ingest Configuration
+# With STATUS_INGEST set to "ring" (shared memory) or "pipe", /status requests are taken
+# by a separate process (scripts/status_webhook_server.py --forward ring|pipe) that
+# validates them and passes pre-serialized updates to this process
+STATUS_INGEST = os.getenv("STATUS_INGEST", "")
+STATUS_INGEST_ADDRESS = os.getenv("STATUS_INGEST_ADDRESS", "")
+STATUS_INGEST_RING_MB = float(os.getenv("STATUS_INGEST_RING_MB", "8"))
+
+# Broadcast Configuration
+# POST /broadcast renders one update in every active session (or those of given users
+# or roles), with at most BROADCAST_CONCURRENCY sends in flight
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "50"))
+BROADCAST_TIMEOUT = float(os.getenv("BROADCAST_TIMEOUT", "30"))
+
+# Idempotency Configuration
+# /status and /broadcast requests with an Idempotency-Key header (or an "id" field) are
+# remembered for IDEMPOTENCY_WINDOW seconds; retries get the original result
+IDEMPOTENCY_WINDOW = float(os.getenv("IDEMPOTENCY_WINDOW", "600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+# Scheduler Configuration
+# /status updates with deliver_at or every are held in a timing wheel with a resolution
+# of SCHEDULER_TICK_MS; at most SCHEDULER_MAX_PENDING are held at once
+SCHEDULER_TICK_MS = float(os.getenv("SCHEDULER_TICK_MS", "100"))
+SCHEDULER_MAX_PENDING = int(os.getenv("SCHEDULER_MAX_PENDING", "100000"))
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "1"))
+
+# Pending Status Updates Configuration
+# Status updates for a session whose websocket dropped are held for PENDING_UPDATES_TTL
+# seconds (at most PENDING_UPDATES_MAX per session) and shown when the thread is resumed
+PENDING_UPDATES_TTL = float(os.getenv("PENDING_UPDATES_TTL", "300"))
+PENDING_UPDATES_MAX = int(os.getenv("PENDING_UPDATES_MAX", "200"))
+
+# Multi-Worker Configuration
+# With STATUS_BUS set ("unix" or "redis"), several Chainlit workers can run behind a sticky
+# load balancer: a status update for a session owned by another worker is forwarded to it.
+# STATUS_BUS_URL is the broker socket path (unix) or a redis:// URL. Every worker needs a
+# unique WORKER_ID and its own STATUS_WEBHOOK_PORT
+STATUS_BUS = os.getenv("STATUS_BUS", "")
+STATUS_BUS_URL = os.getenv("STATUS_BUS_URL", "/tmp/chainfin-status-bus.sock")
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+SESSION_OWNER_TTL = float(os.getenv("SESSION_OWNER_TTL", "60"))
+
+# Tracing Configuration
+# Per-turn spans (payload build, n8n call, response parse, status ingest/queue/render)
+# are appended as NDJSON to TRACE_FILE when tracing is enabled; the file is rotated
+# at TRACE_MAX_MB and TRACE_BACKUP_COUNT rotated files are kept
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.ndjson")
+TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "50"))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", "5"))
+
+# Profiling Configuration
+# A sampling profiler writes per-turn collapsed stacks (or speedscope files) to
+# PROFILING_DIR; it can also be switched on at runtime with the /profile command
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_DIR = os.getenv("PROFILING_DIR", "logs/profiles")
+PROFILING_FORMAT = os.getenv("PROFILING_FORMAT", "collapsed")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "10"))
+PROFILING_MAX_TURNS_PER_MINUTE = float(os.getenv("PROFILING_MAX_TURNS_PER_MINUTE", "6"))
+
+# Event Loop Monitor Configuration
+# Loop lag is exported as metrics; a loop blocked longer than the threshold
+# logs the stack of the blocking call (rate limited)
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250"))
+LOOP_BLOCK_REPORTS_PER_MINUTE = float(os.getenv("LOOP_BLOCK_REPORTS_PER_MINUTE", "6"))
+
+# Health Configuration
+# /livez and /readyz on the status webhook server are computed from an n8n circuit
+# breaker, a background n8n probe, the status queue depth and the event loop lag
+N8N_PROBE_INTERVAL = float(os.getenv("N8N_PROBE_INTERVAL", "30"))
+N8N_PROBE_TIMEOUT = float(os.getenv("N8N_PROBE_TIMEOUT", "2"))
+N8N_CIRCUIT_FAILURES = int(os.getenv("N8N_CIRCUIT_FAILURES", "5"))
+N8N_CIRCUIT_RESET = float(os.getenv("N8N_CIRCUIT_RESET", "30"))
+READY_MAX_QUEUE_DEPTH = int(os.getenv("READY_MAX_QUEUE_DEPTH", "1000"))
+READY_MAX_LOOP_LAG_MS = float(os.getenv("READY_MAX_LOOP_LAG_MS", "500"))
+LIVE_MAX_LOOP_STALL = float(os.getenv("LIVE_MAX_LOOP_STALL", "30"))
+
+# Session Store Configuration
+# Session state (modes, selected profile, custom widgets) is kept in an in-memory LRU
+# and saved in batches to SESSION_STORE ("sqlite", "memory", or empty to disable), so
+# resumed threads get it back after a reconnect or restart
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "data/sessions.db")
+SESSION_STORE_MAX_AGE_DAYS = float(os.getenv("SESSION_STORE_MAX_AGE_DAYS", "30"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "1800"))
+
+# Traffic Capture Configuration
+# When TRAFFIC_CAPTURE_DIR is set, sanitized /status bodies and n8n request/response
+# pairs are written there as rotating gzip NDJSON files (see traffic_capture.py)
+TRAFFIC_CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", "")
+TRAFFIC_CAPTURE_MAX_MB = float(os.getenv("TRAFFIC_CAPTURE_MAX_MB", "50"))
+TRAFFIC_CAPTURE_MAX_FILES = int(os.getenv("TRAFFIC_CAPTURE_MAX_FILES", "10"))
+
 # Logging Configuration
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO") 
\ No newline at end of file
+# Records go through a queue to a listener thread that writes LOG_FILE, rotated by
+# size (LOG_MAX_MB) and time (LOG_ROTATE_WHEN: midnight, H, D or empty) with gzip
+# compression. LOG_LEVELS sets per-module levels, e.g. "status_webhook=WARNING,httpx=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "chainlit_app.log")
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "10"))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+# Response Rendering Configuration
+# Maximum number of multi-item response entries prepared concurrently
+RESPONSE_RENDER_CONCURRENCY = int(os.getenv("RESPONSE_RENDER_CONCURRENCY", "4"))
+# Directory n8n elements may load local files from with "path" (empty: "path" is refused)
+ELEMENT_FILES_DIR = os.getenv("ELEMENT_FILES_DIR", "")
+
+# Agent Trace Configuration
+# When true, the agent trace attached to answers is collapsed until clicked
+AGENT_TRACE_EXPANDABLE = os.getenv("AGENT_TRACE_EXPANDABLE", "true").lower() == "true"
+
+# Progress Configuration
+# Minimum seconds between in-place progress element updates; the browser
+# interpolates in between using the target/eta hints
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", "1.0"))
+
+# Toast Configuration
+# Per toast type: "rate" is tokens refilled per second, "burst" the bucket size,
+# "dedupe_window" the seconds during which identical toasts are folded into one.
+TOAST_LIMITS = {
+    "info": {"rate": 1.0, "burst": 3, "dedupe_window": 5.0},
+    "success": {"rate": 1.0, "burst": 3, "dedupe_window": 5.0},
+    "warning": {"rate": 0.5, "burst": 2, "dedupe_window": 10.0},
+    "error": {"rate": 2.0, "burst": 5, "dedupe_window": 3.0}
+}
+
+# Optional JSON override, e.g. TOAST_LIMITS_JSON='{"info": {"rate": 0.2}}'
+if os.getenv("TOAST_LIMITS_JSON"):
+    for _toast_type, _overrides in json.loads(os.getenv("TOAST_LIMITS_JSON")).items():
+        TOAST_LIMITS.setdefault(_toast_type, dict(TOAST_LIMITS["info"])).update(_overrides)
@@ -0,0 +1,99 @@
+"""
+Dedupe Module
+
+Remembers the results of webhook requests by idempotency key, so a request
+that n8n retries (after a timeout, say) is answered with the original result
+instead of being processed again. Keys come from the `Idempotency-Key` header
+or the `id` field of the body; an `id` is only unique within its chat, so it
+is scoped by the body's `sessionID`.
+
+Keys are kept for `window` seconds and at most `max_keys` at a time, oldest
+evicted first. Lookups and inserts are O(1): an OrderedDict in insertion
+order, which is also expiry order because the window is the same for all keys.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Longest key accepted; longer ones are rejected rather than hashed
+MAX_KEY_LENGTH = 256
+
+
+def idempotency_key(headers: Any, data: Dict[str, Any]) -> Optional[str]:
+    """
+    The idempotency key of a request: the header if present, else the body's `id`
+    within the body's `sessionID`.
+
+    Raises:
+        ValueError: The key is not a string or number, or too long
+    """
+    key = headers.get(IDEMPOTENCY_HEADER)
+    session_id = None
+    if key is None:
+        key = data.get("id")
+        if key is None:
+            return None
+        if isinstance(key, bool) or not isinstance(key, (str, int, float)):
+            raise ValueError("'id' must be a string or a number")
+        key = str(key)
+        session_id = data.get("sessionID")
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency key must be 1 to {MAX_KEY_LENGTH} characters")
+    if session_id is not None:
+        # Header values cannot contain a newline, so this never equals a header key
+        return f"{session_id}\n{key}"
+    return key
+
+
+class DedupeCache:
+    """A time-windowed LRU of request results by idempotency key."""
+
+    def __init__(self, window: float = 600.0, max_keys: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            window: Seconds a key is remembered
+            max_keys: Most keys remembered at once
+            clock: Monotonic time source
+        """
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """The result remembered for a key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            self._expire()
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, result: Any) -> None:
+        """Remember the result of a request for the window."""
+        self._expire()
+        self._entries.pop(key, None)
+        self._entries[key] = (self.clock() + self.window, result)
+        if len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def _expire(self) -> None:
+        now = self.clock()
+        entries = self._entries
+        while entries:
+            key, (expires, _) = next(iter(entries.items()))
+            if expires > now:
+                break
+            del entries[key]
@@ -0,0 +1,203 @@
+"""
+Health Module
+
+Liveness and readiness computed from cached signals, so the `/livez` and
+`/readyz` probes of the status webhook server answer in microseconds and never
+wait on n8n:
+
+- a circuit breaker around n8n requests (opened by consecutive failures)
+- the last result of a background n8n reachability probe
+- the status queue depth
+- the lag and heartbeat of the Chainlit event loop (see loop_monitor)
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import loop_monitor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Thresholds used by liveness() and readiness(); see configure()
+SETTINGS = {
+    "max_queue_depth": 1000,
+    "max_loop_lag": 0.5,
+    "max_loop_stall": 30.0,
+    "probe_max_age_intervals": 3
+}
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast. After `reset_timeout` seconds one trial call is let through
+    (half open); its success closes the circuit, its failure opens it again.
+    A trial that never reports back is replaced after another `reset_timeout`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN:
+                now = self.clock()
+                if self._trial_started is None or now - self._trial_started >= self.reset_timeout:
+                    self._trial_started = now
+                    return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_started is not None or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.opened_at = self.clock()
+            self._trial_started = None
+
+
+class ReachabilityProbe:
+    """Check a URL from a background thread and cache the last result."""
+
+    def __init__(self, url: str, interval: float = 30.0, timeout: float = 2.0):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.result: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> Dict[str, Any]:
+        import requests
+
+        start = time.monotonic()
+        try:
+            # Any answer below 500 means n8n is up (a POST-only webhook may answer HEAD with 404)
+            response = requests.head(self.url, timeout=self.timeout)
+            ok = response.status_code < 500
+            error = None if ok else f"HTTP {response.status_code}"
+        except Exception as e:
+            ok = False
+            error = str(e)
+        return {
+            "ok": ok,
+            "error": error,
+            "latency_ms": round((time.monotonic() - start) * 1000, 1),
+            "checked_at": time.time()
+        }
+
+    def _run(self) -> None:
+        while True:
+            self.result = self.check()
+            metrics.N8N_UP.set(1 if self.result["ok"] else 0)
+            if not self.result["ok"]:
+                logger.warning(f"n8n probe failed: {self.result['error']}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="n8n-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# The n8n circuit breaker, used by the chat path
+N8N_BREAKER = CircuitBreaker("n8n")
+
+# The background n8n probe; None until start_n8n_probe() is called
+N8N_PROBE: Optional[ReachabilityProbe] = None
+
+
+def configure(failure_threshold: int = 5, reset_timeout: float = 30.0, **thresholds) -> None:
+    """Set the circuit breaker parameters and the liveness/readiness thresholds."""
+    N8N_BREAKER.failure_threshold = failure_threshold
+    N8N_BREAKER.reset_timeout = reset_timeout
+    SETTINGS.update(thresholds)
+
+
+def start_n8n_probe(url: str, interval: float = 30.0, timeout: float = 2.0) -> None:
+    """Start probing n8n in the background (once)."""
+    global N8N_PROBE
+    if N8N_PROBE is None:
+        N8N_PROBE = ReachabilityProbe(url, interval, timeout)
+        N8N_PROBE.start()
+
+
+def _loop_check(max_lag: float, max_silence: float) -> Dict[str, Any]:
+    monitor = loop_monitor.MONITORS.get("chainlit")
+    if monitor is None:
+        # No session has started the monitor yet
+        return {"ok": True, "detail": "not monitored"}
+    silent = time.monotonic() - monitor.last_beat
+    return {
+        "ok": monitor.last_lag <= max_lag and silent <= monitor.interval + max_silence,
+        "lag_ms": round(monitor.last_lag * 1000, 1),
+        "since_heartbeat_ms": round(silent * 1000, 1)
+    }
+
+
+def liveness() -> Tuple[bool, Dict[str, Any]]:
+    """The process is alive unless the Chainlit loop has been stuck for max_loop_stall."""
+    loop = _loop_check(float("inf"), SETTINGS["max_loop_stall"])
+    return loop["ok"], {"loop": loop}
+
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """Whether the process should receive traffic, with the state of each check."""
+    state = N8N_BREAKER.state
+    checks = {"n8n_circuit": {"ok": state != CircuitBreaker.OPEN, "state": state}}
+
+    probe = N8N_PROBE
+    if probe is None:
+        checks["n8n_probe"] = {"ok": True, "detail": "disabled"}
+    elif probe.result is None:
+        checks["n8n_probe"] = {"ok": False, "detail": "no result yet"}
+    else:
+        age = time.time() - probe.result["checked_at"]
+        fresh = age <= probe.interval * SETTINGS["probe_max_age_intervals"]
+        checks["n8n_probe"] = dict(probe.result, ok=probe.result["ok"] and fresh, age_s=round(age, 1))
+
+    depth = metrics.STATUS_QUEUE_DEPTH.value
+    checks["status_queue"] = {"ok": depth < SETTINGS["max_queue_depth"], "depth": depth}
+    checks["loop"] = _loop_check(SETTINGS["max_loop_lag"], SETTINGS["max_loop_lag"])
+
+    return all(check["ok"] for check in checks.values()), checks
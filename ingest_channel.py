@@ -0,0 +1,474 @@
+"""
+Ingest Channel Module
+
+Carries status updates from an out-of-process ingestor
+(`scripts/status_webhook_server.py --forward ring|pipe`) to the Chainlit
+process, so HTTP handling and JSON parsing of `/status` requests no longer
+compete with chat handling for the GIL.
+
+The ingestor validates each update and pre-serializes it with `marshal`
+(cheaper to decode than JSON). Frames are length-prefixed and travel over:
+
+- `ring`: a single-producer/single-consumer ring buffer in shared memory,
+  created by the Chainlit process. The consumer thread polls it with an
+  adaptive back-off (at most `max_poll_interval` of added latency when idle).
+- `pipe`: a `multiprocessing.connection` Unix socket, the fallback where
+  shared memory is unavailable. Its frames are length-prefixed as well.
+
+Several workers on one host each need their own ring or socket: a worker
+creating its channel replaces whatever is under that address.
+`default_address()` suffixes the default with the worker ID.
+
+A restarted Chainlit process creates a new ring under the same name. Each ring
+carries a random epoch that is cleared when it is closed; the producer
+reattaches when its ring was closed or its reader stopped making progress, so
+it does not keep filling a ring nobody reads.
+
+The consumer also tells the producer whether its scheduler has room, so the
+ingestor can refuse scheduled updates it would otherwise accept and then lose.
+
+Both sides must run the same Python version (marshal format).
+"""
+
+import logging
+import marshal
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("ring", "pipe")
+
+# Default shared memory name (ring) and socket path (pipe)
+DEFAULT_ADDRESSES = {"ring": "chainfin-status", "pipe": "/tmp/chainfin-status-ingest.sock"}
+
+# Write position, read position, epoch and flags. The positions are byte
+# counters that only grow; the producer only writes the first, the consumer the
+# rest. The epoch identifies the ring (0 once it is closed).
+HEADER = struct.Struct("<QQQQ")
+POSITIONS = struct.Struct("<QQ")
+WORD = struct.Struct("<Q")
+EPOCH_OFFSET = 16
+FLAGS_OFFSET = 24
+LENGTH = struct.Struct("<I")
+# Length value marking that the next frame starts at the beginning of the buffer
+WRAP = 0xFFFFFFFF
+
+# Consumer flag: the scheduler has no room for scheduled updates
+FLAG_SCHEDULER_FULL = 1
+
+
+def default_address(kind: str, worker_id: Optional[str] = None) -> str:
+    """The default shared memory name or socket path of a channel, per worker if given."""
+    address = DEFAULT_ADDRESSES[kind]
+    if not worker_id:
+        return address
+    if kind == "pipe":
+        return f"{address[:-len('.sock')]}-{worker_id}.sock"
+    return f"{address}-{worker_id}"
+
+
+def encode_update(update: Dict[str, Any]) -> bytes:
+    return marshal.dumps(update)
+
+
+def decode_update(payload: bytes) -> Dict[str, Any]:
+    return marshal.loads(payload)
+
+
+# Segments created (and to be unlinked) by this process
+_created = set()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without letting this process unlink it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument; unregister from the resource tracker instead,
+        # unless this process created the segment and still has to unlink it
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class RingBuffer:
+    """Length-prefixed frames in a shared memory ring (one producer, one consumer)."""
+
+    def __init__(self, name: str, size: int = 8 * 1024 * 1024, create: bool = False):
+        """
+        Create or attach to a ring buffer.
+
+        Args:
+            name: The shared memory segment name
+            size: Segment size in bytes (when creating)
+            create: Create the segment (the consumer does) instead of attaching to it
+        """
+        self.name = name
+        self.owner = create
+        if create:
+            try:
+                # A segment left over by a previous run
+                stale = shared_memory.SharedMemory(name=name)
+                if WORD.unpack_from(stale.buf, EPOCH_OFFSET)[0]:
+                    # Never closed: its process crashed, or is still running and loses its ring
+                    logger.warning(f"Replacing ring {name} that was not closed; "
+                                   f"every worker needs its own ingest address")
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _created.add(name)
+            self.epoch = int.from_bytes(os.urandom(8), "little") | 1
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, self.epoch, 0)
+        else:
+            self.shm = _attach(name)
+            self.epoch = WORD.unpack_from(self.shm.buf, EPOCH_OFFSET)[0]
+        self.buf = self.shm.buf
+        self.capacity = self.shm.size - HEADER.size
+        self.max_frame = self.capacity // 2
+
+    def close(self) -> None:
+        if self.owner:
+            # Tell an attached producer this ring is no longer read
+            WORD.pack_into(self.buf, EPOCH_OFFSET, 0)
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            _created.discard(self.name)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def is_open(self) -> bool:
+        """False once the creating process closed the ring."""
+        return WORD.unpack_from(self.buf, EPOCH_OFFSET)[0] == self.epoch
+
+    @property
+    def flags(self) -> int:
+        return WORD.unpack_from(self.buf, FLAGS_OFFSET)[0]
+
+    @flags.setter
+    def flags(self, value: int) -> None:
+        WORD.pack_into(self.buf, FLAGS_OFFSET, value)
+
+    def read_position(self) -> int:
+        return WORD.unpack_from(self.buf, 8)[0]
+
+    def write(self, payload: bytes) -> bool:
+        """Append a frame. Returns False when the ring is full or the frame too large."""
+        length = len(payload)
+        if length + LENGTH.size > self.max_frame:
+            return False
+        buf = self.buf
+        write_pos, read_pos = POSITIONS.unpack_from(buf, 0)
+        needed = LENGTH.size + length
+        offset = write_pos % self.capacity
+        tail = self.capacity - offset
+        skip = tail if tail < needed else 0
+        if self.capacity - (write_pos - read_pos) < skip + needed:
+            return False
+        if skip:
+            if tail >= LENGTH.size:
+                LENGTH.pack_into(buf, HEADER.size + offset, WRAP)
+            write_pos += skip
+            offset = 0
+        start = HEADER.size + offset
+        LENGTH.pack_into(buf, start, length)
+        buf[start + LENGTH.size:start + needed] = payload
+        # Publish the frame by moving the write position last
+        WORD.pack_into(buf, 0, write_pos + needed)
+        return True
+
+    def read(self) -> Optional[bytes]:
+        """Take the next frame, or None when the ring is empty."""
+        buf = self.buf
+        write_pos, read_pos = POSITIONS.unpack_from(buf, 0)
+        if read_pos == write_pos:
+            return None
+        offset = read_pos % self.capacity
+        tail = self.capacity - offset
+        length = LENGTH.unpack_from(buf, HEADER.size + offset)[0] if tail >= LENGTH.size else WRAP
+        if length == WRAP:
+            read_pos += tail
+            offset = 0
+            length = LENGTH.unpack_from(buf, HEADER.size)[0]
+        start = HEADER.size + offset + LENGTH.size
+        payload = bytes(buf[start:start + length])
+        WORD.pack_into(buf, 8, read_pos + LENGTH.size + length)
+        return payload
+
+    def used(self) -> int:
+        write_pos, read_pos = POSITIONS.unpack_from(self.buf, 0)
+        return write_pos - read_pos
+
+
+class IngestConsumer:
+    """Read frames from a channel on a background thread and hand each update to a callback."""
+
+    def __init__(self, kind: str, address: str, handle: Callable[[Dict[str, Any]], None],
+                 ring_size: int = 8 * 1024 * 1024, max_poll_interval: float = 0.005,
+                 scheduler_full: Optional[Callable[[], bool]] = None):
+        """
+        Initialize the consumer.
+
+        Args:
+            kind: "ring" or "pipe"
+            address: Shared memory name (ring) or Unix socket path (pipe)
+            handle: Called with each decoded update (from the consumer thread)
+            ring_size: Ring buffer size in bytes
+            max_poll_interval: Longest sleep between polls of an idle ring
+            scheduler_full: Returns True while scheduled updates would be refused;
+                            passed on to the producer
+        """
+        if kind not in CHANNELS:
+            raise ValueError(f"Unknown ingest channel: {kind}")
+        self.kind = kind
+        self.address = address
+        self.handle = handle
+        self.max_poll_interval = max_poll_interval
+        self.scheduler_full = scheduler_full
+        self.received = 0
+        self.ring: Optional[RingBuffer] = RingBuffer(address, ring_size, create=True) if kind == "ring" else None
+        self.listener: Optional[Listener] = None
+        if kind == "pipe":
+            if os.path.exists(address):
+                os.remove(address)
+            self.listener = Listener(address, family="AF_UNIX")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        target = self._run_ring if self.kind == "ring" else self._run_pipe
+        self._thread = threading.Thread(target=target, name=f"ingest-{self.kind}", daemon=True)
+        self._thread.start()
+        logger.info(f"Receiving status updates from the ingestor over {self.kind} ({self.address})")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.listener is not None:
+            self.listener.close()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        if self.ring is not None:
+            self.ring.close()
+
+    def _dispatch(self, payload: bytes) -> None:
+        self.received += 1
+        try:
+            self.handle(decode_update(payload))
+        except Exception as e:
+            logger.error(f"Error handling ingested status update: {str(e)}")
+
+    def _flags(self) -> int:
+        if self.scheduler_full is not None and self.scheduler_full():
+            return FLAG_SCHEDULER_FULL
+        return 0
+
+    def _run_ring(self) -> None:
+        ring = self.ring
+        idle = 0.0001
+        while not self._stop.is_set():
+            flags = self._flags()
+            if flags != ring.flags:
+                ring.flags = flags
+            payload = ring.read()
+            if payload is None:
+                time.sleep(idle)
+                idle = min(idle * 2, self.max_poll_interval)
+                continue
+            idle = 0.0001
+            self._dispatch(payload)
+
+    def _run_pipe(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                return
+            logger.info("Status ingestor connected")
+            sent_flags = None
+            with conn:
+                while not self._stop.is_set():
+                    try:
+                        # The flags travel back over the same connection when they change
+                        flags = self._flags()
+                        if flags != sent_flags:
+                            conn.send_bytes(WORD.pack(flags))
+                            sent_flags = flags
+                        if not conn.poll(0.5):
+                            continue
+                        payload = conn.recv_bytes()
+                    except (EOFError, OSError):
+                        logger.warning("Status ingestor disconnected")
+                        break
+                    self._dispatch(payload)
+
+
+class IngestProducer:
+    """The ingestor's side of a channel."""
+
+    def __init__(self, kind: str, address: str, connect_timeout: float = 30.0, stall_timeout: float = 2.0):
+        """
+        Connect to the channel created by the Chainlit process, retrying until it exists.
+
+        Args:
+            kind: "ring" or "pipe"
+            address: Shared memory name (ring) or Unix socket path (pipe)
+            connect_timeout: Seconds to wait for the Chainlit process
+            stall_timeout: Seconds without reads from a non-empty ring after which
+                           the producer looks for a newer ring
+        """
+        if kind not in CHANNELS:
+            raise ValueError(f"Unknown ingest channel: {kind}")
+        self.kind = kind
+        self.address = address
+        self.stall_timeout = stall_timeout
+        self.sent = 0
+        self.dropped = 0
+        self._flags = 0
+        self._read_pos = 0
+        self._progress_at = time.monotonic()
+        self._lock = threading.Lock()
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self.ring = RingBuffer(address) if kind == "ring" else None
+                self.conn = Client(address, family="AF_UNIX") if kind == "pipe" else None
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def send(self, payload: bytes) -> bool:
+        """Send one pre-serialized update. Returns False if it could not be handed over."""
+        with self._lock:
+            if self.ring is not None:
+                ok = self._write_ring(payload)
+            else:
+                try:
+                    self.conn.send_bytes(payload)
+                    ok = True
+                except OSError:
+                    # The Chainlit process restarted; reconnect once
+                    ok = self._reconnect()
+                    if ok:
+                        try:
+                            self.conn.send_bytes(payload)
+                        except OSError as e:
+                            logger.warning(f"Cannot send to the Chainlit process: {str(e)}")
+                            ok = False
+        if ok:
+            self.sent += 1
+        else:
+            self.dropped += 1
+        return ok
+
+    def _write_ring(self, payload: bytes) -> bool:
+        # A restarted Chainlit process creates a new ring; the old one would fill up unread
+        if not self.ring.is_open():
+            if not self._reattach():
+                return False
+        elif self._stalled():
+            self._reattach()
+        if self.ring.write(payload):
+            return True
+        return self._reattach() and self.ring.write(payload)
+
+    def _stalled(self) -> bool:
+        """Whether the ring holds frames its reader has not touched for stall_timeout."""
+        now = time.monotonic()
+        read_pos = self.ring.read_position()
+        if read_pos != self._read_pos or self.ring.used() == 0:
+            self._read_pos = read_pos
+            self._progress_at = now
+            return False
+        return now - self._progress_at >= self.stall_timeout
+
+    def _reattach(self) -> bool:
+        """Switch to the ring currently under the address if it is a newer one."""
+        self._progress_at = time.monotonic()
+        try:
+            ring = RingBuffer(self.address)
+        except FileNotFoundError:
+            return False
+        if ring.epoch == self.ring.epoch or not ring.is_open():
+            ring.close()
+            return False
+        logger.info(f"Attached to the new ring of the Chainlit process ({self.address})")
+        self.ring.close()
+        self.ring = ring
+        self._read_pos = ring.read_position()
+        return True
+
+    def _reconnect(self) -> bool:
+        try:
+            conn = Client(self.address, family="AF_UNIX")
+        except OSError:
+            return False
+        self.conn.close()
+        self.conn = conn
+        self._flags = 0
+        return True
+
+    def scheduler_full(self) -> bool:
+        """Whether the Chainlit process currently refuses scheduled updates."""
+        with self._lock:
+            if self.ring is not None:
+                return bool(self.ring.flags & FLAG_SCHEDULER_FULL)
+            try:
+                while self.conn.poll():
+                    self._flags = WORD.unpack(self.conn.recv_bytes())[0]
+            except (EOFError, OSError):
+                pass
+            return bool(self._flags & FLAG_SCHEDULER_FULL)
+
+    def close(self) -> None:
+        if self.ring is not None:
+            self.ring.close()
+        if self.conn is not None:
+            self.conn.close()
+
+
+# The consumer running in the Chainlit process; None with the in-thread server
+CONSUMER: Optional[IngestConsumer] = None
+
+
+def start_consumer(kind: Optional[str], address: Optional[str], handle: Callable[[Dict[str, Any]], None],
+                   ring_size: int = 8 * 1024 * 1024, scheduler_full: Optional[Callable[[], bool]] = None,
+                   worker_id: Optional[str] = None) -> None:
+    """
+    Receive updates from an external ingestor.
+
+    Args:
+        kind: "ring", "pipe" or None (in-thread server only)
+        address: Shared memory name or socket path (None for the default of the channel)
+        handle: Called with each update
+        ring_size: Ring buffer size in bytes
+        scheduler_full: Returns True while scheduled updates would be refused
+        worker_id: Worker whose default address is used when no address is given
+    """
+    global CONSUMER
+    stop_consumer()
+    if kind:
+        CONSUMER = IngestConsumer(kind, address or default_address(kind, worker_id), handle, ring_size,
+                                  scheduler_full=scheduler_full)
+        CONSUMER.start()
+
+
+def stop_consumer() -> None:
+    global CONSUMER
+    if CONSUMER is not None:
+        CONSUMER.stop()
+        CONSUMER = None
@@ -0,0 +1,139 @@
+"""
+Logging Setup Module
+
+The single place logging is configured. Modules only call
+`logging.getLogger(...)`; entry points (app.py) call `setup_logging()` once.
+
+Log records are handed to a `QueueHandler`, so emitting a log line on the
+event loop is just a queue put. A `QueueListener` thread does the formatting
+and the file and console I/O. The log file is rotated by size and by time,
+and rotated files are gzip compressed (by the listener thread as well).
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# The running listener; set once by setup_logging()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotate when the file reaches `maxBytes` or when the rotation interval
+    (`when`: "midnight", "H" hourly, "D" daily, or "" for size only) elapses.
+    Rotated files are gzip compressed as `<file>.1.gz`, `<file>.2.gz`, ...
+    """
+
+    def __init__(self, filename: str, maxBytes: int = 0, backupCount: int = 5, when: str = "midnight",
+                 encoding: Optional[str] = "utf-8"):
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self.when = when
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+        self.rollover_at = self._next_rollover(time.time())
+
+    def _next_rollover(self, now: float) -> Optional[float]:
+        when = (self.when or "").upper()
+        if when == "MIDNIGHT":
+            tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+            return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+        if when == "H":
+            return now + 3600
+        if when == "D":
+            return now + 86400
+        return None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = self._next_rollover(time.time())
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        if not os.path.exists(source):
+            return
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse per-module levels such as "status_webhook=WARNING,httpx=ERROR"."""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level: str = "INFO", log_file: Optional[str] = "chainlit_app.log", max_bytes: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, when: str = "midnight", module_levels: Optional[Dict[str, str]] = None,
+                  console: bool = True) -> None:
+    """
+    Configure the root logger with a queue handler and a listener thread.
+
+    Calling it again does nothing, so imported modules can never reconfigure logging.
+
+    Args:
+        level: Root log level
+        log_file: Log file path (None for console only)
+        max_bytes: Rotate the log file at this size (0 for time-based rotation only)
+        backup_count: Number of rotated files kept
+        when: Time-based rotation: "midnight", "H", "D" or "" for none
+        module_levels: Levels for individual loggers, e.g. {"httpx": "WARNING"}
+        console: Also log to stderr
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(CompressingRotatingFileHandler(log_file, max_bytes, backup_count, when))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(getattr(logging, module_level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,151 @@
+"""
+Loop Monitor Module
+
+Event loop lag monitoring and blocking call detection.
+
+A heartbeat task on each monitored loop wakes up every `interval` seconds and
+records how late it woke up (the loop lag) in the
+`chainfin_event_loop_lag_seconds` histogram. A watchdog thread checks the
+heartbeat: when the loop has not run it for longer than `threshold`, some
+callback is blocking the loop, and the watchdog captures the stack of the
+loop's thread at that moment, which points at the offending blocking call
+(`requests.post`, `time.sleep`, synchronous file I/O, ...). Reports are rate
+limited per loop so a persistently slow loop cannot flood the log.
+
+Both the Chainlit loop and the status webhook server loop are monitored.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional
+
+import metrics
+from toast_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Monitors by loop name
+MONITORS: Dict[str, "LoopMonitor"] = {}
+
+# Settings applied by ensure_monitor(); see configure()
+SETTINGS = {"enabled": True, "interval": 0.1, "threshold": 0.25, "reports_per_minute": 6}
+
+
+class LoopMonitor:
+    """Measure the lag of one event loop and report what blocks it."""
+
+    def __init__(self, name: str, loop: asyncio.AbstractEventLoop, thread_id: int,
+                 interval: float = 0.1, threshold: float = 0.25, reports_per_minute: float = 6):
+        """
+        Initialize the monitor.
+
+        Args:
+            name: The loop name used in metrics and reports
+            loop: The monitored loop
+            thread_id: The ident of the thread running the loop
+            interval: Seconds between heartbeats
+            threshold: Seconds without a heartbeat (beyond the interval) that count as blocked
+            reports_per_minute: Stack reports logged per minute at most
+        """
+        self.name = name
+        self.loop = loop
+        self.thread_id = thread_id
+        self.interval = interval
+        self.threshold = threshold
+        self.reporter = TokenBucket(reports_per_minute / 60, max(1, int(reports_per_minute)), time.monotonic())
+        self.last_beat = time.monotonic()
+        self.last_lag = 0.0
+        self.blocks = 0
+        self.reports_suppressed = 0
+        self._lag = metrics.EVENT_LOOP_LAG.labels(name)
+        self._blocked = metrics.EVENT_LOOP_BLOCKS.labels(name)
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the heartbeat (must be called on the monitored loop) and the watchdog."""
+        self.last_beat = time.monotonic()
+        self._task = self.loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name=f"loop-watchdog-{self.name}", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self.loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = self.loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, self.loop.time() - expected)
+            self._lag.observe(self.last_lag)
+            self.last_beat = time.monotonic()
+
+    def _watch(self) -> None:
+        stalled_since = None
+        while not self._stop.wait(self.threshold / 2):
+            silent = time.monotonic() - self.last_beat
+            if silent <= self.interval + self.threshold:
+                if stalled_since is not None:
+                    logger.warning(f"Event loop '{self.name}' was blocked for {time.monotonic() - stalled_since:.2f} s")
+                    stalled_since = None
+                continue
+            if stalled_since is not None:
+                # Still the same stall; it was already reported
+                continue
+            stalled_since = self.last_beat + self.interval
+            self.blocks += 1
+            self._blocked.inc()
+            self.report(silent - self.interval)
+
+    def report(self, blocked_for: float) -> None:
+        """Log the stack of the loop thread, unless the report budget is used up."""
+        if not self.reporter.take(time.monotonic()):
+            self.reports_suppressed += 1
+            return
+        frame = sys._current_frames().get(self.thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "  (stack unavailable)\n"
+        suppressed = f" ({self.reports_suppressed} reports suppressed since the last one)" if self.reports_suppressed else ""
+        self.reports_suppressed = 0
+        logger.warning(
+            f"Event loop '{self.name}' blocked for at least {blocked_for:.2f} s{suppressed}. "
+            f"Blocking call stack:\n{stack}"
+        )
+
+
+def configure(enabled: bool = True, interval: float = 0.1, threshold: float = 0.25,
+              reports_per_minute: float = 6) -> None:
+    """Set the monitoring settings used by ensure_monitor()."""
+    SETTINGS.update(enabled=enabled, interval=interval, threshold=threshold, reports_per_minute=reports_per_minute)
+
+
+def ensure_monitor(name: str) -> Optional[LoopMonitor]:
+    """
+    Monitor the running event loop under the given name (once per loop).
+
+    Returns:
+        The monitor of this loop, or None when monitoring is disabled
+    """
+    if not SETTINGS["enabled"]:
+        return None
+    loop = asyncio.get_running_loop()
+    monitor = MONITORS.get(name)
+    if monitor is not None and monitor.loop is loop and not monitor._stop.is_set():
+        return monitor
+    if monitor is not None:
+        monitor.stop()
+
+    monitor = LoopMonitor(
+        name, loop, threading.get_ident(),
+        SETTINGS["interval"], SETTINGS["threshold"], SETTINGS["reports_per_minute"]
+    )
+    monitor.start()
+    MONITORS[name] = monitor
+    logger.info(f"Monitoring event loop '{name}' (block threshold {monitor.threshold * 1000:.0f} ms)")
+    return monitor
@@ -0,0 +1,329 @@
+"""
+Metrics Module
+
+Minimal Prometheus-style metrics (counters, gauges, histograms) with labels,
+rendered in the Prometheus text exposition format by the status webhook
+server's /metrics endpoint.
+
+Updates are kept cheap for hot paths: label children are looked up in a plain
+dict (a lock is only taken the first time a label set is seen) and each child
+guards its value with its own uncontended lock.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Any, List, Sequence, Tuple
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_max(self, value: float) -> None:
+        """Raise the gauge to `value` if it is higher (high-water marks)."""
+        if value > self.value:
+            with self.lock:
+                if value > self.value:
+                    self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """Base class for a metric family with optional labels."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child(())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child(self, key: Tuple[str, ...]):
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def labels(self, *values: Any):
+        """Get the child metric for a set of label values."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        return self._child(tuple(str(value) for value in values))
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """A monotonically increasing counter."""
+
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def set_max(self, value: float) -> None:
+        self._default.set_max(value)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Histogram(Metric):
+    """A histogram of observed values with cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in list(self._children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+
+# ===== STATUS WEBHOOK METRICS =====
+
+STATUS_RECEIVED = REGISTRY.counter(
+    "chainfin_status_updates_received_total",
+    "Status updates accepted by the /status webhook.",
+    ["type"]
+)
+STATUS_REJECTED = REGISTRY.counter(
+    "chainfin_status_updates_rejected_total",
+    "Status updates rejected by the /status webhook.",
+    ["type", "reason"]
+)
+STATUS_TYPE_FALLBACK = REGISTRY.counter(
+    "chainfin_status_updates_unknown_type_total",
+    "Status updates with an unknown type, shown as info."
+)
+STATUS_UNDELIVERED = REGISTRY.counter(
+    "chainfin_status_updates_undelivered_total",
+    "Queued status updates that could not be rendered.",
+    ["reason"]
+)
+STATUS_QUEUE_DEPTH = REGISTRY.gauge(
+    "chainfin_status_queue_depth",
+    "Status updates waiting to be rendered."
+)
+STATUS_QUEUE_HIGH_WATER = REGISTRY.gauge(
+    "chainfin_status_queue_high_water",
+    "Highest status queue depth seen since start."
+)
+STATUS_PENDING = REGISTRY.gauge(
+    "chainfin_status_pending_updates",
+    "Status updates held for disconnected sessions until they resume."
+)
+STATUS_DEDUPE_HITS = REGISTRY.counter(
+    "chainfin_status_dedupe_hits_total",
+    "Retried webhook requests answered with the original result (same idempotency key).",
+    ["endpoint"]
+)
+STATUS_SCHEDULED = REGISTRY.gauge(
+    "chainfin_status_scheduled_updates",
+    "Delayed and recurring status updates waiting for their time."
+)
+STATUS_BROADCAST_DELIVERIES = REGISTRY.counter(
+    "chainfin_status_broadcast_deliveries_total",
+    "Sessions reached (or not) by /broadcast updates.",
+    ["result"]
+)
+STATUS_RENDER_LATENCY = REGISTRY.histogram(
+    "chainfin_status_render_latency_seconds",
+    "Time from enqueueing a status update to rendering it in the UI.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# ===== CHAT METRICS =====
+
+N8N_REQUEST_LATENCY = REGISTRY.histogram(
+    "chainfin_n8n_request_latency_seconds",
+    "Latency of requests to the n8n webhook.",
+    ["provider", "model"]
+)
+N8N_REQUEST_ERRORS = REGISTRY.counter(
+    "chainfin_n8n_request_errors_total",
+    "Failed requests to the n8n webhook.",
+    ["provider", "model", "error"]
+)
+N8N_UP = REGISTRY.gauge(
+    "chainfin_n8n_up",
+    "Whether the last background probe reached n8n (1) or not (0)."
+)
+ACTIVE_SESSIONS = REGISTRY.gauge(
+    "chainfin_active_sessions",
+    "Chat sessions currently connected."
+)
+
+# ===== EVENT LOOP METRICS =====
+
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "chainfin_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up.",
+    ["loop"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_BLOCKS = REGISTRY.counter(
+    "chainfin_event_loop_blocks_total",
+    "Times a callback blocked the event loop past the threshold.",
+    ["loop"]
+)
+
+# ===== MULTI-WORKER METRICS =====
+
+STATUS_FORWARDED = REGISTRY.counter(
+    "chainfin_status_updates_forwarded_total",
+    "Status updates sent to or received from other workers over the status bus.",
+    ["direction"]
+)
+STATUS_BUS_CONNECTED = REGISTRY.gauge(
+    "chainfin_status_bus_connected",
+    "Whether this worker is connected to the status bus (1) or not (0)."
+)
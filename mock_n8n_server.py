@@ -0,0 +1,370 @@
+"""
+Mock n8n Server
+
+A local stand-in for the n8n chat webhook that speaks the same request/response
+contract as `app.make_n8n_request` and `app.stream_n8n_request`, so the chat
+path can be developed, tested and benchmarked without a live n8n instance.
+
+Profiles control latency distribution, response size, multi-item responses,
+the `actions` payload, streaming, error/timeout injection, and status
+callbacks posted to the status webhook (`/status`) with the request's
+`sessionID` and `traceID`.
+
+Run standalone:
+    python mock_n8n_server.py --profile typical --port 5678
+
+Run in-process (e.g. from a benchmark):
+    server = MockN8NServer(PROFILES["fast"], port=5678)
+    server.start()
+    ...
+    server.stop()
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger("mock_n8n")
+
+# Default webhook path, matching the default N8N_WEBHOOK_URL
+DEFAULT_WEBHOOK_PATH = "/webhook/macAssistant"
+
+# Agent action types understood by the agent trace
+ACTION_TYPES = ["web_search", "email", "calendar", "file_system", "database", "api"]
+ACTION_STATUSES = ["success", "success", "success", "info", "warning", "error"]
+
+WORDS = ("the assistant found several relevant results and summarized them for you "
+         "based on your calendar email and recent files this should help with the task").split()
+
+
+class MockProfile:
+    """Behaviour of the mock n8n webhook."""
+
+    def __init__(self,
+                 latency: str = "fixed",
+                 latency_ms: float = 200.0,
+                 latency_spread_ms: float = 50.0,
+                 response_chars: int = 400,
+                 items: int = 0,
+                 actions: int = 0,
+                 streaming: bool = False,
+                 chunk_chars: int = 16,
+                 chunk_interval_ms: float = 20.0,
+                 error_rate: float = 0.0,
+                 timeout_rate: float = 0.0,
+                 timeout_seconds: float = 120.0,
+                 status_callbacks: int = 0,
+                 status_url: str = "http://localhost:5679/status",
+                 seed: Optional[int] = None,
+                 recorded: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize a profile.
+
+        Args:
+            latency: Latency distribution: "fixed", "uniform", "normal" or "lognormal"
+            latency_ms: Fixed/mean/median latency in milliseconds
+            latency_spread_ms: Half-width (uniform) or standard deviation (normal) in
+                               milliseconds; for lognormal, sigma is spread/mean
+            response_chars: Approximate size of each response output
+            items: Return a list of this many items instead of a single object (0 = object)
+            actions: Number of agent actions to include in object responses
+            streaming: Stream newline-delimited JSON chunks instead of one response
+            chunk_chars: Characters per streamed chunk
+            chunk_interval_ms: Delay between streamed chunks
+            error_rate: Fraction of requests answered with HTTP 500
+            timeout_rate: Fraction of requests that hang for timeout_seconds
+            timeout_seconds: How long a "timed out" request hangs
+            status_callbacks: Status updates posted to status_url per request
+            status_url: The status webhook URL
+            seed: Random seed for reproducible runs
+            recorded: Captured n8n records (see traffic_capture); when given,
+                      requests are answered with the recorded responses and
+                      latencies in turn instead of generated ones
+        """
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_spread_ms = latency_spread_ms
+        self.response_chars = response_chars
+        self.items = items
+        self.actions = actions
+        self.streaming = streaming
+        self.chunk_chars = chunk_chars
+        self.chunk_interval_ms = chunk_interval_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.status_callbacks = status_callbacks
+        self.status_url = status_url
+        self.random = random.Random(seed)
+        self.recorded = recorded or []
+        self._next_recorded = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {k: v for k, v in vars(self).items() if k not in ("random", "recorded") and not k.startswith("_")}
+        data["recorded"] = len(self.recorded)
+        return data
+
+    def next_recorded(self) -> Dict[str, Any]:
+        """The next captured n8n record, cycling through them."""
+        record = self.recorded[self._next_recorded % len(self.recorded)]
+        self._next_recorded += 1
+        return record
+
+    def sample_latency(self) -> float:
+        """Sample a response latency in seconds."""
+        mean = self.latency_ms
+        spread = self.latency_spread_ms
+        if self.latency == "uniform":
+            value = self.random.uniform(mean - spread, mean + spread)
+        elif self.latency == "normal":
+            value = self.random.gauss(mean, spread)
+        elif self.latency == "lognormal":
+            sigma = spread / mean if mean else 0.0
+            value = mean * self.random.lognormvariate(0.0, sigma)
+        else:
+            value = mean
+        return max(0.0, value) / 1000
+
+    def text(self, chars: Optional[int] = None) -> str:
+        """Generate filler text of roughly the given size."""
+        chars = self.response_chars if chars is None else chars
+        words = []
+        size = 0
+        while size < chars:
+            word = self.random.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+    def make_actions(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "type": self.random.choice(ACTION_TYPES),
+                "status": self.random.choice(ACTION_STATUSES),
+                "message": self.text(60)
+            }
+            for _ in range(self.actions)
+        ]
+
+    def make_response(self, payload: Dict[str, Any]) -> Any:
+        """Build a response body for a chat payload."""
+        if self.items:
+            return [{"output": self.text()} for _ in range(self.items)]
+        response = {"output": self.text()}
+        if self.actions:
+            response["actions"] = self.make_actions()
+        return response
+
+
+# Named profiles for common scenarios
+PROFILES: Dict[str, MockProfile] = {
+    "fast": MockProfile(latency="fixed", latency_ms=5, response_chars=200),
+    "typical": MockProfile(latency="lognormal", latency_ms=800, latency_spread_ms=400, response_chars=800),
+    "slow": MockProfile(latency="normal", latency_ms=5000, latency_spread_ms=1500, response_chars=2000),
+    "agent": MockProfile(latency="lognormal", latency_ms=1500, latency_spread_ms=600, actions=20, status_callbacks=5),
+    "multi": MockProfile(latency="uniform", latency_ms=500, latency_spread_ms=200, items=5),
+    "streaming": MockProfile(latency="fixed", latency_ms=300, streaming=True, response_chars=1500),
+    "flaky": MockProfile(latency="lognormal", latency_ms=800, latency_spread_ms=400, error_rate=0.1, timeout_rate=0.02)
+}
+
+
+def create_app(profile: MockProfile, webhook_path: str = DEFAULT_WEBHOOK_PATH) -> FastAPI:
+    """
+    Create the mock n8n ASGI app.
+
+    Args:
+        profile: The behaviour profile
+        webhook_path: The path of the chat webhook
+
+    Returns:
+        The FastAPI app; `app.state.stats` counts requests by outcome
+    """
+    app = FastAPI(title="Mock n8n Server")
+    app.state.profile = profile
+    app.state.stats = {"requests": 0, "errors": 0, "timeouts": 0, "status_callbacks": 0}
+
+    async def post_status_callbacks(payload: Dict[str, Any]) -> None:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=5) as client:
+            for i in range(profile.status_callbacks):
+                update = {
+                    "type": "progress",
+                    "title": "Mock workflow",
+                    "content": f"Step {i + 1} of {profile.status_callbacks}",
+                    "progress": int((i + 1) * 100 / profile.status_callbacks),
+                    "sessionID": payload.get("sessionID"),
+                    "traceID": payload.get("traceID")
+                }
+                try:
+                    await client.post(profile.status_url, json=update)
+                    app.state.stats["status_callbacks"] += 1
+                except Exception as e:
+                    logger.warning(f"Status callback failed: {str(e)}")
+
+    async def stream_chunks(chunks: List[Dict[str, Any]]):
+        for chunk in chunks:
+            yield json.dumps(chunk) + "\n"
+            await asyncio.sleep(profile.chunk_interval_ms / 1000)
+
+    def replay_response(record: Dict[str, Any]):
+        status_code = record.get("status_code") or 200
+        if status_code >= 400 or record.get("response") is None:
+            app.state.stats["errors"] += 1
+            return JSONResponse({"message": "Error in workflow"}, status_code=status_code if status_code >= 400 else 500)
+        if record.get("streamed"):
+            return StreamingResponse(stream_chunks(record["response"]), media_type="application/x-ndjson")
+        return JSONResponse(record["response"])
+
+    async def stream_response(text: str):
+        yield json.dumps({"type": "begin"}) + "\n"
+        for start in range(0, len(text), profile.chunk_chars):
+            yield json.dumps({"type": "item", "content": text[start:start + profile.chunk_chars]}) + "\n"
+            await asyncio.sleep(profile.chunk_interval_ms / 1000)
+        yield json.dumps({"type": "end"}) + "\n"
+
+    @app.post(webhook_path)
+    async def chat_webhook(request: Request):
+        """Answer a chat payload like the n8n workflow would"""
+        stats = app.state.stats
+        stats["requests"] += 1
+        payload = await request.json()
+
+        if profile.status_callbacks:
+            asyncio.create_task(post_status_callbacks(payload))
+
+        if profile.recorded:
+            record = profile.next_recorded()
+            await asyncio.sleep(record.get("duration_ms", 0) / 1000)
+            return replay_response(record)
+
+        roll = profile.random.random()
+        if roll < profile.timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(profile.timeout_seconds)
+        elif roll < profile.timeout_rate + profile.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(profile.sample_latency())
+            return JSONResponse({"message": "Error in workflow"}, status_code=500)
+
+        await asyncio.sleep(profile.sample_latency())
+
+        if profile.streaming:
+            return StreamingResponse(stream_response(profile.text()), media_type="application/x-ndjson")
+        return profile.make_response(payload)
+
+    @app.get("/healthz")
+    async def healthz():
+        """Health check endpoint"""
+        return {"status": "ok", "profile": profile.to_dict(), "stats": app.state.stats}
+
+    return app
+
+
+class MockN8NServer:
+    """Run the mock n8n app with uvicorn in a background thread."""
+
+    def __init__(self, profile: MockProfile, host: str = "127.0.0.1", port: int = 5678,
+                 webhook_path: str = DEFAULT_WEBHOOK_PATH):
+        self.profile = profile
+        self.host = host
+        self.port = port
+        self.webhook_path = webhook_path
+        self.app = create_app(profile, webhook_path)
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """The chat webhook URL to use as N8N_WEBHOOK_URL."""
+        return f"http://{self.host}:{self.port}{self.webhook_path}"
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self.app.state.stats
+
+    def start(self, timeout: float = 10.0) -> "MockN8NServer":
+        """Start the server and wait until it accepts connections."""
+        import uvicorn
+
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="mock-n8n", daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"Mock n8n server failed to start on {self.host}:{self.port}")
+            time.sleep(0.01)
+        logger.info(f"Mock n8n server listening on {self.url}")
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the server."""
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock n8n chat webhook")
+    parser.add_argument("--profile", default="typical", choices=sorted(PROFILES), help="Behaviour profile")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=5678, help="Port to bind")
+    parser.add_argument("--path", default=DEFAULT_WEBHOOK_PATH, help="Webhook path")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "normal", "lognormal"], help="Latency distribution")
+    parser.add_argument("--latency-ms", type=float, help="Mean latency in milliseconds")
+    parser.add_argument("--latency-spread-ms", type=float, help="Latency spread in milliseconds")
+    parser.add_argument("--response-chars", type=int, help="Response size in characters")
+    parser.add_argument("--items", type=int, help="Number of items in list responses")
+    parser.add_argument("--actions", type=int, help="Number of agent actions per response")
+    parser.add_argument("--streaming", action="store_true", help="Stream newline-delimited JSON chunks")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests failing with HTTP 500")
+    parser.add_argument("--timeout-rate", type=float, help="Fraction of requests that hang")
+    parser.add_argument("--status-callbacks", type=int, help="Status updates posted per request")
+    parser.add_argument("--status-url", help="Status webhook URL for callbacks")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    parser.add_argument("--replay", nargs="+", metavar="FILE",
+                        help="Answer with the n8n responses and latencies from capture files")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    for option in ["latency", "latency_ms", "latency_spread_ms", "response_chars", "items", "actions",
+                   "error_rate", "timeout_rate", "status_callbacks", "status_url"]:
+        value = getattr(args, option)
+        if value is not None:
+            setattr(profile, option, value)
+    if args.streaming:
+        profile.streaming = True
+    if args.seed is not None:
+        profile.random.seed(args.seed)
+    if args.replay:
+        import traffic_capture
+
+        profile.recorded = [r for r in traffic_capture.read_records(args.replay) if r.get("kind") == "n8n"]
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    import uvicorn
+    uvicorn.run(create_app(profile, args.path), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Pending Updates Module
+
+Holds status updates for chat sessions whose websocket went away, so a user who
+reconnects within `ttl` seconds gets them in one batch when the thread is
+resumed. Only sessions that were connected and then detached are buffered:
+updates for unknown sessions are still dropped, and a detached session that
+does not come back within its TTL is forgotten together with its updates. The
+owner calls `expire()` periodically so that happens on time even when no more
+updates arrive.
+
+Per session at most `max_updates` are kept (oldest dropped first). A `progress`
+update replaces the buffered progress update with the same title, so a resumed
+chat shows each step's latest progress instead of replaying every tick.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+import metrics
+
+
+class _Pending:
+    __slots__ = ("deadline", "updates", "seq")
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        # Key -> update, in arrival order; progress updates are keyed by title
+        self.updates: Dict[Any, Dict[str, Any]] = {}
+        self.seq = 0
+
+
+class PendingUpdates:
+    """Per-session buffers of undelivered status updates with a TTL and a size cap."""
+
+    def __init__(self, ttl: float = 300.0, max_updates: int = 200,
+                 on_expire: Optional[Callable[[str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the buffers.
+
+        Args:
+            ttl: Seconds a detached session's updates are kept
+            max_updates: Updates kept per session
+            on_expire: Called with the sessionID of a session that did not come back
+            clock: Monotonic time source
+        """
+        self.ttl = ttl
+        self.max_updates = max_updates
+        self.on_expire = on_expire
+        self.clock = clock
+        # Detached sessions in order of their deadline (the TTL is the same for all)
+        self._sessions: "OrderedDict[str, _Pending]" = OrderedDict()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def sessions(self) -> List[str]:
+        return list(self._sessions)
+
+    def detach(self, session_id: str) -> None:
+        """Start buffering updates for a session that just lost its connection."""
+        self.expire()
+        pending = self._sessions.pop(session_id, None)
+        if pending is None:
+            pending = _Pending(0.0)
+        pending.deadline = self.clock() + self.ttl
+        self._sessions[session_id] = pending
+
+    def add(self, update: Dict[str, Any]) -> bool:
+        """
+        Buffer an update for a detached session.
+
+        Returns:
+            False if the update's session is not detached (or already expired)
+        """
+        self.expire()
+        pending = self._sessions.get(update.get("sessionID"))
+        if pending is None:
+            return False
+
+        updates = pending.updates
+        if update.get("type") == "progress":
+            key = ("progress", update.get("title"))
+            if updates.pop(key, None) is not None:
+                self.count -= 1
+        else:
+            pending.seq += 1
+            key = pending.seq
+        updates[key] = update
+        self.count += 1
+
+        if len(updates) > self.max_updates:
+            del updates[next(iter(updates))]
+            self.count -= 1
+            metrics.STATUS_UNDELIVERED.labels("pending_overflow").inc()
+        metrics.STATUS_PENDING.set(self.count)
+        return True
+
+    def drain(self, session_id: str) -> List[Dict[str, Any]]:
+        """Return a detached session's updates so far, oldest first, and keep buffering."""
+        self.expire()
+        pending = self._sessions.get(session_id)
+        if pending is None or not pending.updates:
+            return []
+        updates = list(pending.updates.values())
+        pending.updates.clear()
+        self.count -= len(updates)
+        metrics.STATUS_PENDING.set(self.count)
+        return updates
+
+    def take(self, session_id: str) -> List[Dict[str, Any]]:
+        """Stop buffering for a session that came back and return its updates, oldest first."""
+        self.expire()
+        pending = self._sessions.pop(session_id, None)
+        if pending is None:
+            return []
+        self.count -= len(pending.updates)
+        metrics.STATUS_PENDING.set(self.count)
+        return list(pending.updates.values())
+
+    def expire(self) -> int:
+        """Forget sessions past their TTL. Returns the number of sessions forgotten."""
+        now = self.clock()
+        expired = 0
+        while self._sessions:
+            session_id, pending = next(iter(self._sessions.items()))
+            if pending.deadline > now:
+                break
+            del self._sessions[session_id]
+            expired += 1
+            if pending.updates:
+                self.count -= len(pending.updates)
+                metrics.STATUS_UNDELIVERED.labels("pending_expired").inc(len(pending.updates))
+                metrics.STATUS_PENDING.set(self.count)
+            if self.on_expire is not None:
+                self.on_expire(session_id)
+        return expired
@@ -0,0 +1,327 @@
+"""
+Profiling Module
+
+Low-overhead sampling profiler for chat turns and webhook handlers.
+
+A background thread samples the stacks of all threads every few milliseconds
+(`sys._current_frames()`), but only while something is being profiled. A turn
+is profiled by registering the frame of its `on_message` coroutine with
+`start()`; every sample whose stack contains that frame is attributed to the
+turn. Because coroutine frames are only on the stack while they run, a profile
+shows where the turn spent time on the event loop (JSON handling, logging,
+Chainlit sends, blocking calls such as `requests.post`), not time spent
+awaiting.
+
+Finished turn profiles are written to the profile directory as collapsed
+stacks (`<trace_id>.collapsed`, for flamegraph.pl / speedscope) or speedscope
+JSON. Webhook handler samples are aggregated and written periodically. A
+token bucket limits how many turns per minute are profiled so profiling can
+stay on in production.
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from toast_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("collapsed", "speedscope")
+
+
+class Profile:
+    """Samples collected for one turn or one aggregation period."""
+
+    __slots__ = ("name", "started", "stacks", "samples")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        # Collapsed stack (root first, ";"-separated) -> sample count
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def add(self, stack: str) -> None:
+        self.stacks[stack] += 1
+        self.samples += 1
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def render_collapsed(profile: Profile) -> str:
+    """Render a profile in the collapsed stack format ("a;b;c 12" per line)."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile.stacks.most_common())
+
+
+def render_speedscope(profile: Profile, interval: float) -> str:
+    """Render a profile as a speedscope sampled profile."""
+    frames: List[Dict[str, Any]] = []
+    index: Dict[str, int] = {}
+    samples = []
+    weights = []
+    for stack, count in profile.stacks.items():
+        indices = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                name, _, location = label.rpartition(" (")
+                file, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": name, "file": file, "line": int(line) if line.isdigit() else None})
+            indices.append(index[label])
+        samples.append(indices)
+        weights.append(count * interval)
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": profile.name,
+        "exporter": "chainfin-profiling",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": profile.name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }]
+    })
+
+
+class SamplingProfiler:
+    """Sample registered frames from a background thread and write the profiles."""
+
+    def __init__(self, directory: str, interval: float = 0.01, output_format: str = "collapsed",
+                 max_turns_per_minute: float = 6, max_files: int = 200, flush_interval: float = 60.0):
+        """
+        Initialize the profiler.
+
+        Args:
+            directory: Directory the profiles are written to
+            interval: Seconds between samples
+            output_format: "collapsed" or "speedscope"
+            max_turns_per_minute: Turn profiles allowed per minute
+            max_files: Profile files kept; the oldest are deleted
+            flush_interval: Seconds between writes of aggregated profiles
+        """
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown profile format: {output_format}")
+        self.directory = directory
+        self.interval = interval
+        self.output_format = output_format
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self.turn_limiter = TokenBucket(max_turns_per_minute / 60, max(1, int(max_turns_per_minute)), time.monotonic())
+        self.turns_profiled = 0
+        self.turns_skipped = 0
+        # id(frame) -> (frame, profile); the frame is kept so its id cannot be reused
+        self._targets: Dict[int, Tuple[Any, Profile]] = {}
+        self._aggregates: Dict[str, Profile] = {}
+        self._finished: "queue.SimpleQueue[Profile]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            os.makedirs(self.directory, exist_ok=True)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        self._thread = None
+
+    def register(self, frame, name: str, aggregate: bool = False) -> Optional[Profile]:
+        """
+        Attribute samples of a running frame to a profile.
+
+        Args:
+            frame: The frame of the coroutine or function to profile
+            name: The profile name (trace ID for turns, handler name for aggregates)
+            aggregate: Add to a shared profile written every flush_interval
+                       instead of a profile of its own
+
+        Returns:
+            The profile, or None if the turn rate limit skipped it
+        """
+        with self._lock:
+            if aggregate:
+                profile = self._aggregates.get(name)
+                if profile is None:
+                    profile = self._aggregates[name] = Profile(name)
+            elif self.turn_limiter.take(time.monotonic()):
+                profile = Profile(name)
+                self.turns_profiled += 1
+            else:
+                self.turns_skipped += 1
+                return None
+            self._targets[id(frame)] = (frame, profile)
+        return profile
+
+    def unregister(self, frame, aggregate: bool = False) -> None:
+        """Stop sampling a frame; a turn profile is handed to the writer."""
+        with self._lock:
+            target = self._targets.pop(id(frame), None)
+        if target is not None and not aggregate:
+            self._finished.put(target[1])
+
+    def sample(self) -> None:
+        """Take one sample of every thread whose stack contains a registered frame."""
+        targets = self._targets
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            labels = []
+            profile = None
+            while frame is not None:
+                if profile is None:
+                    target = targets.get(id(frame))
+                    if target is not None and target[0] is frame:
+                        profile = target[1]
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if profile is not None:
+                labels.reverse()
+                profile.add(";".join(labels))
+
+    def _write(self, profile: Profile, suffix: str = "") -> None:
+        if not profile.samples:
+            return
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(profile.started))
+        if self.output_format == "speedscope":
+            path = os.path.join(self.directory, f"{stamp}-{profile.name}{suffix}.speedscope.json")
+            text = render_speedscope(profile, self.interval)
+        else:
+            path = os.path.join(self.directory, f"{stamp}-{profile.name}{suffix}.collapsed")
+            text = render_collapsed(profile)
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            self._prune()
+        except OSError as e:
+            logger.error(f"Could not write profile {path}: {str(e)}")
+
+    def _prune(self) -> None:
+        files = sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory))
+        for path in files[:max(0, len(files) - self.max_files)]:
+            os.remove(path)
+
+    def _flush_aggregates(self) -> None:
+        with self._lock:
+            aggregates = [profile for profile in self._aggregates.values() if profile.samples]
+            for profile in aggregates:
+                self._aggregates[profile.name] = Profile(profile.name)
+        for profile in aggregates:
+            self._write(profile)
+
+    def _run(self) -> None:
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.wait(self.interval):
+            if self._targets:
+                try:
+                    self.sample()
+                except Exception as e:
+                    logger.error(f"Error sampling stacks: {str(e)}")
+            while True:
+                try:
+                    self._write(self._finished.get_nowait())
+                except queue.Empty:
+                    break
+            if time.monotonic() >= next_flush:
+                self._flush_aggregates()
+                next_flush = time.monotonic() + self.flush_interval
+        self._flush_aggregates()
+
+
+# The active profiler; None until configure() is called with a directory
+_profiler: Optional[SamplingProfiler] = None
+_enabled = False
+
+
+def configure(directory: Optional[str], enabled: bool = False, **options) -> None:
+    """
+    Set up the profiler.
+
+    Args:
+        directory: Directory profiles are written to (None disables profiling entirely)
+        enabled: Start sampling right away
+        **options: SamplingProfiler options (interval, output_format, max_turns_per_minute, ...)
+    """
+    global _profiler
+    set_enabled(False)
+    _profiler = SamplingProfiler(directory, **options) if directory else None
+    set_enabled(enabled)
+
+
+def set_enabled(enabled: bool) -> bool:
+    """Turn profiling on or off at runtime. Returns whether it is on."""
+    global _enabled
+    if _profiler is None:
+        _enabled = False
+        return False
+    if enabled and not _enabled:
+        _profiler.start()
+        logger.info(f"Profiling enabled, writing to {_profiler.directory}")
+    elif not enabled and _enabled:
+        _profiler.stop()
+        logger.info("Profiling disabled")
+    _enabled = enabled
+    return _enabled
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def status() -> Dict[str, Any]:
+    """Current profiler settings and counters."""
+    if _profiler is None:
+        return {"enabled": False, "configured": False}
+    return {
+        "enabled": _enabled,
+        "configured": True,
+        "directory": _profiler.directory,
+        "format": _profiler.output_format,
+        "interval_ms": _profiler.interval * 1000,
+        "turns_profiled": _profiler.turns_profiled,
+        "turns_skipped": _profiler.turns_skipped
+    }
+
+
+def start(name: str, aggregate: bool = False) -> Optional[Any]:
+    """
+    Start profiling the calling function or coroutine.
+
+    Args:
+        name: Profile name; the trace ID for turns, the handler name for aggregates
+        aggregate: Add the samples to a shared, periodically written profile
+
+    Returns:
+        A handle for stop(), or None when profiling is off or rate limited
+    """
+    if not _enabled:
+        return None
+    frame = sys._getframe(1)
+    if _profiler.register(frame, name, aggregate) is None:
+        return None
+    return (frame, aggregate)
+
+
+def stop(handle: Optional[Any]) -> None:
+    """Stop profiling started with start()."""
+    if handle is not None and _profiler is not None:
+        frame, aggregate = handle
+        _profiler.unregister(frame, aggregate)
@@ -0,0 +1,92 @@
+import { Card, CardContent } from "@/components/ui/card"
+import { Badge } from "@/components/ui/badge"
+import { useEffect, useState } from "react"
+
+export default function AgentTrace() {
+  // Get props with defaults
+  const title = props.title || "Agent Trace";
+  const actions = props.actions || [];
+  const expandable = props.expandable || false;
+
+  // State for animation and expansion
+  const [isVisible, setIsVisible] = useState(false);
+  const [isExpanded, setIsExpanded] = useState(!expandable);
+
+  // Animate on mount
+  useEffect(() => {
+    const timer = setTimeout(() => setIsVisible(true), 50);
+    return () => clearTimeout(timer);
+  }, []);
+
+  // Get badge variant based on action status
+  const getStatusVariant = (status) => {
+    switch(status) {
+      case "success": return "success";
+      case "warning": return "warning";
+      case "error": return "error";
+      case "info": return "info";
+      default: return "progress";
+    }
+  };
+
+  // Count actions per status for the summary line
+  const counts = actions.reduce((acc, action) => {
+    const status = action.status || "info";
+    acc[status] = (acc[status] || 0) + 1;
+    return acc;
+  }, {});
+
+  return (
+    <Card
+      className={`agent-trace my-2 border shadow-sm ${isVisible ? 'status-visible' : 'status-hidden'}`}
+    >
+      <CardContent className="p-3">
+        <div
+          className={`agent-trace-header flex items-center justify-between ${expandable ? 'cursor-pointer' : ''}`}
+          onClick={() => expandable && setIsExpanded(!isExpanded)}
+        >
+          <div className="flex items-center gap-2">
+            <i data-lucide="list-checks" className="h-4 w-4"></i>
+            <h4 className="agent-trace-title text-sm font-medium">{title}</h4>
+            <span className="text-xs text-muted-foreground">
+              {actions.length} {actions.length === 1 ? "action" : "actions"}
+            </span>
+          </div>
+          <div className="flex items-center gap-1">
+            {Object.keys(counts).map((status) => (
+              <Badge key={status} variant={getStatusVariant(status)} className={`status-badge badge-${status} text-xs`}>
+                {counts[status]} {status}
+              </Badge>
+            ))}
+            {expandable && (
+              <i data-lucide={isExpanded ? "chevron-up" : "chevron-down"} className="h-4 w-4 ml-1"></i>
+            )}
+          </div>
+        </div>
+
+        {isExpanded && actions.length > 0 && (
+          <div className="agent-trace-actions mt-2 space-y-1">
+            {actions.map((action, index) => (
+              <div key={index} className={`agent-trace-action status-${action.type} flex items-start gap-2 text-sm`}>
+                <div className="flex-shrink-0 mt-0.5">
+                  <i data-lucide={action.icon} className="h-4 w-4"></i>
+                </div>
+                <div className="flex-grow">
+                  <span className="font-medium">{action.label}</span>
+                  {action.message && (
+                    <span className="text-muted-foreground"> — {action.message}</span>
+                  )}
+                </div>
+                {action.status && (
+                  <Badge variant={getStatusVariant(action.status)} className={`status-badge badge-${action.status} text-xs flex-shrink-0`}>
+                    {action.status}
+                  </Badge>
+                )}
+              </div>
+            ))}
+          </div>
+        )}
+      </CardContent>
+    </Card>
+  );
+}
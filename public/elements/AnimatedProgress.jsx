@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card, CardContent } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 
@@ -10,7 +10,34 @@ export default function AnimatedProgress() {
   const title = props.title || "Processing";
   const message = props.message || "";
   const steps = props.steps || [];
-  const progress = props.progress || 0;
+  const serverProgress = props.progress || 0;
+  
+  // Interpolation hints: animate locally towards `target` until the next update
+  const target = props.target !== undefined && props.target !== null ? props.target : serverProgress;
+  const rate = props.eta ? (target - serverProgress) / props.eta : (props.rate || 0);
+  
+  const [progress, setProgress] = useState(serverProgress);
+  const frameRef = useRef(null);
+  
+  // Restart the local animation whenever the server sends an authoritative value
+  useEffect(() => {
+    const start = performance.now();
+    // Never move backwards because of an update that lags the local estimate
+    const base = Math.max(serverProgress, Math.min(progress, target));
+    setProgress(base);
+    
+    if (rate > 0 && base < target) {
+      const tick = (now) => {
+        const value = Math.min(target, base + rate * (now - start) / 1000);
+        setProgress(Math.round(value));
+        if (value < target) {
+          frameRef.current = requestAnimationFrame(tick);
+        }
+      };
+      frameRef.current = requestAnimationFrame(tick);
+    }
+    return () => cancelAnimationFrame(frameRef.current);
+  }, [serverProgress, target, rate]);
   
   // Animate on mount
   useEffect(() => {
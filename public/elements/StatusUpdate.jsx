@@ -1,7 +1,7 @@
 import { Card, CardContent } from "@/components/ui/card"
 import { Badge } from "@/components/ui/badge"
 import { Progress } from "@/components/ui/progress"
-import { useEffect, useState } from "react"
+import { useEffect, useRef, useState } from "react"
 
 export default function StatusUpdate() {
   // Get props with defaults
@@ -9,10 +9,42 @@ export default function StatusUpdate() {
   const icon = props.icon || "info";
   const title = props.title || "";
   const message = props.message || "";
-  const progress = props.progress || null;
+  const serverProgress = props.progress !== undefined ? props.progress : null;
+  
+  // Interpolation hints: animate locally towards `target` until the next update
+  const target = props.target !== undefined && props.target !== null ? props.target : serverProgress;
+  const rate = serverProgress !== null && props.eta
+    ? (target - serverProgress) / props.eta
+    : (props.rate || 0);
   
   // State for animation
   const [isVisible, setIsVisible] = useState(false);
+  const [progress, setProgress] = useState(serverProgress);
+  const frameRef = useRef(null);
+  
+  // Restart the local animation whenever the server sends an authoritative value
+  useEffect(() => {
+    if (serverProgress === null) {
+      setProgress(null);
+      return;
+    }
+    const start = performance.now();
+    // Never move backwards because of an update that lags the local estimate
+    const base = Math.max(serverProgress, Math.min(progress || 0, target));
+    setProgress(base);
+    
+    if (rate > 0 && base < target) {
+      const tick = (now) => {
+        const value = Math.min(target, base + rate * (now - start) / 1000);
+        setProgress(Math.round(value));
+        if (value < target) {
+          frameRef.current = requestAnimationFrame(tick);
+        }
+      };
+      frameRef.current = requestAnimationFrame(tick);
+    }
+    return () => cancelAnimationFrame(frameRef.current);
+  }, [serverProgress, target, rate]);
   
   // Animate on mount
   useEffect(() => {
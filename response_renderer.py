@@ -0,0 +1,276 @@
+"""
+Response Renderer Module
+
+Turns n8n responses into Chainlit messages. Items of a multi-item response and
+their elements are prepared concurrently (bounded by a semaphore) while the
+messages are still sent in response order, so the first item is displayed as
+soon as it is ready instead of waiting for the whole list.
+
+The "Thinking..." placeholder sent at the start of a turn is reused as the
+container of the first item: it is updated in place (or streamed into)
+instead of being removed and replaced by a new message. The render functions
+return the number of websocket sends they made so the caller can log the
+per-turn cost.
+"""
+
+import asyncio
+import base64
+import logging
+from pathlib import Path
+from typing import Any, List, Optional, AsyncIterator
+
+import chainlit as cl
+from chainlit.element import Element
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# n8n element "type" -> Chainlit element class
+ELEMENT_TYPES = {
+    "image": cl.Image,
+    "file": cl.File,
+    "pdf": cl.Pdf,
+    "audio": cl.Audio,
+    "video": cl.Video,
+    "text": cl.Text
+}
+
+def resolve_element_path(path: Any, root: Optional[str]) -> Optional[Path]:
+    """
+    Resolve the `path` of an element inside the directory files may be served from.
+
+    Element descriptions come from n8n (and the model behind it), so a path is
+    only honored if it names a file under `root` once symlinks and `..` are
+    resolved; anything else on the server's disk is refused.
+
+    Args:
+        path: The path from the element description, relative to `root`
+        root: The allowed directory (None or empty: local files are disabled)
+
+    Returns:
+        The file's resolved path, or None if it may not be served
+    """
+    if not root or not isinstance(path, str) or not path:
+        return None
+    base = Path(root).resolve()
+    candidate = (base / path).resolve()
+    if base not in candidate.parents or not candidate.is_file():
+        return None
+    return candidate
+
+async def build_element(spec: Any) -> Optional[Element]:
+    """
+    Build a Chainlit element from an n8n element description.
+
+    Local files (`path`, only under ELEMENT_FILES_DIR) and base64 payloads
+    (`content` with `encoding: base64`) are loaded in a worker thread so several
+    elements can be prepared at once.
+
+    Args:
+        spec: A dict such as {"type": "image", "url": "...", "name": "chart"}
+              or an already built Chainlit element
+
+    Returns:
+        The element, or None if the description is not usable
+    """
+    if isinstance(spec, Element):
+        return spec
+    if not isinstance(spec, dict):
+        logger.warning(f"Skipping unsupported element: {spec!r}")
+        return None
+
+    element_class = ELEMENT_TYPES.get(str(spec.get("type", "file")).lower())
+    if element_class is None:
+        logger.warning(f"Skipping element with unknown type: {spec.get('type')}")
+        return None
+
+    kwargs = {
+        "name": spec.get("name", spec.get("type", "element")),
+        "display": spec.get("display", "inline")
+    }
+    if spec.get("mime"):
+        kwargs["mime"] = spec["mime"]
+
+    if spec.get("url"):
+        kwargs["url"] = spec["url"]
+    elif spec.get("path"):
+        path = resolve_element_path(spec["path"], config.ELEMENT_FILES_DIR)
+        if path is None:
+            logger.warning(f"Refusing element path outside ELEMENT_FILES_DIR: {spec['path']!r}")
+            return None
+        kwargs["content"] = await asyncio.to_thread(path.read_bytes)
+    elif spec.get("content") is not None:
+        content = spec["content"]
+        if spec.get("encoding") == "base64":
+            content = await asyncio.to_thread(base64.b64decode, content)
+        kwargs["content"] = content
+    else:
+        logger.warning(f"Skipping element without url, path or content: {kwargs['name']}")
+        return None
+
+    return element_class(**kwargs)
+
+def _spec_name(spec: Any) -> str:
+    return str(spec.get("name", spec.get("type"))) if isinstance(spec, dict) else repr(spec)
+
+async def prepare_message(item: Any, extra_elements: Optional[List[Element]] = None) -> Optional[cl.Message]:
+    """
+    Prepare (but do not send) the message for one response item.
+
+    Args:
+        item: A response item, normally a dict with "output" and "elements"
+        extra_elements: Elements to attach after the item's own elements
+
+    Returns:
+        The message, or None if the item has nothing to display
+    """
+    if not isinstance(item, dict):
+        return cl.Message(content=str(item), author="Assistant")
+
+    output = item.get("output", "")
+    specs = item.get("elements", [])
+    built = await asyncio.gather(*[build_element(spec) for spec in specs], return_exceptions=True)
+    elements = []
+    for spec, element in zip(specs, built):
+        # One broken element must not cost the whole reply
+        if isinstance(element, Exception):
+            logger.warning(f"Skipping element that failed to load: {_spec_name(spec)}: {str(element)}")
+        elif element is not None:
+            elements.append(element)
+    elements.extend(extra_elements or [])
+
+    if not output and not elements:
+        return None
+    return cl.Message(content=output, elements=elements, author="Assistant")
+
+async def fill_placeholder(placeholder: cl.Message, item: Any, extra_elements: Optional[List[Element]] = None) -> int:
+    """
+    Turn an already sent placeholder message into the response for one item.
+
+    Args:
+        placeholder: The sent "Thinking..." message
+        item: A response item, normally a dict with "output" and "elements"
+        extra_elements: Elements to attach after the item's own elements
+
+    Returns:
+        The number of websocket sends made
+    """
+    prepared = await prepare_message(item, extra_elements)
+    if prepared is None:
+        await placeholder.remove()
+        return 1
+    return await _adopt(placeholder, prepared)
+
+async def _adopt(placeholder: cl.Message, prepared: cl.Message) -> int:
+    """Move the content and elements of a prepared message into the placeholder."""
+    placeholder.content = prepared.content
+    placeholder.elements = prepared.elements
+    # The placeholder already exists in the UI, so elements can attach to it directly
+    results = await asyncio.gather(
+        *[element.send(for_id=placeholder.id) for element in prepared.elements],
+        return_exceptions=True
+    )
+    sent = []
+    for element, result in zip(prepared.elements, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Skipping element that failed to send: {element.name}: {str(result)}")
+        else:
+            sent.append(element)
+    # Message.update() would send every element again
+    placeholder.elements = []
+    await placeholder.update()
+    placeholder.elements = sent
+    return 1 + len(results)
+
+async def set_placeholder_content(placeholder: cl.Message, content: str) -> int:
+    """
+    Replace the content of a placeholder message in place.
+
+    Args:
+        placeholder: The sent "Thinking..." message
+        content: The new content
+
+    Returns:
+        The number of websocket sends made
+    """
+    placeholder.content = content
+    await placeholder.update()
+    return 1
+
+async def replace_with_error(placeholder: cl.Message, content: str) -> int:
+    """
+    Replace a placeholder with a System error message.
+
+    Errors keep their own styling rather than reading as an assistant answer,
+    so the placeholder is removed and the error sent in its place.
+
+    Args:
+        placeholder: The sent "Thinking..." message
+        content: The error text
+
+    Returns:
+        The number of websocket sends made
+    """
+    await placeholder.remove()
+    await cl.Message(content=content, author="System", type="error").send()
+    return 2
+
+async def stream_into_placeholder(placeholder: cl.Message, tokens: AsyncIterator[str]) -> int:
+    """
+    Stream tokens into a placeholder message, replacing its "Thinking..." text.
+
+    Args:
+        placeholder: The sent "Thinking..." message
+        tokens: An async iterator of text chunks
+
+    Returns:
+        The number of websocket sends made
+    """
+    placeholder.content = ""
+    sends = 0
+    async for token in tokens:
+        await placeholder.stream_token(token)
+        sends += 1
+    await placeholder.update()
+    return sends + 1
+
+async def render_items(items: List[Any], concurrency: int = 4, placeholder: Optional[cl.Message] = None) -> int:
+    """
+    Render a multi-item response in order, preparing items concurrently.
+
+    Args:
+        items: The response items
+        concurrency: Maximum number of items prepared at the same time
+        placeholder: An already sent message to reuse for the first item;
+                     the remaining items are appended after it
+
+    Returns:
+        The number of websocket sends made
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def prepare(item):
+        async with semaphore:
+            return await prepare_message(item)
+
+    tasks = [asyncio.create_task(prepare(item)) for item in items]
+    sends = 0
+    try:
+        # Send strictly in response order; later items keep preparing meanwhile
+        for task in tasks:
+            msg = await task
+            if msg and placeholder is not None:
+                sends += await _adopt(placeholder, msg)
+                placeholder = None
+            elif msg:
+                await msg.send()
+                sends += 1 + len(msg.elements)
+        if placeholder is not None:
+            # Nothing in the response was displayable
+            await placeholder.remove()
+            sends += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+    return sends
@@ -1,5 +1,9 @@
 """
 Health check script for the Chainlit application.
+
+Queries the /livez and /readyz probes served by the running application
+(status webhook server, HEALTH_URL) instead of inspecting processes or
+calling n8n.
 """
 
 import os
@@ -8,7 +12,6 @@ import json
 import requests
 import time
 import logging
-from config import N8N_WEBHOOK_URL, REQUEST_TIMEOUT
 
 # Configure logging
 logging.basicConfig(
@@ -17,63 +20,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def check_n8n_connection():
-    """Check if the n8n webhook is accessible."""
-    try:
-        # Make a simple HEAD request to check if the webhook is accessible
-        response = requests.head(
-            N8N_WEBHOOK_URL,
-            timeout=REQUEST_TIMEOUT / 2  # Use a shorter timeout for the health check
-        )
-        
-        # Return True if the status code is 2xx or 3xx
-        return 200 <= response.status_code < 400
-    
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error connecting to n8n webhook: {str(e)}")
-        return False
+# The status webhook server serves the application's probes
+HEALTH_URL = os.getenv("HEALTH_URL", "http://localhost:5679")
 
-def check_chainlit_process():
-    """Check if the Chainlit process is running."""
+def query_probe(path):
+    """Query a probe endpoint. Returns (ok, checks)."""
     try:
-        # This is a simple check that looks for a running process with 'chainlit' in the name
-        # This approach is platform-dependent and may need to be adjusted
-        if sys.platform.startswith('win'):
-            # Windows
-            import subprocess
-            output = subprocess.check_output('tasklist', shell=True).decode()
-            return 'chainlit' in output.lower()
-        else:
-            # Unix-like systems
-            import subprocess
-            output = subprocess.check_output(['ps', 'aux']).decode()
-            return 'chainlit run app.py' in output
-    
-    except Exception as e:
-        logger.error(f"Error checking Chainlit process: {str(e)}")
-        return False
+        response = requests.get(f"{HEALTH_URL}{path}", timeout=2)
+        return response.status_code == 200, response.json().get("checks", {})
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error querying {path}: {str(e)}")
+        return False, {}
 
 def run_health_check():
-    """Run a comprehensive health check and return the results."""
+    """Run a health check against /livez and /readyz and return the results."""
+    alive, live_checks = query_probe("/livez")
+    ready, ready_checks = query_probe("/readyz")
     results = {
         "timestamp": time.time(),
-        "n8n_connection": check_n8n_connection(),
-        "chainlit_process": check_chainlit_process(),
-        "overall_status": "healthy"
+        "alive": alive,
+        "ready": ready,
+        "checks": dict(live_checks, **ready_checks),
+        "overall_status": "healthy" if alive and ready else "unhealthy"
     }
-    
-    # If any check fails, mark the overall status as unhealthy
-    if not all([results["n8n_connection"], results["chainlit_process"]]):
-        results["overall_status"] = "unhealthy"
-    
     return results
 
 def print_health_check_results(results):
     """Print the health check results in a human-readable format."""
     print("\n=== Health Check Results ===")
     print(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(results['timestamp']))}")
-    print(f"n8n Connection: {'✅' if results['n8n_connection'] else '❌'}")
-    print(f"Chainlit Process: {'✅' if results['chainlit_process'] else '❌'}")
+    print(f"Alive: {'✅' if results['alive'] else '❌'}")
+    print(f"Ready: {'✅' if results['ready'] else '❌'}")
+    for name, check in results["checks"].items():
+        details = ", ".join(f"{k}={v}" for k, v in check.items() if k != "ok")
+        print(f"  {name}: {'✅' if check.get('ok') else '❌'} {details}")
     print(f"Overall Status: {'✅ HEALTHY' if results['overall_status'] == 'healthy' else '❌ UNHEALTHY'}")
     print("===========================\n")
 
@@ -0,0 +1,130 @@
+"""
+Traffic replay script.
+
+Replays traffic recorded by traffic_capture.py (TRAFFIC_CAPTURE_DIR) against a
+local instance: `/status` bodies are posted to the status webhook and n8n
+requests to the n8n webhook, keeping the recorded spacing at 1x, scaled by
+--speed, or as fast as possible with --speed max.
+
+To serve the recorded n8n responses to the chat path instead, run
+`python mock_n8n_server.py --replay <capture files>`.
+
+Usage:
+    python scripts/replay_traffic.py logs/capture/                # 1x, all kinds
+    python scripts/replay_traffic.py logs/capture/ --speed 10 --kinds status
+    python scripts/replay_traffic.py capture-....ndjson.gz --speed max
+    python scripts/replay_traffic.py logs/capture/ --export-schedule status.ndjson
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import traffic_capture
+
+def load(paths, kinds):
+    """Load the records of the given kinds from capture files and directories, in time order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(traffic_capture.capture_files(path))
+        else:
+            files.append(path)
+    records = [record for record in traffic_capture.read_records(files) if record.get("kind") in kinds]
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+def export_schedule(records, path):
+    """Write the status records as a schedule for benchmarks/status_ingest.py."""
+    status = [record for record in records if record["kind"] == "status"]
+    origin = status[0]["ts"] if status else 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in status:
+            f.write(json.dumps({"offset": record["ts"] - origin, "update": record["body"]}) + "\n")
+    print(f"Wrote {len(status)} status updates to {path}")
+
+async def replay(records, speed, status_url, n8n_url, concurrency, timeout):
+    """Send the records on their (scaled) schedule and collect the outcomes."""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    codes = {"status": Counter(), "n8n": Counter()}
+    latencies = {"status": [], "n8n": []}
+
+    async def send(http, record):
+        kind = record["kind"]
+        url, body = (status_url, record["body"]) if kind == "status" else (n8n_url, record["request"])
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                response = await http.post(url, json=body)
+                codes[kind][response.status_code] += 1
+            except Exception as e:
+                codes[kind][type(e).__name__] += 1
+            latencies[kind].append(time.monotonic() - start)
+
+    origin = records[0]["ts"]
+    start = time.monotonic()
+    tasks = []
+    async with httpx.AsyncClient(timeout=timeout) as http:
+        for record in records:
+            if speed:
+                delay = (record["ts"] - origin) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(http, record)))
+        await asyncio.gather(*tasks)
+    return codes, latencies, time.monotonic() - start
+
+def print_report(codes, latencies, wall):
+    print(f"Replayed in {wall:.1f} s")
+    for kind in ("status", "n8n"):
+        values = latencies[kind]
+        if not values:
+            continue
+        cuts = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+        print(f"  {kind:7} {len(values):6d} requests  {len(values) / wall:8.1f}/s  "
+              f"p50 {cuts[49] * 1000:7.1f} ms  p95 {cuts[94] * 1000:7.1f} ms  "
+              f"responses {dict(codes[kind])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a local instance")
+    parser.add_argument("paths", nargs="*", help="Capture files or directories (default: TRAFFIC_CAPTURE_DIR)")
+    parser.add_argument("--speed", default="1", help="Replay speed factor, or 'max' for no delays")
+    parser.add_argument("--kinds", default="status,n8n", help="Record kinds to replay")
+    parser.add_argument("--status-url", default="http://localhost:5679/status", help="Status webhook URL")
+    parser.add_argument("--n8n-url", default=config.N8N_WEBHOOK_URL, help="n8n webhook URL")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=config.REQUEST_TIMEOUT, help="Request timeout in seconds")
+    parser.add_argument("--export-schedule", help="Write status records as a status_ingest schedule and exit")
+    args = parser.parse_args()
+
+    paths = args.paths or [config.TRAFFIC_CAPTURE_DIR]
+    if not any(paths):
+        parser.error("No capture files given and TRAFFIC_CAPTURE_DIR is not set")
+    records = load(paths, set(args.kinds.split(",")))
+    if not records:
+        print("No records found")
+        return
+
+    if args.export_schedule:
+        export_schedule(records, args.export_schedule)
+        return
+
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+    print(f"Replaying {len(records)} records at {'max speed' if not speed else f'{speed:g}x'}")
+    codes, latencies, wall = asyncio.run(
+        replay(records, speed, args.status_url, args.n8n_url, args.concurrency, args.timeout)
+    )
+    print_report(codes, latencies, wall)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Status bus broker.
+
+Run one broker per host when several Chainlit workers share the `unix` status
+bus (STATUS_BUS=unix). Workers connect to its Unix socket, claim the sessions
+of their chats, and the broker forwards each status update to the worker that
+owns the update's sessionID.
+
+Usage:
+    python scripts/status_bus_broker.py
+    python scripts/status_bus_broker.py --path /run/chainfin/status-bus.sock
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import status_bus
+
+def main():
+    parser = argparse.ArgumentParser(description="Forward status updates between Chainlit workers")
+    parser.add_argument("--path", default=os.getenv("STATUS_BUS_URL", status_bus.DEFAULT_SOCKET_PATH),
+                        help="Unix socket path (default: STATUS_BUS_URL or %(default)s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    broker = status_bus.Broker(args.path)
+    try:
+        asyncio.run(broker.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.path):
+            os.remove(args.path)
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,19 @@
+"""
+Standalone status webhook server.
+
+Without options, updates are logged and queued in this process as before. With
+--forward ring|pipe, this process becomes the status ingestor of a running
+Chainlit app (STATUS_INGEST=ring|pipe): it validates each /status update and
+passes it pre-serialized to the app over shared memory or a pipe (see
+ingest_channel.py), so the app spends no CPU on HTTP or JSON parsing.
+
+Usage:
+    python scripts/status_webhook_server.py
+    python scripts/status_webhook_server.py --forward ring --port 5679
+    python scripts/status_webhook_server.py --forward pipe --address /tmp/chainfin-status-ingest.sock
+"""
+
+import argparse
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -20,6 +36,12 @@ except ImportError:
     status_updates = None
     cl = None
 
+# The ingest channel lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ingest_channel
+import status_scheduler
+from dedupe import DedupeCache, idempotency_key
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,6 +64,18 @@ app.add_middleware(
 # In-memory queue for status updates
 status_update_queue: List[Dict[str, Any]] = []
 
+# The channel to the Chainlit app with --forward; None keeps the local queue
+producer: Optional[ingest_channel.IngestProducer] = None
+
+# Results of forwarded requests by idempotency key, so n8n retries are not forwarded twice
+dedupe = DedupeCache(float(os.getenv("IDEMPOTENCY_WINDOW", "600")), int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000")))
+
+# Shortest allowed `every` of scheduled updates (as SCHEDULER_MIN_INTERVAL of the app)
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "1"))
+
+# Maps a client's type to an accepted one (status_webhook_integration.normalize_status_type)
+normalize_status_type = None
+
 # Status update types mapping to functions
 STATUS_TYPE_MAPPING = {
     "progress": "progress_status",
@@ -111,6 +145,8 @@ async def startup_event():
 # Webhook endpoint to receive status updates
 @app.post("/status")
 async def status_webhook(request: Request):
+    if producer is not None:
+        return forward_status_update(await request.body(), request.headers)
     try:
         data = await request.json()
         logger.info(f"Received status update: {data}")
@@ -133,11 +169,64 @@ async def status_webhook(request: Request):
         logger.error(f"Error processing webhook: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
 
+def forward_status_update(body: bytes, headers: Any) -> Dict[str, Any]:
+    """Validate an update and pass it, pre-serialized, to the Chainlit app"""
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Status update must be a JSON object")
+    try:
+        key = idempotency_key(headers, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    original = dedupe.get(key) if key is not None else None
+    if original is not None:
+        # A retry: answered as before, not forwarded again
+        return original
+    data["type"] = normalize_status_type(data.get("type", "info"))
+    # Scheduling errors are answered here: once forwarded, the update cannot be refused
+    try:
+        scheduled = status_scheduler.parse_schedule(dict(data), SCHEDULER_MIN_INTERVAL) is not None
+    except status_scheduler.ScheduleError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if scheduled and producer.scheduler_full():
+        raise HTTPException(status_code=503, detail="Too many scheduled updates, retry later")
+    
+    if not producer.send(ingest_channel.encode_update(data)):
+        # The app is not keeping up (ring full); n8n retries
+        raise HTTPException(status_code=503, detail="Status updates are backing up, retry later")
+    result = {"status": "success", "message": "Status update received", "forwarded": producer.kind}
+    if key is not None:
+        dedupe.put(key, result)
+    return result
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
+    if producer is not None:
+        return {"status": "healthy", "forward": producer.kind, "sent": producer.sent, "dropped": producer.dropped,
+                "duplicates": dedupe.hits}
     return {"status": "healthy", "queue_size": len(status_update_queue)}
 
 # Run the FastAPI app with uvicorn when executed directly
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=5679) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Status webhook server")
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=5679, help="Port to bind")
+    parser.add_argument("--forward", choices=ingest_channel.CHANNELS,
+                        help="Pass updates to the Chainlit app over shared memory (ring) or a pipe")
+    parser.add_argument("--address", help="Shared memory name or socket path (default: STATUS_INGEST_ADDRESS or the channel default)")
+    parser.add_argument("--worker", help="WORKER_ID of the Chainlit worker to forward to, with STATUS_BUS set")
+    args = parser.parse_args()
+    
+    if args.forward:
+        from status_webhook_integration import normalize_status_type
+        
+        address = args.address or os.getenv("STATUS_INGEST_ADDRESS") or ingest_channel.default_address(args.forward, args.worker)
+        logger.info(f"Waiting for the Chainlit app on {args.forward} ({address})")
+        producer = ingest_channel.IngestProducer(args.forward, address)
+        logger.info(f"Forwarding status updates to the Chainlit app over {args.forward}")
+    
+    uvicorn.run(app, host=args.host, port=args.port)
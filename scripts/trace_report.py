@@ -0,0 +1,68 @@
+"""
+Trace report script.
+
+Breaks a chat turn down by stage using the spans written to the trace file
+(see tracing.py). Without a trace ID, the slowest turns are listed.
+
+Usage:
+    python scripts/trace_report.py                 # list the 10 slowest turns
+    python scripts/trace_report.py <trace_id>      # show the stages of one turn
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+def load_spans(path):
+    """Load all spans from the trace file, grouped by trace ID."""
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+def print_slowest(traces, limit):
+    """Print the slowest turns."""
+    turns = [span for spans in traces.values() for span in spans if span["name"] == "turn"]
+    turns.sort(key=lambda span: span["duration_ms"], reverse=True)
+    print(f"{'trace_id':34} {'duration_ms':>12}  session")
+    for turn in turns[:limit]:
+        print(f"{turn['trace_id']:34} {turn['duration_ms']:12.1f}  {turn['attributes'].get('session_id', '')}")
+
+def print_trace(spans):
+    """Print the stages of one trace in start order, relative to the first span."""
+    spans = sorted(spans, key=lambda span: span["start"])
+    origin = spans[0]["start"]
+    print(f"{'offset_ms':>10} {'duration_ms':>12}  stage")
+    for span in spans:
+        offset = (span["start"] - origin) * 1000
+        attributes = " ".join(f"{k}={v}" for k, v in span["attributes"].items())
+        print(f"{offset:10.1f} {span['duration_ms']:12.1f}  {span['name']} {attributes}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Break chat turns down by stage")
+    parser.add_argument("trace_id", nargs="?", help="Trace ID to show")
+    parser.add_argument("--file", default=config.TRACE_FILE, help="Trace file (default: TRACE_FILE)")
+    parser.add_argument("--limit", type=int, default=10, help="Number of slowest turns to list")
+    args = parser.parse_args()
+
+    traces = load_spans(args.file)
+    if args.trace_id:
+        if args.trace_id not in traces:
+            print(f"Trace not found: {args.trace_id}")
+            sys.exit(1)
+        print_trace(traces[args.trace_id])
+    else:
+        print_slowest(traces, args.limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Session State Module
+
+All per-session chat state in one slotted object, stored under a single
+`cl.user_session` key instead of a dozen string keys (provider, model, the
+four mode flags, custom widgets and one key per custom toggle).
+
+The object keeps the n8n payload as a cached template. Settings updates and
+widget commands patch the template, so building the payload for a message is
+one dict copy plus the two per-turn fields.
+
+Every change bumps `version`, so the session store (see session_store.py) only
+saves states that actually changed.
+"""
+
+from typing import Dict, Any, Optional
+
+# The cl.user_session key the state is stored under
+SESSION_KEY = "state"
+
+# The built-in mode switches, in the order they are shown and sent
+MODE_FLAGS = ("reasoning_mode", "privacy_mode", "deep_research_mode", "web_search_mode")
+
+# Sampling parameters sent with every request
+TEMPERATURE = 0.7
+MAX_TOKENS = 2048
+
+
+class SessionState:
+    """The chat state of one session."""
+
+    __slots__ = (
+        "session_id", "thread_id", "version", "provider", "model", "chat_profile",
+        "reasoning_mode", "privacy_mode", "deep_research_mode", "web_search_mode",
+        "custom_widgets", "toggles", "_template"
+    )
+
+    def __init__(self, session_id: str, provider: Optional[str] = None, model: Optional[str] = None,
+                 chat_profile: Optional[str] = None, thread_id: Optional[str] = None):
+        """
+        Initialize the state.
+
+        Args:
+            session_id: The session ID sent to n8n
+            provider: The model provider
+            model: The model ID
+            chat_profile: The name of the selected chat profile
+            thread_id: The Chainlit thread ID the state is stored under
+        """
+        self.session_id = session_id
+        self.thread_id = thread_id
+        self.version = 0
+        self.provider = provider
+        self.model = model
+        self.chat_profile = chat_profile
+        self.reasoning_mode = False
+        self.privacy_mode = False
+        self.deep_research_mode = False
+        self.web_search_mode = False
+        # Widget ID -> widget info ({"type", "label", "icon", "description", ...})
+        self.custom_widgets: Dict[str, Dict[str, Any]] = {}
+        # Custom toggle ID -> value
+        self.toggles: Dict[str, bool] = {}
+        # chatInput and traceID come first and are filled in per message
+        self._template: Dict[str, Any] = {
+            "chatInput": None,
+            "sessionID": session_id,
+            "traceID": None,
+            "provider": provider,
+            "model": model,
+            "temperature": TEMPERATURE,
+            "max_tokens": MAX_TOKENS
+        }
+        for flag in MODE_FLAGS:
+            self._template[flag] = False
+
+    def modes(self) -> Dict[str, bool]:
+        """The built-in mode flags by name."""
+        return {flag: getattr(self, flag) for flag in MODE_FLAGS}
+
+    def update_modes(self, settings: Dict[str, Any]) -> None:
+        """Take the mode flags from a chat settings dict; missing flags are off."""
+        for flag in MODE_FLAGS:
+            value = bool(settings.get(flag, False))
+            if getattr(self, flag) != value:
+                setattr(self, flag, value)
+                self._template[flag] = value
+                self.version += 1
+
+    def set_model(self, provider: Optional[str], model: Optional[str]) -> None:
+        if (provider, model) != (self.provider, self.model):
+            self.provider = provider
+            self.model = model
+            self._template["provider"] = provider
+            self._template["model"] = model
+            self.version += 1
+
+    def set_profile(self, chat_profile: Optional[str]) -> None:
+        if chat_profile != self.chat_profile:
+            self.chat_profile = chat_profile
+            self.version += 1
+
+    def add_widget(self, widget_id: str, info: Dict[str, Any]) -> None:
+        """Add a custom widget; toggles start off and are sent with every request."""
+        self.custom_widgets[widget_id] = info
+        self.version += 1
+        if info.get("type") == "toggle":
+            self.set_toggle(widget_id, self.toggles.get(widget_id, False))
+
+    def set_toggle(self, widget_id: str, value: bool) -> None:
+        value = bool(value)
+        if self.toggles.get(widget_id) != value:
+            self.toggles[widget_id] = value
+            self._template[widget_id] = value
+            self.version += 1
+
+    def get_toggle(self, widget_id: str) -> bool:
+        return self.toggles.get(widget_id, False)
+
+    def build_payload(self, chat_input: str, trace_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the n8n request payload for a message.
+
+        Args:
+            chat_input: The message text
+            trace_id: The trace ID of the turn
+
+        Returns:
+            A new payload dict (the template is not modified)
+        """
+        payload = self._template.copy()
+        payload["chatInput"] = chat_input
+        payload["traceID"] = trace_id
+        return payload
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A JSON-serializable snapshot of the state."""
+        return {
+            "session_id": self.session_id,
+            "thread_id": self.thread_id,
+            "provider": self.provider,
+            "model": self.model,
+            "chat_profile": self.chat_profile,
+            "modes": self.modes(),
+            "custom_widgets": {widget_id: dict(info) for widget_id, info in self.custom_widgets.items()},
+            "toggles": dict(self.toggles)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionState":
+        """Rebuild a state (and its payload template) from to_dict() output."""
+        state = cls(data["session_id"], data.get("provider"), data.get("model"),
+                    data.get("chat_profile"), data.get("thread_id"))
+        state.update_modes(data.get("modes", {}))
+        for widget_id, info in data.get("custom_widgets", {}).items():
+            state.add_widget(widget_id, info)
+        for widget_id, value in data.get("toggles", {}).items():
+            state.set_toggle(widget_id, value)
+        state.version = 0
+        return state
@@ -0,0 +1,326 @@
+"""
+Session Store Module
+
+Persists the per-session state (modes, selected profile, custom widgets) so it
+survives reconnects and process restarts.
+
+The store has two layers:
+
+- an in-memory LRU front keyed by Chainlit thread ID, which also evicts idle
+  sessions so memory stays bounded at high session counts
+- a pluggable backend (`sqlite` in WAL mode, or `memory`) written by a
+  background thread in batched transactions, so the chat path only takes a
+  small snapshot of a changed state and never waits on disk
+
+States are restored lazily: `load()` is only called from `on_chat_resume`.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from session_state import SessionState
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Keep snapshots in a dict (lost on restart); for tests and single-run setups."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.rows.get(key)
+
+    def save_many(self, snapshots: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            self.rows.update(snapshots)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.rows.pop(key, None)
+
+    def prune(self, max_age: float) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """Keep snapshots as JSON rows in a SQLite database in WAL mode."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Used from the writer thread and from load() calls in worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL lets readers (and other worker processes) proceed while a batch is written
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_state ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM session_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, snapshots: Dict[str, Dict[str, Any]]) -> None:
+        now = time.time()
+        rows = [(key, json.dumps(snapshot), now) for key, snapshot in snapshots.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO session_state (key, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM session_state WHERE key = ?", (key,))
+
+    def prune(self, max_age: float) -> int:
+        """Delete states not written for max_age seconds. Returns the number deleted."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM session_state WHERE updated_at < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Backends by name; other backends only need load/save_many/delete/prune/close
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "memory": MemoryBackend
+}
+
+
+class SessionStore:
+    """An LRU front with idle eviction over a backend written in batches."""
+
+    def __init__(self, backend, max_entries: int = 1000, idle_timeout: float = 1800.0,
+                 flush_interval: float = 1.0, clock=time.monotonic):
+        """
+        Initialize the store.
+
+        Args:
+            backend: A backend instance (see BACKENDS)
+            max_entries: States kept in memory at most
+            idle_timeout: Seconds without activity after which a state is dropped from memory
+            flush_interval: Seconds between batched backend writes
+            clock: Time source (for tests)
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.clock = clock
+        # key -> [state, last access, version of the last snapshot]
+        self._front: "OrderedDict[str, List[Any]]" = OrderedDict()
+        # key -> snapshot waiting to be written
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+        self.evictions = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-store", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Write pending snapshots and stop the writer."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+        self.flush()
+        self.backend.close()
+
+    def __len__(self) -> int:
+        return len(self._front)
+
+    def touch(self, state: SessionState) -> None:
+        """
+        Record activity on a state and queue a snapshot if it changed.
+
+        Cheap enough for every handler: a dict move, and a small to_dict() only
+        when the state's version moved since the last snapshot.
+        """
+        key = state.thread_id
+        if key is None:
+            return
+        with self._lock:
+            entry = self._front.get(key)
+            if entry is None or entry[0] is not state:
+                # A state object seen for the first time is saved once even if
+                # unchanged: a replacement may share the old object's version
+                entry = self._front[key] = [state, 0.0, -1]
+            self._front.move_to_end(key)
+            entry[1] = self.clock()
+            if state.version != entry[2]:
+                entry[2] = state.version
+                self._dirty[key] = state.to_dict()
+            evict = len(self._front) > self.max_entries
+        if evict:
+            self.evict()
+
+    def release(self, state: SessionState) -> None:
+        """Drop a state from memory (e.g. when its chat ends), saving it first if it changed."""
+        self.touch(state)
+        with self._lock:
+            self._front.pop(state.thread_id, None)
+
+    def get(self, key: str) -> Optional[SessionState]:
+        """
+        Return the state of a thread: from memory, a pending snapshot, or the backend.
+
+        May read from disk, so call it from a worker thread (asyncio.to_thread).
+        """
+        with self._lock:
+            entry = self._front.get(key)
+            if entry is not None:
+                self._front.move_to_end(key)
+                entry[1] = self.clock()
+                return entry[0]
+            snapshot = self._dirty.get(key)
+        if snapshot is None:
+            try:
+                snapshot = self.backend.load(key)
+            except Exception as e:
+                logger.error(f"Error loading session state {key}: {str(e)}")
+                return None
+        if snapshot is None:
+            return None
+        state = SessionState.from_dict(snapshot)
+        state.thread_id = key
+        with self._lock:
+            self._front[key] = [state, self.clock(), state.version]
+        return state
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._front.pop(key, None)
+            self._dirty.pop(key, None)
+        self.backend.delete(key)
+
+    def evict(self) -> int:
+        """Drop idle states and the least recently used ones beyond max_entries. Returns the number dropped."""
+        cutoff = self.clock() - self.idle_timeout
+        dropped = 0
+        with self._lock:
+            # Oldest first; snapshots of changed states are already queued, so nothing is lost
+            while self._front:
+                key, entry = next(iter(self._front.items()))
+                if entry[1] >= cutoff and len(self._front) <= self.max_entries:
+                    break
+                del self._front[key]
+                dropped += 1
+        self.evictions += dropped
+        return dropped
+
+    def flush(self) -> int:
+        """Write all pending snapshots in one batch. Returns the number written."""
+        with self._lock:
+            batch, self._dirty = self._dirty, {}
+        if not batch:
+            return 0
+        try:
+            self.backend.save_many(batch)
+        except Exception as e:
+            logger.error(f"Error saving {len(batch)} session states: {str(e)}")
+            with self._lock:
+                # Keep newer snapshots taken in the meantime
+                for key, snapshot in batch.items():
+                    self._dirty.setdefault(key, snapshot)
+            return 0
+        self.writes += len(batch)
+        return len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            self.evict()
+
+
+# The active store; None until configure() is called with a backend
+STORE: Optional[SessionStore] = None
+
+
+def configure(backend: Optional[str], path: str = "data/sessions.db", max_age: float = 30 * 86400,
+              **options) -> None:
+    """
+    Set up the session store.
+
+    Args:
+        backend: "sqlite", "memory" or None to disable persistence
+        path: Database file of the sqlite backend
+        max_age: Seconds after which unused stored states are deleted
+        **options: SessionStore options (max_entries, idle_timeout, flush_interval)
+    """
+    global STORE
+    if STORE is not None:
+        STORE.close()
+        STORE = None
+    if not backend:
+        return
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown session store backend: {backend}")
+    store_backend = BACKENDS[backend](path)
+    pruned = store_backend.prune(max_age)
+    if pruned:
+        logger.info(f"Deleted {pruned} session states older than {max_age / 86400:.0f} days")
+    STORE = SessionStore(store_backend, **options)
+    STORE.start()
+    logger.info(f"Session state store: {backend}")
+
+
+def touch(state: SessionState) -> None:
+    """Record activity on a state and persist it if it changed (no-op without a store)."""
+    if STORE is not None:
+        STORE.touch(state)
+
+
+def release(state: SessionState) -> None:
+    if STORE is not None:
+        STORE.release(state)
+
+
+def load(key: str) -> Optional[SessionState]:
+    """The stored state of a thread, or None. Blocking; call from a worker thread."""
+    return STORE.get(key) if STORE is not None else None
+
+
+def close() -> None:
+    global STORE
+    if STORE is not None:
+        STORE.close()
+        STORE = None
@@ -0,0 +1,589 @@
+"""
+Status Bus Module
+
+Routes status updates between Chainlit worker processes, so the app can run
+as several workers behind a sticky load balancer.
+
+Each worker claims the sessionIDs of its connected chats in a session
+ownership registry. A `/status` update that arrives at a worker that does not
+own its session is forwarded over the bus to the owner, which enqueues it like
+a local update. Claims expire after `owner_ttl` seconds unless refreshed,
+are released when a chat ends, and are dropped at once when a worker's bus
+connection goes away. A `/broadcast` is published to every other worker,
+which fans it out to its own sessions.
+
+Two buses are available:
+
+- `unix`: a small broker process (`python scripts/status_bus_broker.py`)
+  that workers connect to over a Unix socket. It keeps the ownership registry
+  and forwards each update to the owning worker. Frames are newline-delimited
+  JSON objects.
+- `redis`: any Redis-compatible server. Claims are keys with a TTL, and
+  forwarded updates are published on the owner's channel (broadcasts on a
+  channel all workers subscribe to). Needs the optional `redis` package.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/chainfin-status-bus.sock"
+
+# Largest frame accepted by the broker
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+
+
+def encode_frame(frame: Dict[str, Any]) -> bytes:
+    return json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class SessionRegistry:
+    """Which worker owns which sessionID, with expiring claims."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        # sessionID -> (worker ID, expiry)
+        self._owners: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def claim(self, session_id: str, worker: str, ttl: float) -> None:
+        self._owners[session_id] = (worker, self.clock() + ttl)
+
+    def release(self, session_id: str, worker: str) -> None:
+        """Drop a claim, unless another worker has taken the session over."""
+        owner = self._owners.get(session_id)
+        if owner is not None and owner[0] == worker:
+            del self._owners[session_id]
+
+    def release_worker(self, worker: str) -> int:
+        """Drop all claims of a worker. Returns the number dropped."""
+        sessions = [session_id for session_id, owner in self._owners.items() if owner[0] == worker]
+        for session_id in sessions:
+            del self._owners[session_id]
+        return len(sessions)
+
+    def owner(self, session_id: str) -> Optional[str]:
+        owner = self._owners.get(session_id)
+        if owner is None:
+            return None
+        if owner[1] < self.clock():
+            del self._owners[session_id]
+            return None
+        return owner[0]
+
+    def expire(self) -> int:
+        """Drop expired claims. Returns the number dropped."""
+        now = self.clock()
+        expired = [session_id for session_id, owner in self._owners.items() if owner[1] < now]
+        for session_id in expired:
+            del self._owners[session_id]
+        return len(expired)
+
+
+class Broker:
+    """The `unix` bus: keeps the ownership registry and forwards updates to their owners."""
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, max_buffer: int = 8 * 1024 * 1024):
+        """
+        Initialize the broker.
+
+        Args:
+            path: The Unix socket path workers connect to
+            max_buffer: Bytes that may wait for a slow worker before updates for it are dropped
+        """
+        self.path = path
+        self.max_buffer = max_buffer
+        self.registry = SessionRegistry()
+        self.workers: Dict[str, asyncio.StreamWriter] = {}
+        self.stats = {"forwarded": 0, "no_owner": 0, "dropped": 0, "broadcast": 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._expiry: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=MAX_FRAME_BYTES)
+        self._expiry = asyncio.get_running_loop().create_task(self._expire())
+        logger.info(f"Status bus broker listening on {self.path}")
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._expiry is not None:
+            self._expiry.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self.workers.values()):
+            writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _expire(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            self.registry.expire()
+
+    def _forward(self, update: Dict[str, Any]) -> None:
+        owner = self.registry.owner(update.get("sessionID") or "")
+        writer = self.workers.get(owner) if owner else None
+        if writer is None:
+            self.stats["no_owner"] += 1
+            logger.warning(f"No worker owns session {update.get('sessionID')}; update dropped")
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            self.stats["dropped"] += 1
+            logger.warning(f"Worker {owner} is not keeping up; update dropped")
+            return
+        writer.write(encode_frame({"op": "deliver", "update": update}))
+        self.stats["forwarded"] += 1
+
+    def _broadcast(self, frame: Dict[str, Any], sender: str) -> None:
+        data = encode_frame(frame)
+        for worker, writer in self.workers.items():
+            if worker == sender:
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.stats["dropped"] += 1
+                logger.warning(f"Worker {worker} is not keeping up; broadcast dropped")
+                continue
+            writer.write(data)
+            self.stats["broadcast"] += 1
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        worker = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                op = frame.get("op")
+                if op == "hello":
+                    worker = frame["worker"]
+                    previous = self.workers.get(worker)
+                    if previous is not None and previous is not writer:
+                        previous.close()
+                    self.workers[worker] = writer
+                    logger.info(f"Worker {worker} connected")
+                elif worker is None:
+                    logger.warning(f"Frame before hello ignored: {op}")
+                elif op == "claim":
+                    for session_id in frame.get("sessions", []):
+                        self.registry.claim(session_id, worker, frame.get("ttl", 60.0))
+                elif op == "release":
+                    for session_id in frame.get("sessions", []):
+                        self.registry.release(session_id, worker)
+                elif op == "publish":
+                    self._forward(frame["update"])
+                elif op == "broadcast":
+                    self._broadcast(frame, worker)
+        except (ValueError, KeyError, asyncio.LimitOverrunError, ConnectionError) as e:
+            logger.warning(f"Closing connection of worker {worker}: {str(e)}")
+        finally:
+            if worker is not None and self.workers.get(worker) is writer:
+                del self.workers[worker]
+                released = self.registry.release_worker(worker)
+                logger.info(f"Worker {worker} disconnected; released {released} sessions")
+            writer.close()
+
+
+class UnixBusClient:
+    """A worker's connection to the broker, with reconnects and claim refreshes."""
+
+    def __init__(self, url: str, worker_id: str, on_update: Callable[[Dict[str, Any]], None],
+                 sessions: Callable[[], Iterable[str]], owner_ttl: float = 60.0,
+                 on_broadcast: Optional[Callable[[Dict[str, Any], Optional[List[str]], Optional[List[str]]], None]] = None):
+        """
+        Initialize the client.
+
+        Args:
+            url: The broker's Unix socket path
+            worker_id: This worker's ID
+            on_update: Called (from the reader thread) with each update forwarded to this worker
+            sessions: Returns the sessionIDs this worker owns, for refreshes and reconnects
+            owner_ttl: Seconds a claim lasts without a refresh
+            on_broadcast: Called (from the reader thread) with each broadcast of another worker and its users and roles
+        """
+        self.path = url or DEFAULT_SOCKET_PATH
+        self.worker_id = worker_id
+        self.on_update = on_update
+        self.on_broadcast = on_broadcast
+        self.sessions = sessions
+        self.owner_ttl = owner_ttl
+        self.connected = False
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        # Frames are written by the sender thread, never by the caller (the event loop)
+        self._outbox: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if not self._threads:
+            for target, name in ((self._run, "status-bus"), (self._send_loop, "status-bus-send")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._outbox.put(None)
+        self._disconnect()
+        for thread in self._threads:
+            thread.join(2.0)
+        self._threads = []
+
+    def _send_loop(self) -> None:
+        while True:
+            frame = self._outbox.get()
+            if frame is None:
+                return
+            self._send(frame)
+
+    def _send(self, frame: Dict[str, Any]) -> bool:
+        data = encode_frame(frame)
+        with self._send_lock:
+            if self._sock is None:
+                return False
+            try:
+                self._sock.sendall(data)
+                return True
+            except OSError as e:
+                logger.warning(f"Status bus send failed: {str(e)}")
+                return False
+
+    def _claim_frame(self, session_ids: List[str]) -> Dict[str, Any]:
+        return {"op": "claim", "sessions": session_ids, "ttl": self.owner_ttl}
+
+    def claim(self, session_ids: List[str]) -> bool:
+        if session_ids:
+            self._outbox.put(self._claim_frame(session_ids))
+        return self.connected
+
+    def release(self, session_ids: List[str]) -> bool:
+        self._outbox.put({"op": "release", "sessions": session_ids})
+        return self.connected
+
+    def publish(self, update: Dict[str, Any]) -> bool:
+        """Hand an update to the broker for its owner. False when not connected."""
+        if not self.connected:
+            return False
+        self._outbox.put({"op": "publish", "update": update})
+        return True
+
+    def broadcast(self, update: Dict[str, Any], users: Optional[List[str]] = None,
+                  roles: Optional[List[str]] = None) -> bool:
+        """Hand a broadcast to the broker for all other workers. False when not connected."""
+        if not self.connected:
+            return False
+        self._outbox.put({"op": "broadcast", "update": update, "users": users, "roles": roles})
+        return True
+
+    def _disconnect(self) -> None:
+        # Not under the send lock: shutting the socket down is what ends a send
+        # blocked on a broker that stopped reading
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self.connected:
+            self.connected = False
+            metrics.STATUS_BUS_CONNECTED.set(0)
+
+    def _run(self) -> None:
+        backoff = 0.5
+        while not self._stop.is_set():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                sock.close()
+                logger.warning(f"Cannot connect to the status bus at {self.path}: {str(e)}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 10.0)
+                continue
+
+            backoff = 0.5
+            sock.settimeout(self.owner_ttl / 3)
+            with self._send_lock:
+                self._sock = sock
+            # Sent from this thread so they precede anything queued for the connection
+            self._send({"op": "hello", "worker": self.worker_id})
+            sessions = list(self.sessions())
+            if sessions:
+                self._send(self._claim_frame(sessions))
+            self.connected = True
+            metrics.STATUS_BUS_CONNECTED.set(1)
+            logger.info(f"Connected to the status bus at {self.path} as {self.worker_id}")
+            try:
+                self._read(sock)
+            except OSError as e:
+                if not self._stop.is_set():
+                    logger.warning(f"Status bus connection lost: {str(e)}")
+            finally:
+                self._disconnect()
+
+    def _read(self, sock: socket.socket) -> None:
+        buffer = b""
+        next_refresh = time.monotonic() + self.owner_ttl / 3
+        while not self._stop.is_set():
+            try:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    self._handle(line)
+            except socket.timeout:
+                pass
+            if time.monotonic() >= next_refresh:
+                # Keep the claims of live sessions from expiring
+                self.claim(list(self.sessions()))
+                next_refresh = time.monotonic() + self.owner_ttl / 3
+
+    def _handle(self, line: bytes) -> None:
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            logger.warning("Invalid frame from the status bus")
+            return
+        if frame.get("op") == "deliver":
+            metrics.STATUS_FORWARDED.labels("received").inc()
+            try:
+                self.on_update(frame["update"])
+            except Exception as e:
+                logger.error(f"Error handling forwarded status update: {str(e)}")
+        elif frame.get("op") == "broadcast" and self.on_broadcast is not None:
+            metrics.STATUS_FORWARDED.labels("received").inc()
+            try:
+                self.on_broadcast(frame["update"], frame.get("users"), frame.get("roles"))
+            except Exception as e:
+                logger.error(f"Error handling forwarded broadcast: {str(e)}")
+
+
+class RedisBusClient:
+    """The `redis` bus: claims are keys with a TTL, updates go to the owner's channel."""
+
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, worker_id: str, on_update: Callable[[Dict[str, Any]], None],
+                 sessions: Callable[[], Iterable[str]], owner_ttl: float = 60.0,
+                 on_broadcast: Optional[Callable[[Dict[str, Any], Optional[List[str]], Optional[List[str]]], None]] = None,
+                 prefix: str = "chainfin:"):
+        """Same arguments as UnixBusClient; url is a redis:// URL."""
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis status bus needs the redis package: pip install redis")
+        self.redis = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.worker_id = worker_id
+        self.on_update = on_update
+        self.on_broadcast = on_broadcast
+        self.sessions = sessions
+        self.owner_ttl = owner_ttl
+        self.prefix = prefix
+        self.connected = False
+        self._release = self.redis.register_script(self.RELEASE_SCRIPT)
+        # Redis calls are made by the sender thread, never by the caller
+        self._outbox: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _owner_key(self, session_id: str) -> str:
+        return f"{self.prefix}owner:{session_id}"
+
+    def _channel(self, worker_id: str) -> str:
+        return f"{self.prefix}worker:{worker_id}"
+
+    def _broadcast_channel(self) -> str:
+        return f"{self.prefix}broadcast"
+
+    def start(self) -> None:
+        if not self._threads:
+            for target, name in ((self._send_loop, "status-bus-send"), (self._listen_loop, "status-bus-listen")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            thread.join(2.0)
+        self._threads = []
+
+    def claim(self, session_ids: List[str]) -> bool:
+        if session_ids:
+            self._outbox.put(("claim", session_ids))
+        return self.connected
+
+    def release(self, session_ids: List[str]) -> bool:
+        self._outbox.put(("release", session_ids))
+        return self.connected
+
+    def publish(self, update: Dict[str, Any]) -> bool:
+        if not self.connected:
+            return False
+        self._outbox.put(("publish", update))
+        return True
+
+    def broadcast(self, update: Dict[str, Any], users: Optional[List[str]] = None,
+                  roles: Optional[List[str]] = None) -> bool:
+        if not self.connected:
+            return False
+        self._outbox.put(("broadcast", {"origin": self.worker_id, "update": update, "users": users, "roles": roles}))
+        return True
+
+    def _execute(self, op: str, arg: Any) -> None:
+        if op == "claim":
+            pipe = self.redis.pipeline(transaction=False)
+            for session_id in arg:
+                pipe.set(self._owner_key(session_id), self.worker_id, ex=max(1, int(self.owner_ttl)))
+            pipe.execute()
+        elif op == "release":
+            for session_id in arg:
+                self._release(keys=[self._owner_key(session_id)], args=[self.worker_id])
+        elif op == "publish":
+            owner = self.redis.get(self._owner_key(arg.get("sessionID") or ""))
+            if owner is None:
+                logger.warning(f"No worker owns session {arg.get('sessionID')}; update dropped")
+                return
+            self.redis.publish(self._channel(owner.decode("utf-8")), json.dumps(arg))
+        elif op == "broadcast":
+            self.redis.publish(self._broadcast_channel(), json.dumps(arg))
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            try:
+                self._execute(*item)
+            except Exception as e:
+                logger.error(f"Status bus {item[0]} failed: {str(e)}")
+
+    def _listen_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel(self.worker_id), self._broadcast_channel())
+                self.claim(list(self.sessions()))
+                self.connected = True
+                metrics.STATUS_BUS_CONNECTED.set(1)
+                next_refresh = time.monotonic() + self.owner_ttl / 3
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle(message)
+                    if time.monotonic() >= next_refresh:
+                        self.claim(list(self.sessions()))
+                        next_refresh = time.monotonic() + self.owner_ttl / 3
+                pubsub.close()
+            except Exception as e:
+                logger.warning(f"Status bus (redis) connection lost: {str(e)}")
+                self._stop.wait(2.0)
+            finally:
+                if self.connected:
+                    self.connected = False
+                    metrics.STATUS_BUS_CONNECTED.set(0)
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        try:
+            data = json.loads(message["data"])
+            if message["channel"].decode("utf-8") != self._broadcast_channel():
+                metrics.STATUS_FORWARDED.labels("received").inc()
+                self.on_update(data)
+            elif data.get("origin") != self.worker_id and self.on_broadcast is not None:
+                metrics.STATUS_FORWARDED.labels("received").inc()
+                self.on_broadcast(data["update"], data.get("users"), data.get("roles"))
+        except Exception as e:
+            logger.error(f"Error handling forwarded status update: {str(e)}")
+
+
+# Bus clients by name
+BUSES = {
+    "unix": UnixBusClient,
+    "redis": RedisBusClient
+}
+
+# The active bus client; None in single-process deployments
+BUS = None
+
+
+def configure(kind: Optional[str], url: str, worker_id: str, on_update: Callable[[Dict[str, Any]], None],
+              sessions: Callable[[], Iterable[str]], owner_ttl: float = 60.0,
+              on_broadcast: Optional[Callable[[Dict[str, Any], Optional[List[str]], Optional[List[str]]], None]] = None) -> None:
+    """
+    Connect this worker to the status bus.
+
+    Args:
+        kind: "unix", "redis" or None for a single-process deployment
+        url: Broker socket path or redis:// URL
+        worker_id: This worker's ID (unique across workers)
+        on_update: Called with each update forwarded to this worker
+        sessions: Returns the sessionIDs this worker owns
+        owner_ttl: Seconds a session claim lasts without a refresh
+        on_broadcast: Called with each broadcast another worker received, and its users and roles
+    """
+    global BUS
+    close()
+    if not kind:
+        return
+    if kind not in BUSES:
+        raise ValueError(f"Unknown status bus: {kind}")
+    BUS = BUSES[kind](url, worker_id, on_update, sessions, owner_ttl, on_broadcast=on_broadcast)
+    BUS.start()
+    logger.info(f"Status bus: {kind} ({url}) as worker {worker_id}")
+
+
+def claim(session_id: str) -> None:
+    if BUS is not None:
+        BUS.claim([session_id])
+
+
+def release(session_id: str) -> None:
+    if BUS is not None:
+        BUS.release([session_id])
+
+
+def forward(update: Dict[str, Any]) -> bool:
+    """Send an update towards the worker owning its session. False when there is no bus connection."""
+    if BUS is None or not BUS.publish(update):
+        return False
+    metrics.STATUS_FORWARDED.labels("sent").inc()
+    return True
+
+
+def broadcast(update: Dict[str, Any], users: Optional[List[str]] = None, roles: Optional[List[str]] = None) -> bool:
+    """Send a broadcast to all other workers. False when there is no bus connection."""
+    if BUS is None or not BUS.broadcast(update, users, roles):
+        return False
+    metrics.STATUS_FORWARDED.labels("sent").inc()
+    return True
+
+
+def close() -> None:
+    global BUS
+    if BUS is not None:
+        BUS.stop()
+        BUS = None
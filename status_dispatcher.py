@@ -0,0 +1,357 @@
+"""
+Status Dispatcher Module
+
+Renders status updates received by the webhook server in the Chainlit session
+they are addressed to. The webhook server (running in its own thread) only
+enqueues updates; a single dispatcher task on the Chainlit event loop is woken
+up for each enqueued update, looks up the target session by the update's
+`sessionID` and renders it inside that session's Chainlit context.
+
+Updates for a session whose websocket dropped are held in `PENDING` and
+rendered in one batch when the session becomes active again: when the user
+resumes the thread, or when Chainlit restores the session on a reconnect (which
+calls no hook, so a sweep task watches detached sessions for a new socket). The
+same sweep expires held updates that were not picked up in time.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+from chainlit.context import context_var
+from chainlit.session import WebsocketSession
+
+import config
+import metrics
+import status_bus
+import status_scheduler
+import status_updates
+import status_webhook_integration
+import tracing
+from broadcast import select_targets, fan_out
+from pending_updates import PendingUpdates
+
+logger = logging.getLogger(__name__)
+
+# Status update type -> status_updates helper taking (title, message, icon=...)
+STATUS_RENDERERS = {
+    "progress": status_updates.progress_status,
+    "success": status_updates.success_status,
+    "warning": status_updates.warning_status,
+    "error": status_updates.error_status,
+    "info": status_updates.info_status,
+    "email": status_updates.email_status,
+    "calendar": status_updates.calendar_status,
+    "web-search": status_updates.web_search_status,
+    "file-system": status_updates.file_system_status,
+    "database": status_updates.database_status,
+    "api": status_updates.api_status,
+    "important-alert": status_updates.important_alert,
+    "notification-alert": status_updates.notification_alert,
+    "system-alert": status_updates.system_alert
+}
+
+def _session_expired(session_id: str) -> None:
+    """A detached session did not come back: give up its claim and its scheduled updates."""
+    status_bus.release(session_id)
+    status_scheduler.cancel_session(session_id)
+
+# Updates held for disconnected sessions; a session that does not come back
+# is forgotten when its updates expire
+PENDING = PendingUpdates(config.PENDING_UPDATES_TTL, config.PENDING_UPDATES_MAX, on_expire=_session_expired)
+
+# (session id, title) -> reporter updating that step's progress element in place
+_progress_reporters: Dict[Tuple[str, str], status_updates.ProgressReporter] = {}
+
+# Running animated progress updates (referenced so they are not collected)
+_animations: Set[asyncio.Task] = set()
+
+# Seconds between sweeps over the detached sessions
+SWEEP_INTERVAL = 1.0
+
+# Detached session ID -> (its Chainlit context, the socket ID it had when it dropped)
+_detached: Dict[str, Tuple[Any, Optional[str]]] = {}
+
+# Dispatcher and sweep tasks, and the event used to wake up the dispatcher
+_dispatcher_task: Optional[asyncio.Task] = None
+_sweep_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+
+async def render_status_update(update: Dict[str, Any]) -> None:
+    """
+    Render one status update in the current Chainlit context.
+
+    Args:
+        update: The status update as received by the webhook
+    """
+    update_type = update.get("type", "info")
+    content = update.get("content", "")
+    title = update.get("title", "Status Update")
+
+    if update_type == "toast":
+        await status_updates.show_toast(
+            content,
+            update.get("toast_type", "info"),
+            update.get("duration", 3000)
+        )
+        return
+
+    if update_type == "progress":
+        await render_progress(update, title, content)
+        return
+
+    if update_type == "task-list":
+        await status_updates.task_list(title, update.get("tasks") or [])
+        return
+
+    if update_type == "animated-progress":
+        # Runs for several seconds, so it must not hold up the updates behind it
+        task = asyncio.create_task(status_updates.animated_progress(
+            title,
+            content,
+            [str(step) for step in update.get("steps") or []],
+            float(update.get("delay", 0.5))
+        ))
+        _animations.add(task)
+        task.add_done_callback(_animation_done)
+        return
+
+    kwargs = {}
+    if update.get("icon"):
+        kwargs["icon"] = update["icon"]
+
+    renderer = STATUS_RENDERERS.get(update_type, status_updates.info_status)
+    await renderer(title, content, **kwargs)
+
+async def render_progress(update: Dict[str, Any], title: str, content: str) -> None:
+    """
+    Render a progress update, updating the step's element in place.
+
+    The first update for a title in a session sends the progress message; later
+    ones go through its ProgressReporter, which throttles them and lets the
+    browser interpolate in between. Reaching 100% ends the step.
+    """
+    key = (context_var.get().session.id, title)
+    progress = update.get("progress")
+    hints = {name: update.get(name) for name in ("target", "eta", "rate")}
+    reporter = _progress_reporters.get(key)
+    if reporter is None:
+        kwargs = dict(hints, progress=progress)
+        if update.get("icon"):
+            kwargs["icon"] = update["icon"]
+        msg = await status_updates.progress_status(title, content, **kwargs)
+        reporter = status_updates.ProgressReporter(msg.elements[0])
+        reporter.last_sent = asyncio.get_running_loop().time()
+        _progress_reporters[key] = reporter
+    else:
+        props = {"message": content}
+        if update.get("icon"):
+            props["icon"] = update["icon"]
+        await reporter.update(progress, **hints, **props)
+
+    if progress is not None and progress >= 100:
+        del _progress_reporters[key]
+
+def _animation_done(task: asyncio.Task) -> None:
+    _animations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        metrics.STATUS_UNDELIVERED.labels("render_error").inc()
+        logger.error(f"Error rendering animated progress: {str(task.exception())}")
+
+def drop_progress(session_id: str) -> None:
+    """Forget the progress steps of a session; a coalesced update is discarded."""
+    for key in [key for key in _progress_reporters if key[0] == session_id]:
+        reporter = _progress_reporters.pop(key)
+        if reporter.flush_task is not None:
+            reporter.flush_task.cancel()
+
+def resolve_target(update: Dict[str, Any]) -> Optional[Any]:
+    """
+    Find the Chainlit context an update should be rendered in.
+
+    Updates without a sessionID are only delivered when exactly one session is
+    active, so they can never leak into another user's chat.
+    """
+    sessions = status_webhook_integration.SESSIONS
+    session_id = update.get("sessionID")
+    if session_id:
+        return sessions.get(session_id)
+    if len(sessions) == 1:
+        return next(iter(sessions.values()))
+    return None
+
+async def deliver(update: Dict[str, Any]) -> bool:
+    """
+    Render an update in its target session.
+
+    Returns:
+        True if the update was rendered
+    """
+    enqueued_at = update.pop("_enqueued_at", None)
+    enqueued_wall = update.pop("_enqueued_wall", None)
+    trace_id = update.get("traceID")
+    update_type = update.get("type", "info")
+    
+    if trace_id and enqueued_at is not None:
+        tracing.record_span("status.queue", trace_id, enqueued_wall, time.monotonic() - enqueued_at, type=update_type)
+    
+    target = resolve_target(update)
+    if target is None:
+        if PENDING.add(update):
+            return False
+        metrics.STATUS_UNDELIVERED.labels("no_session").inc()
+        logger.warning(f"No active session for status update (sessionID={update.get('sessionID')})")
+        return False
+
+    render_start = time.time()
+    render_start_mono = time.monotonic()
+    token = context_var.set(target)
+    try:
+        await render_status_update(update)
+    except Exception as e:
+        metrics.STATUS_UNDELIVERED.labels("render_error").inc()
+        logger.error(f"Error rendering status update: {str(e)}", exc_info=True)
+        return False
+    finally:
+        context_var.reset(token)
+        if trace_id:
+            tracing.record_span("status.render", trace_id, render_start, time.monotonic() - render_start_mono, type=update_type)
+
+    if enqueued_at is not None:
+        metrics.STATUS_RENDER_LATENCY.observe(time.monotonic() - enqueued_at)
+    return True
+
+async def broadcast_update(update: Dict[str, Any], users: Optional[List[str]] = None,
+                           roles: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Render one update in every active session matching the filter.
+
+    Returns:
+        Counts of the matching sessions and of the deliveries that succeeded and failed
+    """
+    name, props = status_updates.broadcast_element(update)
+    targets = select_targets(status_webhook_integration.SESSIONS, users, roles)
+
+    async def send(target):
+        token = context_var.set(target)
+        try:
+            await status_updates.send_element(name, props)
+        finally:
+            context_var.reset(token)
+
+    counts = await fan_out(targets, send, config.BROADCAST_CONCURRENCY)
+    metrics.STATUS_BROADCAST_DELIVERIES.labels("delivered").inc(counts["delivered"])
+    metrics.STATUS_BROADCAST_DELIVERIES.labels("failed").inc(counts["failed"])
+    logger.info(f"Broadcast {update.get('type')} to {counts['delivered']} of {counts['sessions']} sessions")
+    return counts
+
+async def dispatch_status_updates() -> None:
+    """Drain the status queue whenever the webhook server signals new updates."""
+    logger.info("Status update dispatcher started")
+    while True:
+        await _wakeup.wait()
+        _wakeup.clear()
+        while True:
+            update = status_webhook_integration.get_next_status_update()
+            if update is None:
+                break
+            await deliver(update)
+
+async def sweep_sessions() -> None:
+    """Expire held updates on time and resume detached sessions Chainlit restored."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            PENDING.expire()
+            for session_id, (context, socket_id) in list(_detached.items()):
+                session = context.session
+                if WebsocketSession.get_by_id(session.id) is not session:
+                    # Deleted by Chainlit; only a thread resume can bring it back
+                    del _detached[session_id]
+                elif session.socket_id != socket_id:
+                    logger.info(f"Session {session_id} reconnected")
+                    await resume_session(session_id, context)
+        except Exception as e:
+            logger.error(f"Error sweeping detached sessions: {str(e)}", exc_info=True)
+
+def ensure_dispatcher() -> None:
+    """Start the dispatcher and the sweep on the running event loop if they are not running yet."""
+    global _dispatcher_task, _sweep_task, _wakeup
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.get_running_loop().create_task(sweep_sessions())
+    if _dispatcher_task is not None and not _dispatcher_task.done():
+        return
+
+    loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    # Updates may already be waiting in the queue
+    _wakeup.set()
+    wakeup = _wakeup
+    status_webhook_integration.set_queue_listener(lambda: loop.call_soon_threadsafe(wakeup.set))
+    status_webhook_integration.set_broadcaster(
+        lambda update, users, roles: asyncio.run_coroutine_threadsafe(broadcast_update(update, users, roles), loop),
+        config.BROADCAST_TIMEOUT
+    )
+    _dispatcher_task = loop.create_task(dispatch_status_updates())
+
+def register_current_session(session_id: str) -> None:
+    """Make the current Chainlit session the target for updates with this sessionID."""
+    # The real context object, not the cl.context proxy
+    status_webhook_integration.register_session(session_id, context_var.get())
+    ensure_dispatcher()
+
+def unregister_session(session_id: str) -> None:
+    """
+    Stop delivering updates to the current session and hold them in case it comes back.
+
+    Chainlit calls on_chat_end on every websocket drop and may restore the same
+    session on a reconnect, so the context is kept to resume it then.
+    """
+    context = context_var.get()
+    status_webhook_integration.unregister_session(session_id, keep_claim=True)
+    PENDING.detach(session_id)
+    drop_progress(session_id)
+    _detached[session_id] = (context, getattr(context.session, "socket_id", None))
+    ensure_dispatcher()
+
+async def resume_session(session_id: str, context: Optional[Any] = None) -> int:
+    """
+    Render the updates held for a session that came back, then deliver to it again.
+
+    The session stays detached until everything held has been rendered, so
+    updates arriving meanwhile are held behind the older ones instead of
+    overtaking them.
+
+    Args:
+        session_id: The session's ID
+        context: Its Chainlit context (default: the current one)
+
+    Returns:
+        The number of updates rendered
+    """
+    context = context or context_var.get()
+    _detached.pop(session_id, None)
+    rendered = 0
+    token = context_var.set(context)
+    try:
+        while session_id not in _detached:
+            updates: List[Dict[str, Any]] = PENDING.drain(session_id)
+            if not updates:
+                break
+            for update in updates:
+                try:
+                    await render_status_update(update)
+                    rendered += 1
+                except Exception as e:
+                    metrics.STATUS_UNDELIVERED.labels("render_error").inc()
+                    logger.error(f"Error rendering pending status update: {str(e)}")
+    finally:
+        context_var.reset(token)
+
+    # Unless the websocket dropped again while flushing
+    if session_id not in _detached:
+        PENDING.take(session_id)
+        status_webhook_integration.register_session(session_id, context)
+        ensure_dispatcher()
+    return rendered
@@ -0,0 +1,240 @@
+"""
+Status Scheduler Module
+
+Delayed and recurring status updates. An update posted to `/status` with
+`deliver_at` (a Unix timestamp or ISO 8601 time) is held until then; one with
+`every` (seconds) is delivered repeatedly, `count` times or until cancelled
+with `DELETE /status/scheduled/{id}`. Timers live in a hierarchical timing
+wheel (see timing_wheel) driven by a background thread, and due updates go
+through the normal session routing. Timers are kept per `sessionID` and are
+cancelled together when their session is gone for good (`cancel_session`).
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Set, Tuple
+
+import metrics
+from timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# Fields controlling scheduling; removed from the update before delivery
+SCHEDULE_FIELDS = ("deliver_at", "every", "count")
+
+
+class ScheduleError(ValueError):
+    """A scheduled update was rejected because of its scheduling fields."""
+
+
+class SchedulerFull(ScheduleError):
+    """A scheduled update was rejected because too many are pending."""
+
+
+def parse_deliver_at(value: Any) -> float:
+    """A `deliver_at` value as a Unix timestamp."""
+    if isinstance(value, bool):
+        raise ScheduleError("'deliver_at' must be a Unix timestamp or an ISO 8601 time")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ScheduleError(f"Invalid 'deliver_at' time: {value}")
+        # A time without an offset is taken as local time, like datetime.timestamp()
+        return when.timestamp()
+    raise ScheduleError("'deliver_at' must be a Unix timestamp or an ISO 8601 time")
+
+
+def parse_schedule(data: Dict[str, Any], min_interval: float = 1.0,
+                   now: Optional[float] = None) -> Optional[Tuple[float, Optional[float], Optional[int]]]:
+    """
+    Take the scheduling fields out of an update.
+
+    Returns:
+        (delay in seconds, interval or None, count or None), or None for an update to deliver now
+    """
+    if not any(field in data for field in SCHEDULE_FIELDS):
+        return None
+    deliver_at = data.pop("deliver_at", None)
+    every = data.pop("every", None)
+    count = data.pop("count", None)
+
+    if every is not None:
+        if isinstance(every, bool) or not isinstance(every, (int, float)) or every < min_interval:
+            raise ScheduleError(f"'every' must be a number of seconds of at least {min_interval}")
+        every = float(every)
+    if count is not None:
+        if every is None:
+            raise ScheduleError("'count' requires 'every'")
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            raise ScheduleError("'count' must be a positive integer")
+
+    if deliver_at is not None:
+        delay = parse_deliver_at(deliver_at) - (time.time() if now is None else now)
+    elif every is not None:
+        delay = every
+    else:
+        return None
+    return delay, every, count
+
+
+class StatusScheduler:
+    """Holds scheduled updates in a timing wheel and delivers them from a background thread."""
+
+    def __init__(self, deliver: Callable[[Dict[str, Any]], Any], tick: float = 0.1,
+                 max_pending: int = 100000, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the scheduler.
+
+        Args:
+            deliver: Called with a copy of each update when it is due
+            tick: Timer resolution in seconds
+            max_pending: Most timers held at once
+            clock: Monotonic time source
+        """
+        self.deliver = deliver
+        self.max_pending = max_pending
+        self.wheel = TimingWheel(tick, clock=clock)
+        # sessionID -> IDs of its pending timers
+        self._sessions: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.wheel)
+
+    def full(self) -> bool:
+        return len(self.wheel) >= self.max_pending
+
+    def schedule(self, update: Dict[str, Any], delay: float, every: Optional[float] = None,
+                 count: Optional[int] = None) -> int:
+        """Hold an update for `delay` seconds (then every `every` seconds). Returns its timer ID."""
+        with self._lock:
+            if len(self.wheel) >= self.max_pending:
+                raise SchedulerFull(f"Too many scheduled updates (limit {self.max_pending})")
+            try:
+                timer_id = self.wheel.schedule(delay, update, every, count)
+            except ValueError as e:
+                raise ScheduleError(str(e))
+            session_id = update.get("sessionID")
+            if session_id:
+                self._sessions.setdefault(session_id, set()).add(timer_id)
+            metrics.STATUS_SCHEDULED.set(len(self.wheel))
+        self._wakeup.set()
+        return timer_id
+
+    def _forget(self, timer_id: int, item: Dict[str, Any]) -> None:
+        session_id = item.get("sessionID")
+        timers = self._sessions.get(session_id) if session_id else None
+        if timers is not None:
+            timers.discard(timer_id)
+            if not timers:
+                del self._sessions[session_id]
+
+    def cancel(self, timer_id: int) -> bool:
+        with self._lock:
+            timer = self.wheel.timers.get(timer_id)
+            cancelled = self.wheel.cancel(timer_id)
+            if cancelled:
+                self._forget(timer_id, timer.item)
+            metrics.STATUS_SCHEDULED.set(len(self.wheel))
+        return cancelled
+
+    def cancel_session(self, session_id: str) -> int:
+        """Cancel all timers of a session. Returns the number cancelled."""
+        with self._lock:
+            timer_ids = self._sessions.pop(session_id, set())
+            for timer_id in timer_ids:
+                self.wheel.cancel(timer_id)
+            metrics.STATUS_SCHEDULED.set(len(self.wheel))
+        if timer_ids:
+            logger.info(f"Cancelled {len(timer_ids)} scheduled status updates of session {session_id}")
+        return len(timer_ids)
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Deliver the updates that are due. Returns how many were delivered."""
+        with self._lock:
+            timers = self.wheel.advance(now)
+            if timers:
+                for timer in timers:
+                    if timer.timer_id not in self.wheel.timers:
+                        # Fired for the last time
+                        self._forget(timer.timer_id, timer.item)
+                metrics.STATUS_SCHEDULED.set(len(self.wheel))
+        for timer in timers:
+            try:
+                # A copy: delivery adds internal fields, and recurring updates are sent again
+                self.deliver(dict(timer.item))
+            except Exception as e:
+                logger.error(f"Error delivering scheduled status update {timer.timer_id}: {str(e)}")
+        return len(timers)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="status-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Sleep until something is scheduled, then tick while timers are pending
+            if len(self.wheel):
+                self._wakeup.wait(self.wheel.tick)
+            else:
+                self._wakeup.wait()
+            self._wakeup.clear()
+            self.run_due()
+
+
+# The scheduler of this process; None until configured
+SCHEDULER: Optional[StatusScheduler] = None
+
+# Shortest allowed `every`
+MIN_INTERVAL = 1.0
+
+
+def configure(deliver: Callable[[Dict[str, Any]], Any], tick: float = 0.1, max_pending: int = 100000,
+              min_interval: float = 1.0) -> None:
+    """
+    Start the scheduler.
+
+    Args:
+        deliver: Called with each due update (normally the session routing)
+        tick: Timer resolution in seconds
+        max_pending: Most timers held at once
+        min_interval: Shortest allowed `every` in seconds
+    """
+    global SCHEDULER, MIN_INTERVAL
+    close()
+    MIN_INTERVAL = min_interval
+    SCHEDULER = StatusScheduler(deliver, tick, max_pending)
+    SCHEDULER.start()
+
+
+def close() -> None:
+    global SCHEDULER
+    if SCHEDULER is not None:
+        SCHEDULER.stop()
+        SCHEDULER = None
+
+
+def cancel_session(session_id: str) -> int:
+    """Cancel the scheduled updates of a session that is gone. Returns the number cancelled."""
+    if SCHEDULER is None:
+        return 0
+    return SCHEDULER.cancel_session(session_id)
+
+
+def is_full() -> bool:
+    """Whether a scheduled update would be refused now (also when scheduling is off)."""
+    return SCHEDULER is None or SCHEDULER.full()
@@ -6,10 +6,13 @@ progress indicators, and alerts in the Chainlit UI.
 """
 
 import chainlit as cl
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Set, Union, Tuple
 import asyncio
 import logging
 
+import config
+from toast_limiter import ToastLimiter, SUPPRESS, DROP, format_aggregate
+
 # ===== AGENT ACTION STATUS UPDATES =====
 
 async def email_status(title: str, message: str, icon: str = "mail") -> cl.Message:
@@ -158,7 +161,8 @@ async def api_status(title: str, message: str, icon: str = "code") -> cl.Message
 
 # ===== PROGRESS STATUS UPDATES =====
 
-async def progress_status(title: str, message: str, progress: Optional[int] = None, icon: str = "loader") -> cl.Message:
+async def progress_status(title: str, message: str, progress: Optional[int] = None, icon: str = "loader",
+                          target: Optional[int] = None, eta: Optional[float] = None, rate: Optional[float] = None) -> cl.Message:
     """
     Display a progress status update.
     
@@ -167,6 +171,9 @@ async def progress_status(title: str, message: str, progress: Optional[int] = No
         message: The message content
         progress: Optional progress percentage (0-100)
         icon: Lucide icon name (default: "loader")
+        target: Optional progress the UI may animate towards on its own
+        eta: Optional seconds until `target` is expected to be reached
+        rate: Optional progress percentage per second (used when no eta is given)
         
     Returns:
         The sent message object
@@ -178,12 +185,88 @@ async def progress_status(title: str, message: str, progress: Optional[int] = No
             "icon": icon,
             "title": title,
             "message": message,
-            "progress": progress
+            "progress": progress,
+            "target": target,
+            "eta": eta,
+            "rate": rate
         }
     )
     msg = cl.Message(content="", elements=[element])
     return await msg.send()
 
+class ProgressReporter:
+    """
+    A progress element that is updated in place at a low rate.
+    
+    The browser interpolates between updates using the target/eta hints, so
+    intermediate values only need to be sent every `min_interval` seconds.
+    Throttled values are coalesced: the latest one is sent when the interval
+    expires, and 100% is always sent immediately.
+    """
+    
+    def __init__(self, element: cl.CustomElement, min_interval: Optional[float] = None):
+        """
+        Initialize a reporter for an element created by the caller.
+        
+        Args:
+            element: A StatusUpdate or AnimatedProgress custom element
+            min_interval: Minimum seconds between updates (default: config.PROGRESS_UPDATE_INTERVAL)
+        """
+        self.element = element
+        self.min_interval = config.PROGRESS_UPDATE_INTERVAL if min_interval is None else min_interval
+        self.last_sent = 0.0
+        self.pending: Optional[Dict[str, Any]] = None
+        self.flush_task: Optional[asyncio.Task] = None
+        self.updates_sent = 0
+        self.updates_skipped = 0
+    
+    async def update(self, progress: Optional[int], target: Optional[int] = None, eta: Optional[float] = None,
+                     rate: Optional[float] = None, **props) -> bool:
+        """
+        Report new progress.
+        
+        Args:
+            progress: The authoritative progress percentage (0-100, None: indeterminate)
+            target: Progress the UI may animate towards until the next update
+            eta: Seconds until `target` is expected
+            rate: Progress percentage per second (alternative to eta)
+            **props: Other element props to change (message, title, ...)
+            
+        Returns:
+            True if the update was sent now, False if it was coalesced
+        """
+        self.pending = dict(props, progress=progress, target=target, eta=eta, rate=rate)
+        loop = asyncio.get_running_loop()
+        wait = self.last_sent + self.min_interval - loop.time()
+        if (progress is not None and progress >= 100) or wait <= 0:
+            await self._send()
+            return True
+        
+        self.updates_skipped += 1
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_later(wait))
+        return False
+    
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if self.pending is not None:
+            await self._send()
+    
+    async def _send(self) -> None:
+        pending, self.pending = self.pending, None
+        if pending is None:
+            return
+        self.element.props.update(pending)
+        self.last_sent = asyncio.get_running_loop().time()
+        self.updates_sent += 1
+        await self.element.update()
+    
+    async def close(self) -> None:
+        """Send any coalesced update and stop the pending flush."""
+        if self.flush_task is not None and not self.flush_task.done():
+            self.flush_task.cancel()
+        await self._send()
+
 async def success_status(title: str, message: str, icon: str = "check-circle") -> cl.Message:
     """
     Display a success status update.
@@ -354,6 +437,51 @@ async def system_alert(title: str, message: str, icon: str = "info") -> cl.Messa
     msg = cl.Message(content="", elements=[element])
     return await msg.send()
 
+# ===== BROADCAST =====
+
+# Broadcast update type -> (element name, element type, default icon), matching the helpers above
+BROADCAST_ELEMENTS = {
+    "important-alert": ("AlertNotification", "important", "alert-circle"),
+    "notification-alert": ("AlertNotification", "notification", "bell"),
+    "system-alert": ("AlertNotification", "system", "info"),
+    "info": ("StatusUpdate", "info", "info"),
+    "success": ("StatusUpdate", "success", "check-circle"),
+    "warning": ("StatusUpdate", "warning", "alert-triangle"),
+    "error": ("StatusUpdate", "error", "alert-circle")
+}
+
+def broadcast_element(update: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the element of a broadcast update once, to be sent to every session.
+    
+    Args:
+        update: The update as posted to /broadcast
+        
+    Returns:
+        The custom element name and its props
+    """
+    name, element_type, icon = BROADCAST_ELEMENTS[update.get("type", "system-alert")]
+    props = {"type": element_type, "icon": update.get("icon") or icon, "title": update.get("title", "Announcement")}
+    # Alerts show `content`, status updates `message`
+    props["content" if name == "AlertNotification" else "message"] = update.get("content", "")
+    return name, props
+
+async def send_element(name: str, props: Dict[str, Any]) -> cl.Message:
+    """
+    Send a prebuilt custom element in the current context.
+    
+    The props are shared, not copied, so a broadcast builds them only once.
+    
+    Args:
+        name: The custom element name
+        props: The element props
+        
+    Returns:
+        The sent message object
+    """
+    msg = cl.Message(content="", elements=[cl.CustomElement(name=name, props=props)])
+    return await msg.send()
+
 # ===== ANIMATED PROGRESS =====
 
 async def animated_progress(title: str, message: str, steps: List[str], delay: float = 0.5) -> None:
@@ -376,26 +504,112 @@ async def animated_progress(title: str, message: str, steps: List[str], delay: f
             "title": title,
             "message": message,
             "steps": steps,
-            "progress": 0
+            "progress": 0,
+            "target": int(100 / len(steps)),
+            "eta": delay
         }
     )
     msg = cl.Message(content="", elements=[element])
     await msg.send()
     
-    # Animate through the steps
+    # Animate through the steps. Each update tells the browser where the next
+    # step will land and when, so it can interpolate between throttled updates.
+    reporter = ProgressReporter(element)
     total_steps = len(steps)
     for i in range(1, total_steps + 1):
         progress = int((i / total_steps) * 100)
-        element.props["progress"] = progress
-        await element.update()
+        next_progress = int((min(i + 1, total_steps) / total_steps) * 100)
+        await reporter.update(progress, target=next_progress, eta=delay if i < total_steps else None)
         if i < total_steps:
             await asyncio.sleep(delay)
+    await reporter.close()
     
     # Complete the animation
     await success_status(f"{title} Complete", "All steps completed successfully")
 
+# ===== AGENT TRACE =====
+
+# Icon and label for each agent action type, matching the StatusUpdate helpers
+AGENT_ACTION_TYPES = {
+    "web_search": ("search", "Web Search"),
+    "email": ("mail", "Email Action"),
+    "calendar": ("calendar", "Calendar Action"),
+    "file_system": ("folder", "File System Action"),
+    "database": ("database", "Database Action"),
+    "api": ("code", "API Action")
+}
+
+def agent_trace(actions: List[Dict[str, Any]], title: str = "Agent Trace", expandable: bool = False) -> cl.CustomElement:
+    """
+    Build a single composite element summarizing a list of agent actions.
+    
+    The element is not sent on its own; attach it to the answer message so the
+    whole trace crosses the wire once, next to the answer.
+    
+    Args:
+        actions: The "actions" list from an n8n response
+        title: The title of the trace
+        expandable: Render the action list collapsed behind a clickable header
+        
+    Returns:
+        The AgentTrace custom element
+    """
+    rows = []
+    for action in actions:
+        if not isinstance(action, dict):
+            continue
+        action_type = str(action.get("type", "")).lower()
+        icon, label = AGENT_ACTION_TYPES.get(action_type, ("info", action_type.replace("_", " ").title() or "Action"))
+        rows.append({
+            "type": action_type.replace("_", "-"),
+            "status": str(action.get("status", "")).lower(),
+            "message": action.get("message", ""),
+            "icon": icon,
+            "label": label
+        })
+    
+    return cl.CustomElement(
+        name="AgentTrace",
+        props={
+            "title": title,
+            "actions": rows,
+            "expandable": expandable
+        },
+        display="inline"
+    )
+
 # ===== TASK LIST =====
 
+# Task status as sent by clients -> Chainlit task status
+TASK_STATUSES = {
+    "completed": cl.TaskStatus.DONE,
+    "done": cl.TaskStatus.DONE,
+    "running": cl.TaskStatus.RUNNING,
+    "failed": cl.TaskStatus.FAILED,
+    "error": cl.TaskStatus.FAILED
+}
+
+async def task_list(title: str, tasks: List[Dict[str, Any]]) -> cl.TaskList:
+    """
+    Display a task list.
+    
+    Args:
+        title: The status shown above the tasks
+        tasks: Dicts with a "name" (or "title") and a "status" such as
+               "completed", "running", "waiting" or "failed"
+        
+    Returns:
+        The sent task list
+    """
+    element = cl.TaskList(status=title)
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        status = TASK_STATUSES.get(str(task.get("status", "")).lower(), cl.TaskStatus.READY)
+        await element.add_task(cl.Task(title=str(task.get("name", task.get("title", ""))), status=status))
+    await element.send()
+    return element
+
 class StyledTaskList:
     """
     A styled task list for displaying progress of multiple tasks.
@@ -496,10 +710,43 @@ class StyledTaskList:
 
 # ===== TOAST NOTIFICATIONS =====
 
+def _get_toast_limiter() -> ToastLimiter:
+    """Get the toast limiter of the current session, creating it on first use."""
+    limiter = cl.user_session.get("toast_limiter")
+    if limiter is None:
+        limiter = ToastLimiter(config.TOAST_LIMITS)
+        cl.user_session.set("toast_limiter", limiter)
+    return limiter
+
+# Pending aggregate flushes; the loop only keeps weak references to tasks
+_toast_flushes: Set[asyncio.Task] = set()
+
+def _toast_flush_done(task: asyncio.Task) -> None:
+    _toast_flushes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"Error flushing aggregated toasts: {str(task.exception())}")
+
+async def _flush_toast_aggregates(limiter: ToastLimiter, delay: float) -> None:
+    """Wait for a dedupe window to close, then send its aggregated toast."""
+    await asyncio.sleep(delay)
+    for toast_type, message, count in limiter.pop_aggregates():
+        try:
+            await cl.context.emitter.send_toast(
+                message=format_aggregate(message, count),
+                type=toast_type
+            )
+            logging.info(f"Aggregated toast notification sent: {message} x{count} ({toast_type})")
+        except Exception as e:
+            logging.error(f"Failed to send aggregated toast notification: {str(e)}")
+
 async def show_toast(message: str, type: str = "info", duration: int = 3000) -> None:
     """
     Display a toast notification.
     
+    Toasts are rate limited per session and per type (see config.TOAST_LIMITS).
+    Identical toasts inside the dedupe window are folded into one aggregated
+    toast ("Email sent ×7") that is sent when the window closes.
+    
     Args:
         message: The message to display
         type: The type of toast (info, success, warning, error)
@@ -513,6 +760,22 @@ async def show_toast(message: str, type: str = "info", duration: int = 3000) ->
         valid_types = ["info", "success", "warning", "error"]
         if type not in valid_types:
             type = "info"
+        
+        limiter = _get_toast_limiter()
+        decision = limiter.admit(message, type)
+        if decision == SUPPRESS:
+            # Schedule the aggregate flush once, on the first repeat
+            if limiter.windows[(type, message)][1] == 1:
+                # Small margin so the window has closed when the flush runs
+                delay = limiter.window_remaining(message, type) + 0.05
+                task = asyncio.create_task(_flush_toast_aggregates(limiter, delay))
+                _toast_flushes.add(task)
+                task.add_done_callback(_toast_flush_done)
+            logging.debug(f"Toast notification folded into aggregate: {message} ({type})")
+            return
+        if decision == DROP:
+            logging.warning(f"Toast notification rate limited: {message} ({type})")
+            return
             
         # In this version of Chainlit, send_toast only accepts message and type
         await cl.context.emitter.send_toast(
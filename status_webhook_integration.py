@@ -1,24 +1,47 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
+import asyncio
 import logging
 import json
-import os
 import threading
 import time
-import queue
 import traceback
 import socket
-from typing import Dict, Any, List, Union, Optional
-import asyncio
-import uvicorn
-from pydantic import BaseModel
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Deque, List
+
+import metrics
+import tracing
+import traffic_capture
+import profiling
+import loop_monitor
+import health
+import status_bus
+import status_scheduler
+from dedupe import DedupeCache, idempotency_key
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+# Logging is configured by the application (see logging_setup)
 logger = logging.getLogger("status_webhook")
 
 # Create a global queue for status updates that can be accessed from other modules
-STATUS_QUEUE: List[Dict[str, Any]] = []
+STATUS_QUEUE: Deque[Dict[str, Any]] = deque()
+
+# Active chat sessions by the sessionID sent to n8n. The values are opaque
+# delivery targets owned by the Chainlit side (see status_dispatcher).
+SESSIONS: Dict[str, Any] = {}
+
+# Called (from the webhook server thread) whenever an update is enqueued
+_queue_listener: Optional[Callable[[], None]] = None
+
+# Renders a /broadcast update in the Chainlit sessions (from the webhook server thread);
+# returns a concurrent.futures.Future of the delivery counts
+_broadcaster: Optional[Callable[[Dict[str, Any], Optional[List[str]], Optional[List[str]]], Any]] = None
+_broadcast_timeout = 30.0
+
+# Results of /status and /broadcast requests by idempotency key, so retried
+# requests are answered without processing them again (see dedupe)
+DEDUPE = DedupeCache()
 
 # Flag to indicate if the webhook server is running
 WEBHOOK_SERVER_RUNNING = False
@@ -26,14 +49,40 @@ WEBHOOK_SERVER_RUNNING = False
 # Server thread reference
 WEBHOOK_SERVER_THREAD = None
 
+# The running uvicorn server, and the event set once it serves requests
+WEBHOOK_SERVER = None
+WEBHOOK_SERVER_STARTED = threading.Event()
+
 # Status update types
 STATUS_TYPES = [
     "progress", "success", "warning", "error", "info",
     "email", "calendar", "web-search", "file-system", 
     "database", "api", "important-alert", "notification-alert", 
-    "system-alert", "toast"
+    "system-alert", "toast", "task-list", "animated-progress"
+]
+
+# Types that can be sent to many sessions with /broadcast
+BROADCAST_TYPES = [
+    "important-alert", "notification-alert", "system-alert",
+    "info", "success", "warning", "error"
 ]
 
+def normalize_status_type(update_type: Any) -> str:
+    """
+    Map the `type` of an update to one of STATUS_TYPES.
+
+    Clients spell types with underscores as well as dashes (`system_alert`).
+    Types that are still unknown are shown as `info` rather than rejected, so
+    an update from a newer or older client is not lost.
+    """
+    normalized = str(update_type).strip().lower().replace("_", "-")
+    if normalized in STATUS_TYPES:
+        return normalized
+    # Not labelled with the raw type to keep label cardinality bounded
+    metrics.STATUS_TYPE_FALLBACK.inc()
+    logger.warning(f"Unknown status update type {update_type!r}, showing it as info")
+    return "info"
+
 # Create a FastAPI app
 app = FastAPI(title="Status Webhook Server")
 
@@ -46,10 +95,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def on_startup():
+    """Watch the server's event loop and signal that the server is up"""
+    loop_monitor.ensure_monitor("webhook")
+    WEBHOOK_SERVER_STARTED.set()
+
 # Webhook endpoint to receive status updates
 @app.post("/status")
 async def status_webhook(request: Request):
     """Receive status updates from external sources"""
+    ingest_start = time.time()
+    ingest_start_mono = time.monotonic()
+    profile_handle = profiling.start("webhook.status", aggregate=True)
     try:
         # Get the request body
         body = await request.body()
@@ -57,25 +115,173 @@ async def status_webhook(request: Request):
         # Parse the JSON data
         try:
             data = json.loads(body)
-            logger.info(f"Received status update: {data}")
-            
-            # Add to queue for processing by Chainlit
-            STATUS_QUEUE.append(data)
-            
-            return {
-                "status": "success", 
-                "message": "Status update received", 
-                "queue_size": len(STATUS_QUEUE),
-                "chainlit_processing": True,
-                "server_running": WEBHOOK_SERVER_RUNNING
-            }
         except json.JSONDecodeError as e:
             logger.error(f"Error decoding JSON: {str(e)}")
+            metrics.STATUS_REJECTED.labels("unknown", "invalid_json").inc()
             raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        
+        if not isinstance(data, dict):
+            metrics.STATUS_REJECTED.labels("unknown", "invalid_body").inc()
+            raise HTTPException(status_code=400, detail="Status update must be a JSON object")
+        
+        # A retry of a request already handled gets the original result
+        key = _request_key(request, data, "status")
+        if key is not None:
+            original = DEDUPE.get(key)
+            if original is not None:
+                metrics.STATUS_DEDUPE_HITS.labels("status").inc()
+                return JSONResponse(original, headers={"Idempotent-Replayed": "true"})
+        
+        update_type = data["type"] = normalize_status_type(data.get("type", "info"))
+        
+        logger.info(f"Received status update: {data}")
+        
+        # The body as received: scheduling takes its fields out and enqueueing adds internal ones
+        captured = dict(data)
+        
+        # Hold updates with deliver_at or every until they are due
+        try:
+            scheduled = schedule_status_update(data)
+        except status_scheduler.SchedulerFull as e:
+            metrics.STATUS_REJECTED.labels(update_type, "scheduler_full").inc()
+            traffic_capture.record_status(captured, accepted=False)
+            raise HTTPException(status_code=503, detail=str(e))
+        except status_scheduler.ScheduleError as e:
+            metrics.STATUS_REJECTED.labels(update_type, "invalid_schedule").inc()
+            traffic_capture.record_status(captured, accepted=False)
+            raise HTTPException(status_code=400, detail=str(e))
+        traffic_capture.record_status(captured, accepted=True)
+        if scheduled is not None:
+            metrics.STATUS_RECEIVED.labels(update_type).inc()
+            result = {"status": "success", "message": "Status update scheduled", "scheduled": scheduled}
+            if key is not None:
+                DEDUPE.put(key, result)
+            return result
+        
+        # Add to queue for processing by Chainlit, or forward it to the worker that owns the session
+        routed = route_status_update(data)
+        metrics.STATUS_RECEIVED.labels(update_type).inc()
+        
+        # Tie the update back to the chat turn that caused it
+        if data.get("traceID"):
+            tracing.record_span(
+                "status.ingest",
+                data["traceID"],
+                ingest_start,
+                time.monotonic() - ingest_start_mono,
+                type=update_type
+            )
+        
+        result = {
+            "status": "success", 
+            "message": "Status update received", 
+            "queue_size": len(STATUS_QUEUE),
+            "chainlit_processing": True,
+            "server_running": WEBHOOK_SERVER_RUNNING,
+            "routed": routed
+        }
+        if key is not None:
+            DEDUPE.put(key, result)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing status update: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error processing status update: {str(e)}")
+    finally:
+        profiling.stop(profile_handle)
+
+# Cancel a delayed or recurring update
+@app.delete("/status/scheduled/{timer_id}")
+async def cancel_scheduled(timer_id: int):
+    """Cancel a scheduled status update by the ID returned when it was scheduled"""
+    scheduler = status_scheduler.SCHEDULER
+    if scheduler is None or not scheduler.cancel(timer_id):
+        raise HTTPException(status_code=404, detail=f"No scheduled status update {timer_id}")
+    return {"status": "success", "message": "Scheduled status update cancelled", "scheduled": timer_id}
+
+def _request_key(request: Request, data: Dict[str, Any], endpoint: str) -> Optional[str]:
+    """The request's idempotency key, scoped to the endpoint"""
+    try:
+        key = idempotency_key(request.headers, data)
+    except ValueError as e:
+        metrics.STATUS_REJECTED.labels(endpoint, "invalid_idempotency_key").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    return f"{endpoint}:{key}" if key is not None else None
+
+def _name_list(value: Any, field: str) -> Optional[List[str]]:
+    """A broadcast filter field: a string, a list of strings or absent"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    raise HTTPException(status_code=400, detail=f"'{field}' must be a string or a list of strings")
+
+# Broadcast endpoint: one update for every active session
+@app.post("/broadcast")
+async def broadcast_webhook(request: Request):
+    """
+    Render one update in every active chat session, or in the sessions of the
+    users or roles given in `users` / `roles`, and report how many were reached.
+    """
+    try:
+        data = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        metrics.STATUS_REJECTED.labels("broadcast", "invalid_json").inc()
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        metrics.STATUS_REJECTED.labels("broadcast", "invalid_body").inc()
+        raise HTTPException(status_code=400, detail="Broadcast must be a JSON object")
+    
+    # A retry waits for (or gets) the counts of the original broadcast instead of sending it again
+    key = _request_key(request, data, "broadcast")
+    delivery = DEDUPE.get(key) if key is not None else None
+    if delivery is not None:
+        metrics.STATUS_DEDUPE_HITS.labels("broadcast").inc()
+        return JSONResponse(await _broadcast_result(*delivery), headers={"Idempotent-Replayed": "true"})
+    
+    update_type = str(data.get("type", "system-alert")).strip().lower().replace("_", "-")
+    if update_type not in BROADCAST_TYPES:
+        metrics.STATUS_REJECTED.labels("broadcast", "unknown_type").inc()
+        raise HTTPException(status_code=400, detail=f"Type cannot be broadcast: {update_type}")
+    data["type"] = update_type
+    users = _name_list(data.pop("users", None), "users")
+    roles = _name_list(data.pop("roles", None), "roles")
+    
+    logger.info(f"Received broadcast: {data} (users={users}, roles={roles})")
+    # The other workers fan it out to their own sessions
+    routed = "all_workers" if status_bus.broadcast(dict(data), users, roles) else "local"
+    if routed == "local" and status_bus.BUS is not None:
+        logger.warning("Status bus unavailable; broadcast only reaches this worker's sessions")
+    if _broadcaster is None:
+        # No chat session has connected to this worker yet
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result({"sessions": 0, "delivered": 0, "failed": 0})
+    else:
+        delivery = asyncio.wrap_future(_broadcaster(data, users, roles))
+    if key is not None:
+        DEDUPE.put(key, (delivery, routed))
+    return await _broadcast_result(delivery, routed)
+
+async def _broadcast_result(delivery: "asyncio.Future", routed: str) -> Dict[str, Any]:
+    """The response of a broadcast, once its deliveries on this worker are done"""
+    try:
+        # Shielded: a request giving up must not cancel the broadcast
+        counts = await asyncio.wait_for(asyncio.shield(delivery), _broadcast_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Broadcast still running, delivery counts unavailable")
+    return {"status": "success", "message": "Broadcast delivered", "routed": routed, **counts}
+
+def receive_broadcast(data: Dict[str, Any], users: Optional[List[str]] = None,
+                      roles: Optional[List[str]] = None) -> None:
+    """Fan out a broadcast received by another worker to this worker's sessions (from the bus thread)"""
+    if _broadcaster is None:
+        # No chat session has connected to this worker yet
+        return
+    _broadcaster(data, users, roles)
 
 # Health check endpoint
 @app.get("/health")
@@ -88,91 +294,231 @@ async def health_check():
         "chainlit_processing": True
     }
 
-def is_port_in_use(port: int) -> bool:
-    """Check if a port is already in use"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
+# Liveness probe
+@app.get("/livez")
+async def livez():
+    """Liveness probe: fails only when the Chainlit event loop is stuck"""
+    alive, checks = health.liveness()
+    return JSONResponse({"status": "ok" if alive else "failing", "checks": checks}, status_code=200 if alive else 503)
+
+# Readiness probe
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe computed from cached signals; never calls n8n"""
+    ready, checks = health.readiness()
+    return JSONResponse({"status": "ready" if ready else "not_ready", "checks": checks}, status_code=200 if ready else 503)
+
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
-def stop_webhook_server():
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Bind and listen on the server socket; raises OSError if the port is taken"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def stop_webhook_server(timeout: float = 5.0) -> bool:
     """Stop the webhook server if it's running"""
-    global WEBHOOK_SERVER_RUNNING, WEBHOOK_SERVER_THREAD
+    global WEBHOOK_SERVER, WEBHOOK_SERVER_THREAD
     
-    if WEBHOOK_SERVER_RUNNING:
-        logger.info("Stopping webhook server...")
-        WEBHOOK_SERVER_RUNNING = False
-        
-        # Wait for the server thread to terminate
-        if WEBHOOK_SERVER_THREAD and WEBHOOK_SERVER_THREAD.is_alive():
-            WEBHOOK_SERVER_THREAD.join(timeout=2)
-            logger.info("Webhook server thread stopped")
-        
-        WEBHOOK_SERVER_THREAD = None
-        return True
+    if WEBHOOK_SERVER is None:
+        return False
+    
+    logger.info("Stopping webhook server...")
+    WEBHOOK_SERVER.should_exit = True
+    if WEBHOOK_SERVER_THREAD and WEBHOOK_SERVER_THREAD.is_alive():
+        WEBHOOK_SERVER_THREAD.join(timeout=timeout)
+        logger.info("Webhook server thread stopped")
     
-    return False
+    WEBHOOK_SERVER = None
+    WEBHOOK_SERVER_THREAD = None
+    return True
 
-def start_webhook_server(host: str = "0.0.0.0", port: int = 5679):
-    """Start the webhook server in a separate thread"""
-    global WEBHOOK_SERVER_RUNNING, WEBHOOK_SERVER_THREAD
+def start_webhook_server(host: str = "0.0.0.0", port: int = 5679, timeout: float = 10.0):
+    """
+    Start the webhook server in a separate thread.
+    
+    The socket is bound here, so a port that is taken fails immediately, and the
+    call returns as soon as the server signals it is serving (no fixed sleeps).
+    
+    Args:
+        host: The interface to bind
+        port: The port to bind
+        timeout: Seconds to wait for the server to start
+        
+    Returns:
+        The server thread, or None if the server could not start
+    """
+    global WEBHOOK_SERVER, WEBHOOK_SERVER_THREAD
     
     # Stop any existing server
     stop_webhook_server()
     
-    # Check if the port is already in use
-    if is_port_in_use(port):
-        logger.warning(f"Port {port} is already in use. Attempting to use a different port.")
-        # Try a few different ports
-        for alt_port in [5680, 5681, 5682, 5683]:
-            if not is_port_in_use(alt_port):
-                port = alt_port
-                logger.info(f"Using alternative port {port}")
-                break
-        else:
-            logger.error("Could not find an available port. Webhook server will not start.")
-            return None
+    try:
+        sock = bind_socket(host, port)
+    except OSError as e:
+        logger.error(f"Cannot bind the status webhook server to {host}:{port}: {str(e)}")
+        return None
+    
+    import uvicorn
+    
+    # No log_config: uvicorn logs go through the application's queued handlers
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info", log_config=None))
+    WEBHOOK_SERVER_STARTED.clear()
     
     def run_server():
         global WEBHOOK_SERVER_RUNNING
         logger.info(f"Starting status webhook server on {host}:{port}")
         
         try:
-            import uvicorn
             WEBHOOK_SERVER_RUNNING = True
-            uvicorn.run(app, host=host, port=port, log_level="info")
+            server.run(sockets=[sock])
         except Exception as e:
             logger.error(f"Error running webhook server: {str(e)}")
             logger.error(traceback.format_exc())
         finally:
             logger.info("Status webhook server stopped")
             WEBHOOK_SERVER_RUNNING = False
+            sock.close()
+            # Never leave start_webhook_server() waiting for a server that died
+            WEBHOOK_SERVER_STARTED.set()
     
     # Start the server in a separate thread
-    WEBHOOK_SERVER_THREAD = threading.Thread(target=run_server, daemon=True)
+    WEBHOOK_SERVER = server
+    WEBHOOK_SERVER_THREAD = threading.Thread(target=run_server, name="status-webhook-server", daemon=True)
     WEBHOOK_SERVER_THREAD.start()
     
-    # Wait for the server to start
-    time.sleep(1)
-    
-    # Verify the server is running
-    if is_port_in_use(port):
+    # Wait for the server's startup event
+    if WEBHOOK_SERVER_STARTED.wait(timeout) and WEBHOOK_SERVER_RUNNING:
         logger.info(f"Status webhook server started on http://{host}:{port}")
         return WEBHOOK_SERVER_THREAD
-    else:
-        logger.error(f"Failed to start webhook server on port {port}")
-        WEBHOOK_SERVER_RUNNING = False
+    
+    logger.error(f"Failed to start webhook server on port {port}")
+    stop_webhook_server()
+    return None
+
+def enqueue_status_update(data: Dict[str, Any]) -> None:
+    """Add a status update to the queue and wake up the consumer"""
+    # Enqueue time, used for the enqueue-to-render latency and queue span
+    data["_enqueued_at"] = time.monotonic()
+    data["_enqueued_wall"] = time.time()
+    STATUS_QUEUE.append(data)
+    
+    depth = len(STATUS_QUEUE)
+    metrics.STATUS_QUEUE_DEPTH.set(depth)
+    metrics.STATUS_QUEUE_HIGH_WATER.set_max(depth)
+    
+    if _queue_listener is not None:
+        try:
+            _queue_listener()
+        except Exception as e:
+            logger.error(f"Error notifying status queue listener: {str(e)}")
+
+def route_status_update(data: Dict[str, Any]) -> str:
+    """
+    Enqueue an update for a session of this worker, or forward it over the status bus.
+    
+    Returns:
+        "local" or "forwarded"
+    """
+    session_id = data.get("sessionID")
+    if session_id and session_id not in SESSIONS and status_bus.forward(data):
+        return "forwarded"
+    enqueue_status_update(data)
+    return "local"
+
+def schedule_status_update(data: Dict[str, Any]) -> Optional[int]:
+    """
+    Hand an update with `deliver_at` or `every` to the scheduler.
+    
+    Returns:
+        The timer ID, or None if the update is to be delivered now
+    
+    Raises:
+        status_scheduler.ScheduleError: Invalid scheduling fields, or too many scheduled updates
+    """
+    schedule = status_scheduler.parse_schedule(data, status_scheduler.MIN_INTERVAL)
+    if schedule is None:
         return None
+    if status_scheduler.SCHEDULER is None:
+        raise status_scheduler.SchedulerFull("Scheduled status updates are not enabled")
+    delay, every, count = schedule
+    return status_scheduler.SCHEDULER.schedule(data, delay, every, count)
+
+def ingest_update(data: Dict[str, Any]) -> None:
+    """Accept an update validated by the out-of-process ingestor (see ingest_channel)"""
+    metrics.STATUS_RECEIVED.labels(data.get("type", "info")).inc()
+    try:
+        if schedule_status_update(data) is not None:
+            return
+    except status_scheduler.ScheduleError as e:
+        logger.warning(f"Dropped ingested status update: {str(e)}")
+        return
+    route_status_update(data)
+
+def set_queue_listener(listener: Optional[Callable[[], None]]) -> None:
+    """Register a callable invoked whenever a status update is enqueued"""
+    global _queue_listener
+    _queue_listener = listener
+
+def configure_idempotency(window: float, max_keys: int) -> None:
+    """Set how long and how many idempotency keys are remembered"""
+    global DEDUPE
+    DEDUPE = DedupeCache(window, max_keys)
+
+def set_broadcaster(broadcaster: Optional[Callable[[Dict[str, Any], Optional[List[str]], Optional[List[str]]], Any]],
+                    timeout: float = 30.0) -> None:
+    """Register the callable rendering /broadcast updates, and how long to wait for its counts"""
+    global _broadcaster, _broadcast_timeout
+    _broadcaster = broadcaster
+    _broadcast_timeout = timeout
+
+def register_session(session_id: str, target: Any) -> None:
+    """Register an active chat session as a status update target"""
+    if session_id not in SESSIONS:
+        metrics.ACTIVE_SESSIONS.inc()
+    SESSIONS[session_id] = target
+    # Updates for this session arriving at other workers are forwarded here
+    status_bus.claim(session_id)
+
+def unregister_session(session_id: str, keep_claim: bool = False) -> None:
+    """
+    Forget a chat session that ended.
+    
+    Args:
+        session_id: The session's ID
+        keep_claim: Keep receiving the session's updates from other workers (to buffer
+                    them), and keep its scheduled updates
+    """
+    if SESSIONS.pop(session_id, None) is not None:
+        metrics.ACTIVE_SESSIONS.dec()
+        if not keep_claim:
+            status_bus.release(session_id)
+            status_scheduler.cancel_session(session_id)
 
 # Function to get the next status update from the queue (non-blocking)
 def get_next_status_update() -> Optional[Dict[str, Any]]:
     """Get the next status update from the queue"""
-    if STATUS_QUEUE:
-        return STATUS_QUEUE.pop(0)
-    return None
+    try:
+        update = STATUS_QUEUE.popleft()
+    except IndexError:
+        return None
+    metrics.STATUS_QUEUE_DEPTH.set(len(STATUS_QUEUE))
+    return update
 
 # Function to clear the queue
 def clear_queue() -> None:
     """Clear all status updates from the queue"""
-    global STATUS_QUEUE
     queue_size = len(STATUS_QUEUE)
-    STATUS_QUEUE = []
-    logger.info(f"Cleared status update queue ({queue_size} items)") 
\ No newline at end of file
+    STATUS_QUEUE.clear()
+    metrics.STATUS_QUEUE_DEPTH.set(0)
+    logger.info(f"Cleared status update queue ({queue_size} items)")
@@ -0,0 +1,103 @@
+"""
+Shared Test Helpers
+
+Importing this module puts the repository root on sys.path, so test files can
+import the application modules both under pytest and when run directly
+(`python tests/test_x.py`).
+"""
+
+import asyncio
+import copy
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+
+
+class FakeClock:
+    """A clock for code taking a `clock` callable; tests move `now` by hand."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    """Poll `condition` until it is true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run_tests(namespace: dict, name: str) -> None:
+    """Run the test functions of a module (for `python tests/test_x.py`)."""
+    for test_name, test in list(namespace.items()):
+        if test_name.startswith("test_") and callable(test):
+            result = test()
+            if asyncio.iscoroutine(result):
+                asyncio.run(result)
+    print(f"✅ All {name} tests passed")
+
+
+def chat_context(session_id: str = "s1", websocket: bool = False):
+    """
+    Enter a Chainlit context for a fake chat session (call inside a running loop).
+
+    Messages and elements need a context to be created and sent; the returned
+    emitter records what would have reached the browser instead. With
+    `websocket`, the session is a registered WebsocketSession (socket ID
+    "<session_id>-socket") that a test can restore and delete.
+    """
+    from chainlit.context import ChainlitContext, context_var
+    from chainlit.emitter import BaseChainlitEmitter
+    from chainlit.session import HTTPSession, WebsocketSession
+
+    class RecordingEmitter(BaseChainlitEmitter):
+        def __init__(self, session):
+            super().__init__(session)
+            self.calls = []
+
+        async def send_step(self, step_dict):
+            self.calls.append(("send_step", step_dict))
+
+        async def update_step(self, step_dict):
+            self.calls.append(("update_step", step_dict))
+
+        async def delete_step(self, step_dict):
+            self.calls.append(("delete_step", step_dict))
+
+        async def send_element(self, element_dict):
+            self.calls.append(("send_element", copy.deepcopy(element_dict)))
+
+        async def send_toast(self, message, type="info"):
+            self.calls.append(("send_toast", {"message": message, "type": type}))
+
+        async def emit(self, event, data):
+            # Actions are sent as raw "action" events
+            self.calls.append((event, data))
+
+        def sent(self, kind: str) -> list:
+            return [data for call, data in self.calls if call == kind]
+
+    if websocket:
+        session = WebsocketSession(
+            id=session_id,
+            socket_id=f"{session_id}-socket",
+            emit=None,
+            emit_call=None,
+            user_env={},
+            client_type="webapp"
+        )
+    else:
+        session = HTTPSession(id=session_id, client_type="webapp")
+    emitter = RecordingEmitter(session)
+    context_var.set(ChainlitContext(session, emitter))
+    return emitter
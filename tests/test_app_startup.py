@@ -0,0 +1,30 @@
+"""
+Test App Startup
+
+Checks that importing app.py starts no services; they start and stop with the
+Chainlit server through its app lifecycle hooks.
+"""
+
+from helpers import run_tests
+
+import config
+# Keep test runs out of the application log
+config.LOG_FILE = ""
+
+from chainlit.config import config as chainlit_config
+
+import app
+import status_webhook_integration
+
+
+def test_import_starts_no_services():
+    """The webhook server is not running after import; the hooks are registered"""
+    assert not status_webhook_integration.WEBHOOK_SERVER_RUNNING
+    assert status_webhook_integration.WEBHOOK_SERVER_THREAD is None
+    assert chainlit_config.code.on_app_startup is not None
+    assert chainlit_config.code.on_app_shutdown is not None
+    assert callable(app.start_services) and callable(app.stop_services)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "app startup")
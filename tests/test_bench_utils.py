@@ -0,0 +1,68 @@
+"""
+Test Benchmark Utilities
+
+Checks the percentile and summary helpers used by the benchmark scripts and
+the traffic schedules of the status ingest benchmark.
+"""
+
+import os
+import sys
+
+from helpers import REPO_DIR, run_tests
+
+sys.path.append(os.path.join(REPO_DIR, "benchmarks"))
+
+from bench_utils import percentile, summarize
+from status_ingest import build_schedule, check_regression
+
+
+def test_percentile_interpolates():
+    """Percentiles interpolate between the nearest ranks"""
+    values = [4, 1, 3, 2, 5]
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 3
+    assert percentile(values, 100) == 5
+    assert percentile(values, 75) == 4
+    assert percentile([1, 2], 50) == 1.5
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize():
+    """Summaries include the count, mean, tail percentiles and max"""
+    summary = summarize([0.1] * 98 + [1.0, 2.0])
+    assert summary["count"] == 100
+    assert summary["p50"] == 0.1
+    assert summary["max"] == 2.0
+    assert 1.0 <= summary["p99"] <= 2.0
+    assert abs(summary["mean"] - (9.8 + 3.0) / 100) < 1e-9
+
+
+def test_schedules():
+    """Generated schedules keep the average rate and honour the profile shape"""
+    uniform = build_schedule("uniform", rate=100, duration=2, sessions=4)
+    assert len(uniform) == 200
+    assert uniform[-1]["offset"] < 2
+    assert {record["update"]["sessionID"] for record in uniform} == {f"bench-session-{i}" for i in range(4)}
+
+    bursty = build_schedule("bursty", rate=100, duration=2, sessions=4, burst_size=50)
+    assert len({record["offset"] for record in bursty}) == 4
+
+    hot = build_schedule("one-hot-session", rate=100, duration=10, sessions=10)
+    hot_share = sum(record["update"]["sessionID"] == "bench-session-0" for record in hot) / len(hot)
+    assert hot_share > 0.8
+
+    rejected = build_schedule("uniform", rate=100, duration=10, sessions=1, reject_fraction=0.5)
+    assert 300 < sum(record["update"].get("every") == 0 for record in rejected) < 700
+
+
+def test_check_regression():
+    """Throughput, reject rate and p95 latency are compared against the threshold"""
+    baseline = {"accepted_per_second": 100.0, "reject_rate": 0.0, "ingest_to_render_seconds": {"p95": 0.010}}
+    same = {"accepted_per_second": 95.0, "reject_rate": 0.0, "ingest_to_render_seconds": {"p95": 0.0105}}
+    worse = {"accepted_per_second": 80.0, "reject_rate": 0.0, "ingest_to_render_seconds": {"p95": 0.020}}
+    assert check_regression(same, baseline, 10) == []
+    assert len(check_regression(worse, baseline, 10)) == 2
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Benchmark utility")
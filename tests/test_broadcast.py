@@ -0,0 +1,97 @@
+"""
+Test Broadcast
+
+Checks target selection by user and role, the bounded fan-out of a
+broadcast to many sessions, and that the /broadcast response tells whether
+other workers were reached.
+"""
+
+import asyncio
+import concurrent.futures
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from helpers import run_tests
+
+import status_bus
+import status_webhook_integration
+from broadcast import select_targets, fan_out
+
+
+def context(identifier=None, role=None):
+    user = SimpleNamespace(identifier=identifier, metadata={"role": role}) if identifier else None
+    return SimpleNamespace(session=SimpleNamespace(user=user))
+
+
+def test_select_targets_by_user_and_role():
+    """Without a filter every session is a target; filters match users or roles"""
+    sessions = {
+        "s1": context("alice", "admin"),
+        "s2": context("bob", "user"),
+        "s3": context()
+    }
+    assert len(select_targets(sessions)) == 3
+    assert select_targets(sessions, users=["bob"]) == [sessions["s2"]]
+    assert select_targets(sessions, roles=["admin"]) == [sessions["s1"]]
+    assert len(select_targets(sessions, users=["bob"], roles=["admin"])) == 2
+    assert select_targets(sessions, roles=["guest"]) == []
+
+
+def test_fan_out_is_bounded_and_counts():
+    """At most `concurrency` sends run at once; failures are counted, not raised"""
+    in_flight = 0
+    peak = 0
+
+    async def send(target):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if target % 10 == 0:
+            raise RuntimeError("socket closed")
+
+    counts = asyncio.run(fan_out(list(range(100)), send, concurrency=8))
+    assert counts == {"sessions": 100, "delivered": 90, "failed": 10}
+    assert peak == 8
+
+    assert asyncio.run(fan_out([], send)) == {"sessions": 0, "delivered": 0, "failed": 0}
+
+
+def test_broadcast_is_published_to_other_workers():
+    """With a bus the broadcast is published once and labelled; without one it is local"""
+    published = []
+
+    class Bus:
+        def broadcast(self, update, users, roles):
+            published.append((update["content"], roles))
+            return True
+
+    def broadcaster(update, users, roles):
+        future = concurrent.futures.Future()
+        future.set_result({"sessions": 1, "delivered": 1, "failed": 0})
+        return future
+
+    status_webhook_integration.set_broadcaster(broadcaster, 5)
+    status_bus.BUS = Bus()
+    try:
+        # One client session, so the replay awaits its original on the same loop like under uvicorn
+        with TestClient(status_webhook_integration.app) as client:
+            body = {"type": "system-alert", "content": "Maintenance", "roles": "admin", "id": "bus-broadcast-1"}
+            first = client.post("/broadcast", json=body)
+            assert first.json()["routed"] == "all_workers" and first.json()["delivered"] == 1
+            replay = client.post("/broadcast", json=body)
+            assert replay.headers["Idempotent-Replayed"] == "true"
+            assert replay.json()["routed"] == "all_workers"
+            assert published == [("Maintenance", ["admin"])]
+
+            status_bus.BUS = None
+            assert client.post("/broadcast", json={"content": "Local"}).json()["routed"] == "local"
+    finally:
+        status_bus.BUS = None
+        status_webhook_integration.set_broadcaster(None, 30.0)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "broadcast")
@@ -0,0 +1,115 @@
+"""
+Test Chat Path
+
+Drives on_message against the local n8n stand-in and checks what reaches the
+browser: an agent's actions arrive as one trace element next to the answer,
+the stand-in's failure and streaming profiles behave as configured, and all
+custom toggle buttons are served by one action callback.
+"""
+
+import asyncio
+import json
+import socket
+
+import chainlit as cl
+import requests
+from chainlit.config import config as chainlit_config
+
+from helpers import chat_context, run_tests
+
+import config
+# Keep test runs out of the application log
+config.LOG_FILE = ""
+
+import app
+import loop_monitor
+from mock_n8n_server import MockProfile, MockN8NServer
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_agent_trace_is_sent_with_the_answer():
+    """Twenty actions become one AgentTrace element on the answer, not a status message each"""
+    profile = MockProfile(latency_ms=0, response_chars=50, actions=20, seed=1)
+    url, streaming = config.N8N_WEBHOOK_URL, config.N8N_STREAMING
+
+    async def scenario():
+        emitter = chat_context("chat-trace")
+        await app.on_chat_start()
+        # The monitor would outlive this test's loop and fail later readiness checks
+        loop_monitor.MONITORS.pop("chainlit").stop()
+        emitter.calls.clear()
+        await app.on_message(cl.Message(content="What is on my calendar?"))
+        return emitter
+
+    with MockN8NServer(profile, port=free_port()) as server:
+        config.N8N_WEBHOOK_URL, config.N8N_STREAMING = server.url, False
+        try:
+            emitter = asyncio.run(scenario())
+        finally:
+            config.N8N_WEBHOOK_URL, config.N8N_STREAMING = url, streaming
+
+    elements = emitter.sent("send_element")
+    assert [element["name"] for element in elements] == ["AgentTrace"]
+    assert len(elements[0]["props"]["actions"]) == 20
+    # The placeholder is sent once and then filled with the answer
+    assert len(emitter.sent("send_step")) == 1
+    assert emitter.sent("update_step")[-1]["output"] not in ("", "Thinking...")
+    assert elements[0]["forId"] == emitter.sent("send_step")[0]["id"]
+
+
+def test_stand_in_profiles():
+    """Error injection answers 500; the streaming profile sends begin, items and end"""
+    with MockN8NServer(MockProfile(latency_ms=0, error_rate=1.0, seed=1), port=free_port()) as server:
+        response = requests.post(server.url, json={"chatInput": "hi"}, timeout=5)
+        assert response.status_code == 500
+        assert server.stats == {"requests": 1, "errors": 1, "timeouts": 0, "status_callbacks": 0}
+
+    profile = MockProfile(latency_ms=0, streaming=True, response_chars=100, chunk_chars=10,
+                          chunk_interval_ms=0, seed=1)
+    with MockN8NServer(profile, port=free_port()) as server:
+        response = requests.post(server.url, json={"chatInput": "hi"}, timeout=5)
+        chunks = [json.loads(line) for line in response.text.splitlines()]
+        assert chunks[0]["type"] == "begin" and chunks[-1]["type"] == "end"
+        assert all(len(chunk["content"]) <= 10 for chunk in chunks[1:-1])
+        assert len(chunks) > 5
+
+
+def test_toggles_share_one_action_callback():
+    """Adding toggles registers no callbacks; the shared one flips the clicked toggle"""
+
+    async def scenario():
+        emitter = chat_context("chat-toggle")
+        state = app.get_session_state()
+        callbacks = len(chainlit_config.code.action_callbacks)
+        await app.handle_custom_widget_command("/add_toggle search Search")
+        await app.handle_custom_widget_command("/add_toggle memory Memory")
+        assert len(chainlit_config.code.action_callbacks) == callbacks
+
+        buttons = emitter.sent("action")
+        assert [(b["name"], b["payload"]["widget_id"]) for b in buttons] == [
+            (app.TOGGLE_ACTION, "search"), (app.TOGGLE_ACTION, "memory")
+        ]
+        sent = emitter.calls[:]
+        click = cl.Action(name=app.TOGGLE_ACTION, payload={"widget_id": "memory"})
+        await chainlit_config.code.action_callbacks[app.TOGGLE_ACTION](click)
+        assert state.get_toggle("memory") and not state.get_toggle("search")
+
+        await chainlit_config.code.action_callbacks[app.TOGGLE_ACTION](
+            cl.Action(name=app.TOGGLE_ACTION, payload={"widget_id": "missing"})
+        )
+        messages = [data["output"] for call, data in emitter.calls[len(sent):] if call == "send_step"]
+        assert messages[0].endswith("turned **ON**")
+        assert messages[-1] == "Unknown toggle: missing"
+        # The confirmation carries a fresh button showing the new state
+        assert emitter.sent("action")[-1]["label"] == "Memory: ON"
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "chat path")
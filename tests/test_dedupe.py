@@ -0,0 +1,79 @@
+"""
+Test Dedupe
+
+Checks idempotency key extraction and the time-windowed LRU of request results,
+and that /status tells apart the same body id in different chats.
+"""
+
+from fastapi.testclient import TestClient
+
+from helpers import FakeClock, run_tests
+
+import status_webhook_integration
+from dedupe import DedupeCache, idempotency_key
+
+
+def test_idempotency_key():
+    """The header wins over the body's id, which is scoped by sessionID; invalid keys are rejected"""
+    assert idempotency_key({}, {"type": "info"}) is None
+    assert idempotency_key({}, {"id": 42}) == "42"
+    assert idempotency_key({"Idempotency-Key": "run-1/node-3"}, {"id": 42}) == "run-1/node-3"
+    # A body id is scoped by its session; the header is used as given
+    assert idempotency_key({}, {"id": 42, "sessionID": "s1"}) != idempotency_key({}, {"id": 42, "sessionID": "s2"})
+    assert idempotency_key({}, {"id": 42, "sessionID": "s1"}) != idempotency_key({}, {"id": 42})
+    assert idempotency_key({"Idempotency-Key": "k"}, {"sessionID": "s1"}) == "k"
+    for headers, data in (({}, {"id": {"nested": 1}}), ({}, {"id": ""}), ({"Idempotency-Key": "x" * 300}, {})):
+        try:
+            idempotency_key(headers, data)
+            assert False, f"Expected ValueError for {headers} {data}"
+        except ValueError:
+            pass
+
+
+def test_repeats_within_window_hit():
+    """A key is remembered for the window, then forgotten"""
+    clock = FakeClock()
+    cache = DedupeCache(window=60, clock=clock)
+    assert cache.get("a") is None
+    cache.put("a", {"status": "success", "routed": "local"})
+
+    clock.now = 59.0
+    assert cache.get("a") == {"status": "success", "routed": "local"}
+    assert cache.hits == 1
+
+    clock.now = 61.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_oldest_keys_evicted_at_capacity():
+    """At most max_keys are remembered, oldest evicted first"""
+    clock = FakeClock()
+    cache = DedupeCache(window=60, max_keys=3, clock=clock)
+    for i in range(5):
+        clock.now = float(i)
+        cache.put(str(i), i)
+    assert len(cache) == 3
+    assert cache.get("0") is None and cache.get("1") is None
+    assert cache.get("4") == 4
+
+
+def test_same_id_in_two_sessions_is_not_a_retry():
+    """Chats numbering their updates alike both get theirs; a real retry is replayed"""
+    client = TestClient(status_webhook_integration.app)
+    status_webhook_integration.clear_queue()
+    try:
+        for session_id in ("dedupe-s1", "dedupe-s2", "dedupe-s1"):
+            response = client.post("/status", json={"type": "info", "id": 1, "sessionID": session_id})
+            assert response.status_code == 200
+        assert "Idempotent-Replayed" in response.headers
+        queued = []
+        while (update := status_webhook_integration.get_next_status_update()) is not None:
+            queued.append(update["sessionID"])
+        assert queued == ["dedupe-s1", "dedupe-s2"]
+    finally:
+        status_webhook_integration.clear_queue()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "dedupe")
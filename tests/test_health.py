@@ -0,0 +1,63 @@
+"""
+Test Health
+
+Checks the n8n circuit breaker state machine and the readiness checks.
+"""
+
+from helpers import FakeClock, run_tests
+
+import health
+import metrics
+from health import CircuitBreaker
+
+
+def test_circuit_opens_and_recovers():
+    """Consecutive failures open the circuit; one trial after the timeout closes it"""
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=clock)
+
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow(), "only one trial call while half open"
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    """A failed trial call opens the circuit for another reset timeout"""
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now = 9
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+
+
+def test_readiness_checks_queue_depth():
+    """Readiness fails when the status queue is deeper than the threshold"""
+    health.configure(max_queue_depth=10)
+    metrics.STATUS_QUEUE_DEPTH.set(5)
+    ready, checks = health.readiness()
+    assert ready and checks["status_queue"]["ok"]
+
+    metrics.STATUS_QUEUE_DEPTH.set(10)
+    ready, checks = health.readiness()
+    assert not ready and not checks["status_queue"]["ok"]
+    metrics.STATUS_QUEUE_DEPTH.set(0)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Health")
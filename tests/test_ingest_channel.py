@@ -0,0 +1,207 @@
+"""
+Test Ingest Channel
+
+Checks the shared memory ring buffer, that updates sent by an ingestor reach
+the consumer over both channels (also after the Chainlit process restarts),
+and that the ingestor refuses scheduled updates the app could not accept.
+"""
+
+import importlib.util
+import os
+import queue
+import tempfile
+
+from fastapi.testclient import TestClient
+
+from helpers import REPO_DIR, wait_for, run_tests
+
+from ingest_channel import (HEADER, RingBuffer, IngestConsumer, IngestProducer, default_address,
+                            encode_update, decode_update)
+
+
+def test_ring_wraps_and_fills():
+    """Frames come out in order across the end of the buffer; a full ring refuses writes"""
+    name = f"chainfin-test-{os.getpid()}"
+    ring = RingBuffer(name, size=HEADER.size + 64, create=True)
+    try:
+        assert ring.read() is None
+        assert ring.write(b"x" * 20)
+        assert ring.write(b"y" * 20)
+        assert not ring.write(b"z" * 20)
+        assert ring.read() == b"x" * 20
+        # Does not fit in the tail, starts over at the beginning of the buffer
+        assert ring.write(b"z" * 20)
+        assert ring.read() == b"y" * 20
+        assert ring.read() == b"z" * 20
+        assert ring.read() is None
+        assert ring.used() == 0
+        # Larger than half the ring
+        assert not ring.write(b"w" * 40)
+    finally:
+        ring.close()
+
+
+def test_encode_round_trip():
+    """Updates survive pre-serialization unchanged"""
+    update = {"type": "progress", "progress": 3, "target": 10, "sessionID": "s1", "content": "Söker"}
+    assert decode_update(encode_update(update)) == update
+
+
+def test_updates_reach_consumer():
+    """An ingestor's updates are handed to the consumer callback over ring and pipe"""
+    for kind in ("ring", "pipe"):
+        with tempfile.TemporaryDirectory() as directory:
+            address = f"chainfin-test-{os.getpid()}" if kind == "ring" else os.path.join(directory, "ingest.sock")
+            received = queue.SimpleQueue()
+            consumer = IngestConsumer(kind, address, received.put, ring_size=64 * 1024)
+            consumer.start()
+            producer = IngestProducer(kind, address, connect_timeout=5)
+            try:
+                for i in range(100):
+                    assert producer.send(encode_update({"type": "progress", "progress": i}))
+                assert [received.get(timeout=5)["progress"] for _ in range(100)] == list(range(100))
+                assert producer.sent == 100
+            finally:
+                producer.close()
+                consumer.stop()
+
+
+def test_producer_follows_a_restarted_consumer():
+    """After a clean restart, and after one that left the old ring behind, updates reach the new consumer"""
+    name = f"chainfin-test-restart-{os.getpid()}"
+    received = queue.SimpleQueue()
+    first = IngestConsumer("ring", name, received.put, ring_size=64 * 1024)
+    first.start()
+    producer = IngestProducer("ring", name, connect_timeout=5, stall_timeout=0.05)
+    second = third = None
+    try:
+        assert producer.send(encode_update({"n": 1}))
+        assert received.get(timeout=5)["n"] == 1
+
+        # Clean restart: the closed ring is refused until the new one exists
+        first.stop()
+        assert not producer.send(encode_update({"n": 2}))
+        second = IngestConsumer("ring", name, received.put, ring_size=64 * 1024)
+        second.start()
+        assert producer.send(encode_update({"n": 3}))
+        assert received.get(timeout=5)["n"] == 3
+
+        # A crashed process never closes its ring: the stalled reader gives it away
+        second._stop.set()
+        second._thread.join(2)
+        third = IngestConsumer("ring", name, received.put, ring_size=64 * 1024)
+        third.start()
+        assert producer.send(encode_update({"n": 4}))
+        assert wait_for(lambda: producer.send(encode_update({"n": 5})) and not received.empty())
+        assert received.get(timeout=5)["n"] == 5
+    finally:
+        producer.close()
+        for consumer in (third, second):
+            if consumer is not None:
+                consumer.stop()
+
+
+def test_workers_keep_their_own_rings():
+    """Two workers on one host each get a ring under their worker ID; neither replaces the other's"""
+    names = [default_address("ring", f"w{n}-{os.getpid()}") for n in (1, 2)]
+    assert names[0] != names[1]
+    assert default_address("pipe", "w1") == "/tmp/chainfin-status-ingest-w1.sock"
+    received = [queue.SimpleQueue(), queue.SimpleQueue()]
+    consumers = [IngestConsumer("ring", name, inbox.put, ring_size=64 * 1024) for name, inbox in zip(names, received)]
+    producers = []
+    try:
+        for consumer in consumers:
+            consumer.start()
+        producers = [IngestProducer("ring", name, connect_timeout=5) for name in names]
+        for n, producer in enumerate(producers):
+            assert producer.send(encode_update({"worker": n}))
+        assert [inbox.get(timeout=5)["worker"] for inbox in received] == [0, 1]
+    finally:
+        for producer in producers:
+            producer.close()
+        for consumer in consumers:
+            consumer.stop()
+
+
+def test_failed_pipe_send_after_reconnect_is_reported():
+    """A send that fails again on the new connection returns False instead of raising"""
+
+    class BrokenConnection:
+        def send_bytes(self, payload):
+            raise BrokenPipeError("broken pipe")
+
+        def close(self):
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        address = os.path.join(directory, "ingest.sock")
+        consumer = IngestConsumer("pipe", address, lambda update: None)
+        consumer.start()
+        producer = IngestProducer("pipe", address, connect_timeout=5)
+        try:
+            producer.conn = BrokenConnection()
+            producer._reconnect = lambda: True
+            assert not producer.send(encode_update({"n": 1}))
+            assert producer.dropped == 1
+        finally:
+            producer.close = lambda: None
+            consumer.stop()
+
+
+def test_scheduler_state_reaches_producer():
+    """The consumer's scheduler_full is visible to the producer over both channels"""
+    for kind in ("ring", "pipe"):
+        with tempfile.TemporaryDirectory() as directory:
+            address = f"chainfin-test-flags-{os.getpid()}" if kind == "ring" else os.path.join(directory, "ingest.sock")
+            full = [False]
+            consumer = IngestConsumer(kind, address, lambda update: None, ring_size=64 * 1024,
+                                      scheduler_full=lambda: full[0])
+            consumer.start()
+            producer = IngestProducer(kind, address, connect_timeout=5)
+            try:
+                assert wait_for(lambda: not producer.scheduler_full())
+                full[0] = True
+                assert wait_for(producer.scheduler_full)
+                full[0] = False
+                assert wait_for(lambda: not producer.scheduler_full())
+            finally:
+                producer.close()
+                consumer.stop()
+
+
+def test_forwarder_answers_scheduling_errors():
+    """Invalid schedules get 400 and a full scheduler 503 before anything is forwarded"""
+    spec = importlib.util.spec_from_file_location(
+        "status_webhook_server", os.path.join(REPO_DIR, "scripts", "status_webhook_server.py")
+    )
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+
+    class Producer:
+        kind = "ring"
+        full = False
+        sent = []
+
+        def scheduler_full(self):
+            return self.full
+
+        def send(self, payload):
+            self.sent.append(decode_update(payload))
+            return True
+
+    server.producer = producer = Producer()
+    server.normalize_status_type = lambda update_type: update_type
+    client = TestClient(server.app)
+
+    assert client.post("/status", json={"type": "info", "every": 0.001}).status_code == 400
+    assert client.post("/status", json={"type": "info", "deliver_at": "tomorrow"}).status_code == 400
+    producer.full = True
+    assert client.post("/status", json={"type": "info", "every": 60}).status_code == 503
+    assert client.post("/status", json={"type": "info", "content": "now"}).status_code == 200
+    producer.full = False
+    assert client.post("/status", json={"type": "info", "every": 60}).status_code == 200
+    assert [update.get("every") for update in producer.sent] == [None, 60]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "ingest channel")
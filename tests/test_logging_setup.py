@@ -0,0 +1,49 @@
+"""
+Test Logging Setup
+
+Checks size-based rotation with gzip compression and per-module level parsing.
+"""
+
+import gzip
+import logging
+import os
+import tempfile
+
+from helpers import run_tests
+
+from logging_setup import CompressingRotatingFileHandler, parse_levels
+
+
+def test_rotation_compresses_backups():
+    """Rotated files are gzip compressed and bounded by the backup count"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.log")
+        handler = CompressingRotatingFileHandler(path, maxBytes=200, backupCount=2, when="")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("test_logging_setup")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(40):
+                logger.warning(f"log line number {i:03d}")
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        names = sorted(os.listdir(directory))
+        assert names == ["app.log", "app.log.1.gz", "app.log.2.gz"]
+        with gzip.open(os.path.join(directory, "app.log.1.gz"), "rt") as f:
+            assert "log line number" in f.read()
+
+
+def test_parse_levels():
+    """Per-module levels are parsed from a comma-separated list"""
+    assert parse_levels("status_webhook=warning, httpx=ERROR,,bad") == {
+        "status_webhook": "WARNING",
+        "httpx": "ERROR"
+    }
+    assert parse_levels("") == {}
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Logging setup")
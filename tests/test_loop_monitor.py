@@ -0,0 +1,56 @@
+"""
+Test Loop Monitor
+
+Checks that a blocking call on a monitored loop is detected and reported with
+the stack of the blocking call.
+"""
+
+import asyncio
+import logging
+import time
+
+import helpers  # noqa: F401  (puts the repository root on sys.path)
+
+import loop_monitor
+
+
+def blocking_call():
+    """Block the event loop like a synchronous HTTP request would"""
+    time.sleep(0.5)
+
+
+def test_blocking_call_is_reported(caplog):
+    """The watchdog logs the blocking call's stack once per stall"""
+    loop_monitor.configure(interval=0.02, threshold=0.1)
+
+    async def run():
+        monitor = loop_monitor.ensure_monitor("test")
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.2)
+        monitor.stop()
+        return monitor
+
+    with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+        monitor = asyncio.run(run())
+
+    assert monitor.blocks == 1
+    reports = [record.getMessage() for record in caplog.records if "Blocking call stack" in record.getMessage()]
+    assert len(reports) == 1
+    assert "blocking_call" in reports[0]
+    assert sum(monitor._lag.counts) > 0
+
+
+def test_disabled_monitor():
+    """No monitor is started when monitoring is disabled"""
+    loop_monitor.configure(enabled=False)
+
+    async def run():
+        return loop_monitor.ensure_monitor("disabled")
+
+    assert asyncio.run(run()) is None
+    loop_monitor.configure()
+
+
+if __name__ == "__main__":
+    print("Run with pytest: python -m pytest tests/test_loop_monitor.py")
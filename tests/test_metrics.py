@@ -0,0 +1,48 @@
+"""
+Test Metrics
+
+Checks the Prometheus text exposition rendering of the metrics module.
+"""
+
+from helpers import run_tests
+
+from metrics import Registry
+
+
+def test_counter_and_gauge_rendering():
+    """Counters and gauges render with labels, HELP and TYPE lines"""
+    registry = Registry()
+    received = registry.counter("test_received_total", "Received updates.", ["type"])
+    depth = registry.gauge("test_queue_high_water", "High-water mark.")
+
+    received.labels("info").inc()
+    received.labels("info").inc()
+    received.labels('we"ird').inc()
+    depth.set_max(3)
+    depth.set_max(2)
+
+    text = registry.render()
+    assert "# TYPE test_received_total counter" in text
+    assert 'test_received_total{type="info"} 2' in text
+    assert 'test_received_total{type="we\\"ird"} 1' in text
+    assert "test_queue_high_water 3" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Histogram buckets are cumulative and end with +Inf"""
+    registry = Registry()
+    latency = registry.histogram("test_latency_seconds", "Latency.", ["provider"], buckets=(0.1, 1.0))
+
+    latency.labels("openai").observe(0.05)
+    latency.labels("openai").observe(0.5)
+    latency.labels("openai").observe(5)
+
+    text = registry.render()
+    assert 'test_latency_seconds_bucket{provider="openai",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{provider="openai",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{provider="openai",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{provider="openai"} 3' in text
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "metrics")
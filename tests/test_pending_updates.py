@@ -0,0 +1,84 @@
+"""
+Test Pending Updates
+
+Checks buffering of status updates for detached sessions: progress collapsing,
+the size cap and expiry of sessions that do not come back.
+"""
+
+from helpers import FakeClock, run_tests
+
+from pending_updates import PendingUpdates
+
+
+def test_only_detached_sessions_are_buffered():
+    """Updates for sessions that were never detached are not kept"""
+    pending = PendingUpdates(ttl=60, clock=FakeClock())
+    assert not pending.add({"sessionID": "s1", "type": "info"})
+    assert not pending.add({"type": "info"})
+
+    pending.detach("s1")
+    assert pending.add({"sessionID": "s1", "type": "info", "content": "a"})
+    assert pending.take("s1") == [{"sessionID": "s1", "type": "info", "content": "a"}]
+    # Taking the updates ends buffering
+    assert not pending.add({"sessionID": "s1", "type": "info"})
+    assert pending.take("s1") == []
+
+
+def test_drain_keeps_buffering():
+    """Draining returns the updates so far; later ones are still held"""
+    pending = PendingUpdates(ttl=60, clock=FakeClock())
+    pending.detach("s1")
+    pending.add({"sessionID": "s1", "type": "info", "content": "a"})
+    assert [u["content"] for u in pending.drain("s1")] == ["a"]
+    assert pending.drain("s1") == [] and pending.count == 0
+    assert pending.add({"sessionID": "s1", "type": "info", "content": "b"})
+    assert [u["content"] for u in pending.take("s1")] == ["b"]
+
+
+def test_progress_collapses_to_latest():
+    """A progress update replaces the earlier progress of the same step"""
+    pending = PendingUpdates(ttl=60, clock=FakeClock())
+    pending.detach("s1")
+    pending.add({"sessionID": "s1", "type": "progress", "title": "Search", "progress": 1})
+    pending.add({"sessionID": "s1", "type": "info", "content": "Found results"})
+    pending.add({"sessionID": "s1", "type": "progress", "title": "Search", "progress": 5})
+    pending.add({"sessionID": "s1", "type": "progress", "title": "Summarize", "progress": 2})
+
+    updates = pending.take("s1")
+    assert [(u["type"], u.get("progress")) for u in updates] == [("info", None), ("progress", 5), ("progress", 2)]
+    assert pending.count == 0
+
+
+def test_cap_drops_oldest():
+    """At most max_updates are kept per session, oldest dropped first"""
+    pending = PendingUpdates(ttl=60, max_updates=3, clock=FakeClock())
+    pending.detach("s1")
+    for i in range(5):
+        pending.add({"sessionID": "s1", "type": "info", "content": str(i)})
+    assert [u["content"] for u in pending.take("s1")] == ["2", "3", "4"]
+
+
+def test_sessions_that_never_return_expire():
+    """A detached session is forgotten with its updates after the TTL"""
+    clock = FakeClock()
+    expired = []
+    pending = PendingUpdates(ttl=60, on_expire=expired.append, clock=clock)
+    pending.detach("s1")
+    clock.now = 30.0
+    pending.detach("s2")
+    pending.add({"sessionID": "s1", "type": "info"})
+    pending.add({"sessionID": "s2", "type": "info"})
+
+    clock.now = 61.0
+    assert pending.take("s1") == []
+    assert expired == ["s1"]
+    assert "s2" in pending and pending.count == 1
+
+    clock.now = 91.0
+    assert pending.expire() == 1
+    assert len(pending) == 0 and pending.count == 0
+    assert expired == ["s1", "s2"]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "pending updates")
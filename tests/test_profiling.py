@@ -0,0 +1,76 @@
+"""
+Test Profiling
+
+Checks that the sampling profiler attributes samples to the registered frame
+and writes collapsed stacks and speedscope files.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from helpers import run_tests
+
+from profiling import SamplingProfiler, render_speedscope
+
+
+def busy_turn(profiler, done):
+    """Burn CPU inside a registered frame"""
+    frame = sys._getframe()
+    profiler.register(frame, "turn-1")
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    profiler.unregister(frame)
+    done.set()
+
+
+def test_samples_are_attributed_to_registered_frames():
+    """Only stacks containing the registered frame end up in its profile"""
+    with tempfile.TemporaryDirectory() as directory:
+        profiler = SamplingProfiler(directory, interval=0.005, max_turns_per_minute=60)
+        profiler.start()
+        done = threading.Event()
+        threading.Thread(target=busy_turn, args=(profiler, done)).start()
+        done.wait(5)
+        time.sleep(0.1)
+        profiler.stop()
+
+        files = os.listdir(directory)
+        assert len(files) == 1 and files[0].endswith("turn-1.collapsed")
+        with open(os.path.join(directory, files[0])) as f:
+            lines = f.read().splitlines()
+        assert lines
+        assert all("busy_turn (test_profiling.py" in line for line in lines)
+
+
+def test_turn_rate_limit():
+    """Turns beyond the per-minute budget are not profiled"""
+    profiler = SamplingProfiler(tempfile.gettempdir(), max_turns_per_minute=2)
+    frame = sys._getframe()
+    assert profiler.register(frame, "a") is not None
+    profiler.unregister(frame)
+    assert profiler.register(frame, "b") is not None
+    profiler.unregister(frame)
+    assert profiler.register(frame, "c") is None
+    assert profiler.turns_skipped == 1
+
+
+def test_speedscope_rendering():
+    """Speedscope output shares frames between samples"""
+    profiler = SamplingProfiler(tempfile.gettempdir())
+    profile = profiler.register(sys._getframe(), "x", aggregate=True)
+    profile.add("main (app.py:1);work (app.py:10)")
+    profile.add("main (app.py:1);work (app.py:10)")
+    profile.add("main (app.py:1);idle (app.py:20)")
+    data = json.loads(render_speedscope(profile, 0.01))
+    assert [frame["name"] for frame in data["shared"]["frames"]] == ["main", "work", "idle"]
+    assert data["profiles"][0]["samples"] == [[0, 1], [0, 2]]
+    assert data["profiles"][0]["weights"] == [0.02, 0.01]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Profiling")
@@ -0,0 +1,128 @@
+"""
+Test Response Renderer
+
+Checks that element paths stay inside ELEMENT_FILES_DIR and that an element
+which fails to load is skipped instead of failing the whole reply, and that
+errors keep their System styling.
+"""
+
+import asyncio
+import os
+import tempfile
+
+import chainlit as cl
+
+from helpers import chat_context, run_tests
+
+import config
+import response_renderer
+from response_renderer import resolve_element_path, build_element, prepare_message
+
+
+def test_paths_are_confined_to_root():
+    """Only files under the root resolve; absolute, `..` and symlink escapes do not"""
+    with tempfile.TemporaryDirectory() as outside, tempfile.TemporaryDirectory() as root:
+        secret = os.path.join(outside, "secret.txt")
+        with open(secret, "w") as f:
+            f.write("secret")
+        os.makedirs(os.path.join(root, "charts"))
+        with open(os.path.join(root, "charts", "q1.png"), "wb") as f:
+            f.write(b"png")
+        os.symlink(secret, os.path.join(root, "link.txt"))
+
+        assert resolve_element_path("charts/q1.png", root) is not None
+        assert resolve_element_path("charts/q1.png", "") is None
+        assert resolve_element_path(secret, root) is None
+        assert resolve_element_path(os.path.join("..", os.path.basename(outside), "secret.txt"), root) is None
+        assert resolve_element_path("link.txt", root) is None
+        assert resolve_element_path("charts", root) is None
+        assert resolve_element_path("missing.png", root) is None
+        assert resolve_element_path(42, root) is None
+
+
+def test_build_element_refuses_paths_outside_root():
+    """A refused path yields no element; an allowed one is loaded"""
+
+    async def scenario():
+        chat_context()
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, "report.txt"), "wb") as f:
+                f.write(b"quarterly")
+            original = config.ELEMENT_FILES_DIR
+            config.ELEMENT_FILES_DIR = root
+            try:
+                assert await build_element({"type": "text", "path": "/etc/passwd"}) is None
+                assert await build_element({"type": "text", "path": "../../etc/passwd"}) is None
+                element = await build_element({"type": "file", "path": "report.txt", "name": "report"})
+                assert element.content == b"quarterly"
+
+                config.ELEMENT_FILES_DIR = ""
+                assert await build_element({"type": "file", "path": "report.txt"}) is None
+            finally:
+                config.ELEMENT_FILES_DIR = original
+
+    asyncio.run(scenario())
+
+
+def test_failing_element_is_skipped():
+    """Invalid base64 drops that element only; the reply and other elements remain"""
+
+    async def scenario():
+        chat_context()
+        message = await prepare_message({
+            "output": "Here you go",
+            "elements": [
+                {"type": "image", "name": "broken", "content": "not base64!", "encoding": "base64"},
+                {"type": "text", "name": "notes", "content": "hello"}
+            ]
+        })
+        assert message.content == "Here you go"
+        assert [element.name for element in message.elements] == ["notes"]
+
+    asyncio.run(scenario())
+
+
+def test_failed_element_send_keeps_the_answer():
+    """An element that cannot be sent is left off the placeholder, which is still updated"""
+
+    async def scenario():
+        emitter = chat_context()
+        placeholder = cl.Message(content="Thinking...")
+        await placeholder.send()
+        prepared = await prepare_message({
+            "output": "Answer",
+            "elements": [{"type": "text", "name": "a", "content": "a"}, {"type": "text", "name": "b", "content": "b"}]
+        })
+
+        async def refuse(for_id, persist=True):
+            raise ConnectionError("socket closed")
+        prepared.elements[0].send = refuse
+
+        sends = await response_renderer._adopt(placeholder, prepared)
+        assert sends == 3
+        assert [element.name for element in placeholder.elements] == ["b"]
+        assert emitter.sent("update_step")[-1]["output"] == "Answer"
+        # Each element crosses the wire once
+        assert [element["name"] for element in emitter.sent("send_element")] == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_error_replaces_placeholder_as_system_message():
+    """An error removes the placeholder and is sent with the System error styling"""
+
+    async def scenario():
+        emitter = chat_context()
+        placeholder = cl.Message(content="Thinking...", author="Assistant")
+        await placeholder.send()
+
+        assert await response_renderer.replace_with_error(placeholder, "n8n is down") == 2
+        assert emitter.sent("delete_step")[0]["id"] == placeholder.id
+        error = emitter.sent("send_step")[-1]
+        assert (error["output"], error["name"], error["type"]) == ("n8n is down", "System", "error")
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "response renderer")
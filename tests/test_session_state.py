@@ -0,0 +1,63 @@
+"""
+Test Session State
+
+Checks the slotted session state and its cached payload template.
+"""
+
+from helpers import run_tests
+
+from session_state import SessionState, MODE_FLAGS
+
+
+def test_payload_follows_updates():
+    """Settings, model and toggle changes are patched into the payload"""
+    state = SessionState("session-1", "openai", "gpt-4o")
+    payload = state.build_payload("Hello", "trace-1")
+    assert payload["chatInput"] == "Hello"
+    assert payload["traceID"] == "trace-1"
+    assert payload["sessionID"] == "session-1"
+    assert payload["model"] == "gpt-4o"
+    assert all(payload[flag] is False for flag in MODE_FLAGS)
+
+    state.update_modes({"reasoning_mode": True, "web_search_mode": True})
+    state.set_model("anthropic", "claude-3-5-sonnet")
+    state.add_widget("concise", {"type": "toggle", "label": "Concise"})
+    state.add_widget("summarize", {"type": "button", "label": "Summarize"})
+    payload = state.build_payload("Again", "trace-2")
+    assert payload["reasoning_mode"] is True
+    assert payload["privacy_mode"] is False
+    assert payload["provider"] == "anthropic"
+    assert payload["concise"] is False
+    assert "summarize" not in payload
+
+    state.set_toggle("concise", True)
+    assert state.build_payload("Third")["concise"] is True
+    assert state.modes()["web_search_mode"] is True
+
+
+def test_payloads_are_independent():
+    """A built payload can be changed without touching the template"""
+    state = SessionState("session-2")
+    payload = state.build_payload("One", "trace-1")
+    payload["extra"] = 1
+    payload["provider"] = "changed"
+    again = state.build_payload("Two", "trace-2")
+    assert "extra" not in again
+    assert again["provider"] is None
+    assert list(again)[:3] == ["chatInput", "sessionID", "traceID"]
+
+
+def test_state_is_slotted():
+    """The state has no per-instance __dict__"""
+    state = SessionState("session-3")
+    assert not hasattr(state, "__dict__")
+    try:
+        state.unknown = True
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Unexpected attribute accepted")
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "session state")
@@ -0,0 +1,94 @@
+"""
+Test Session Store
+
+Checks batched persistence, lazy restore and idle eviction of session state.
+"""
+
+import os
+import tempfile
+
+from helpers import FakeClock, run_tests
+
+from session_state import SessionState
+from session_store import SessionStore, SQLiteBackend, MemoryBackend
+
+
+def make_state(thread_id):
+    state = SessionState(f"session-{thread_id}", "openai", "gpt-4o", thread_id=thread_id)
+    state.update_modes({"privacy_mode": True})
+    state.add_widget("concise", {"type": "toggle", "label": "Concise", "icon": "", "description": None})
+    state.set_toggle("concise", True)
+    return state
+
+
+def test_state_survives_restart():
+    """A state saved by one store is restored by a new store on the same database"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        store = SessionStore(SQLiteBackend(path))
+        store.touch(make_state("thread-1"))
+        assert store.flush() == 1
+        store.close()
+
+        restored = SessionStore(SQLiteBackend(path)).get("thread-1")
+        assert restored.session_id == "session-thread-1"
+        assert restored.privacy_mode is True
+        assert restored.get_toggle("concise") is True
+        assert restored.build_payload("Hi")["concise"] is True
+        assert SessionStore(SQLiteBackend(path)).get("thread-2") is None
+
+
+def test_only_changes_are_written():
+    """Touching an unchanged state does not queue another write"""
+    store = SessionStore(MemoryBackend())
+    state = make_state("thread-1")
+    store.touch(state)
+    assert store.flush() == 1
+    store.touch(state)
+    state.set_model("openai", "gpt-4o")
+    store.touch(state)
+    assert store.flush() == 0
+
+    state.update_modes({"reasoning_mode": True})
+    store.touch(state)
+    assert store.flush() == 1
+    assert store.backend.load("thread-1")["modes"]["reasoning_mode"] is True
+
+
+def test_replacement_state_is_written():
+    """A new state object for a thread is saved even if its version matches the old one's"""
+    store = SessionStore(MemoryBackend())
+    state = make_state("thread-1")
+    state.set_model("openai", "gpt-4.1")
+    store.touch(state)
+    assert store.flush() == 1
+
+    replacement = make_state("thread-1")
+    replacement.set_model("anthropic", "claude-sonnet")
+    assert replacement.version == state.version
+    store.touch(replacement)
+    assert store.flush() == 1
+    assert store.backend.load("thread-1")["provider"] == "anthropic"
+
+
+def test_idle_and_excess_states_are_evicted():
+    """Idle states and states beyond max_entries leave memory but stay loadable"""
+    clock = FakeClock()
+    store = SessionStore(MemoryBackend(), max_entries=2, idle_timeout=60, clock=clock)
+    for thread_id in ("a", "b", "c"):
+        store.touch(make_state(thread_id))
+    assert len(store) == 2
+
+    clock.now = 30.0
+    store.touch(store.get("b"))
+    clock.now = 70.0
+    assert store.evict() == 1
+    assert len(store) == 1
+
+    # Evicted states are restored from the pending snapshots or the backend
+    store.flush()
+    assert store.get("a").session_id == "session-a"
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "session store")
@@ -0,0 +1,115 @@
+"""
+Test Status Bus
+
+Checks session ownership expiry and forwarding of updates and broadcasts
+between workers through the Unix socket broker.
+"""
+
+import asyncio
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+
+from helpers import FakeClock, wait_for, run_tests
+
+from status_bus import SessionRegistry, Broker, UnixBusClient
+
+
+def test_claims_expire_and_release():
+    """Claims expire, are released only by their owner, and go with their worker"""
+    clock = FakeClock()
+    registry = SessionRegistry(clock)
+    registry.claim("s1", "w1", ttl=10)
+    registry.claim("s2", "w1", ttl=30)
+    registry.claim("s3", "w2", ttl=30)
+
+    registry.release("s3", "w1")
+    assert registry.owner("s3") == "w2"
+
+    clock.now = 20.0
+    assert registry.owner("s1") is None
+    assert registry.owner("s2") == "w1"
+
+    assert registry.release_worker("w1") == 1
+    assert registry.owner("s2") is None
+    assert len(registry) == 1
+
+
+def test_update_reaches_owning_worker():
+    """An update published by one worker is delivered to the worker owning the session; broadcasts to all others"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bus.sock")
+        broker = Broker(path)
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run_broker():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(broker.start())
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run_broker, daemon=True).start()
+        assert started.wait(5)
+
+        received = queue.SimpleQueue()
+        broadcasts = queue.SimpleQueue()
+        owner = UnixBusClient(path, "w1", received.put, lambda: ["session-1"], owner_ttl=30,
+                              on_broadcast=lambda *broadcast: broadcasts.put(broadcast))
+        other = UnixBusClient(path, "w2", lambda update: None, lambda: [], owner_ttl=30,
+                              on_broadcast=lambda *broadcast: broadcasts.put(("sender", broadcast)))
+        owner.start()
+        other.start()
+        try:
+            assert wait_for(lambda: broker.registry.owner("session-1") == "w1" and other.connected)
+
+            assert other.publish({"sessionID": "session-1", "type": "info", "content": "Hello"})
+            assert received.get(timeout=5)["content"] == "Hello"
+
+            # Updates for sessions nobody owns are dropped by the broker
+            assert other.publish({"sessionID": "session-2", "type": "info"})
+            assert wait_for(lambda: broker.stats["no_owner"] == 1)
+
+            # A broadcast reaches every other worker, not the sender
+            assert other.broadcast({"type": "system-alert", "content": "Maintenance"}, None, ["admin"])
+            assert broadcasts.get(timeout=5) == ({"type": "system-alert", "content": "Maintenance"}, None, ["admin"])
+            assert wait_for(lambda: broker.stats["broadcast"] == 1)
+
+            # A worker that goes away loses its sessions
+            owner.stop()
+            assert wait_for(lambda: broker.registry.owner("session-1") is None)
+        finally:
+            owner.stop()
+            other.stop()
+            asyncio.run_coroutine_threadsafe(broker.close(), loop).result(5)
+            loop.call_soon_threadsafe(loop.stop)
+
+
+def test_publish_does_not_block_on_a_stalled_broker():
+    """Frames are written by the sender thread, so a broker that stops reading cannot stall the caller"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bus.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        client = UnixBusClient(path, "w1", lambda update: None, lambda: [], owner_ttl=30)
+        client.start()
+        try:
+            conn, _ = server.accept()
+            assert wait_for(lambda: client.connected)
+            # Far more than the socket buffers hold; nothing is read on the other end
+            start = time.monotonic()
+            for _ in range(200):
+                assert client.publish({"sessionID": "s1", "type": "info", "content": "x" * 65536})
+            assert time.monotonic() - start < 1.0
+        finally:
+            client.stop()
+            conn.close()
+            server.close()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "status bus")
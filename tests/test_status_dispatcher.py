@@ -0,0 +1,181 @@
+"""
+Test Status Dispatcher
+
+Checks how status updates are rendered in a chat session: progress steps are
+updated in place and throttled instead of sending a message per update, and a
+session whose websocket dropped gets its held updates, in order, when it comes
+back.
+"""
+
+import asyncio
+
+from helpers import chat_context, run_tests
+
+import status_dispatcher
+import status_scheduler
+import status_webhook_integration
+
+
+def test_progress_updates_one_element_in_place():
+    """Repeated progress for a title updates one element; other titles get their own"""
+
+    async def scenario():
+        emitter = chat_context("s1")
+        for progress in (10, 20, 30):
+            await status_dispatcher.render_status_update(
+                {"type": "progress", "title": "Indexing", "content": f"{progress}%", "progress": progress}
+            )
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Upload", "progress": 5})
+
+        # One message per step; 20% and 30% are coalesced into one later update
+        assert len(emitter.sent("send_step")) == 2
+        assert [e["props"]["progress"] for e in emitter.sent("send_element")] == [10, 5]
+
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Indexing", "progress": 100})
+        elements = emitter.sent("send_element")
+        assert len(emitter.sent("send_step")) == 2
+        assert elements[-1]["props"]["progress"] == 100
+        assert elements[-1]["id"] == elements[0]["id"]
+
+        # A finished step starts over with a new message
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Indexing", "progress": 0})
+        assert len(emitter.sent("send_step")) == 3
+        status_dispatcher.drop_progress("s1")
+        assert not status_dispatcher._progress_reporters
+
+    asyncio.run(scenario())
+
+
+def test_coalesced_progress_is_flushed():
+    """A throttled update is sent once the interval has passed"""
+
+    async def scenario():
+        emitter = chat_context("s2")
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Crawl", "progress": 1})
+        reporter = status_dispatcher._progress_reporters[("s2", "Crawl")]
+        reporter.min_interval = 0.05
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Crawl", "progress": 40})
+        await status_dispatcher.render_status_update({"type": "progress", "title": "Crawl", "progress": 60})
+        await asyncio.sleep(0.1)
+
+        assert [e["props"]["progress"] for e in emitter.sent("send_element")] == [1, 60]
+        status_dispatcher.drop_progress("s2")
+
+    asyncio.run(scenario())
+
+
+def info(session_id, content):
+    return {"sessionID": session_id, "type": "info", "content": content}
+
+
+def shown(emitter):
+    return [e["props"]["message"] for e in emitter.sent("send_element")]
+
+
+def test_restored_session_gets_held_updates():
+    """A reconnect that Chainlit restores without a hook resumes delivery, held updates first"""
+
+    async def scenario():
+        status_dispatcher.SWEEP_INTERVAL = 0.01
+        emitter = chat_context("ws-restore", websocket=True)
+        session = emitter.session
+        status_dispatcher.register_current_session("app-restore")
+        try:
+            status_dispatcher.unregister_session("app-restore")
+            assert not await status_dispatcher.deliver(info("app-restore", "while away"))
+
+            session.restore(new_socket_id="ws-restore-socket-2")
+            await asyncio.sleep(0.1)
+            assert "app-restore" in status_webhook_integration.SESSIONS
+            assert await status_dispatcher.deliver(info("app-restore", "live"))
+            assert shown(emitter) == ["while away", "live"]
+        finally:
+            status_webhook_integration.unregister_session("app-restore")
+            await session.delete()
+
+    asyncio.run(scenario())
+
+
+def test_live_updates_wait_for_the_flush():
+    """An update arriving while held updates are rendered is shown after them"""
+
+    async def scenario():
+        emitter = chat_context("ws-order", websocket=True)
+        session = emitter.session
+        record = emitter.send_element
+
+        async def slow_send(element_dict):
+            await asyncio.sleep(0.01)
+            await record(element_dict)
+
+        emitter.send_element = slow_send
+        status_dispatcher.register_current_session("app-order")
+        try:
+            status_dispatcher.unregister_session("app-order")
+            for content in ("a", "b", "c"):
+                await status_dispatcher.deliver(info("app-order", content))
+
+            resume = asyncio.create_task(status_dispatcher.resume_session("app-order"))
+            await asyncio.sleep(0.015)
+            assert not await status_dispatcher.deliver(info("app-order", "live"))
+            assert await resume == 4
+            assert shown(emitter) == ["a", "b", "c", "live"]
+            assert "app-order" in status_webhook_integration.SESSIONS
+        finally:
+            status_webhook_integration.unregister_session("app-order")
+            await session.delete()
+
+    asyncio.run(scenario())
+
+
+def test_sweep_expires_held_updates():
+    """Held updates expire without further traffic; a deleted Chainlit session is forgotten"""
+
+    async def scenario():
+        status_dispatcher.SWEEP_INTERVAL = 0.01
+        ttl = status_dispatcher.PENDING.ttl
+        status_dispatcher.PENDING.ttl = 0.05
+        emitter = chat_context("ws-expire", websocket=True)
+        try:
+            status_dispatcher.register_current_session("app-expire")
+            status_dispatcher.unregister_session("app-expire")
+            await status_dispatcher.deliver(info("app-expire", "lost"))
+            await emitter.session.delete()
+
+            await asyncio.sleep(0.2)
+            assert "app-expire" not in status_dispatcher.PENDING
+            assert "app-expire" not in status_dispatcher._detached
+        finally:
+            status_dispatcher.PENDING.ttl = ttl
+
+    asyncio.run(scenario())
+
+
+def test_ended_session_cancels_its_recurring_updates():
+    """A recurring update stops when its session's held updates expire"""
+
+    async def scenario():
+        status_dispatcher.SWEEP_INTERVAL = 0.01
+        ttl = status_dispatcher.PENDING.ttl
+        status_dispatcher.PENDING.ttl = 0.05
+        scheduler = status_scheduler.SCHEDULER = status_scheduler.StatusScheduler(lambda update: None)
+        emitter = chat_context("ws-timers", websocket=True)
+        try:
+            status_dispatcher.register_current_session("app-timers")
+            scheduler.schedule({"sessionID": "app-timers", "type": "info"}, 60, every=60)
+            scheduler.schedule({"sessionID": "app-other", "type": "info"}, 60, every=60)
+
+            status_dispatcher.unregister_session("app-timers")
+            await emitter.session.delete()
+            await asyncio.sleep(0.2)
+            assert "app-timers" not in status_dispatcher.PENDING
+            assert len(scheduler) == 1 and "app-timers" not in scheduler._sessions
+        finally:
+            status_dispatcher.PENDING.ttl = ttl
+            status_scheduler.SCHEDULER = None
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "status dispatcher")
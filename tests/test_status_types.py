@@ -0,0 +1,79 @@
+"""
+Test Status Types
+
+Checks that /status accepts the type spellings in-repo clients send and shows
+unknown types as info instead of rejecting them, and that task lists and
+animated progress are rendered.
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from helpers import chat_context, run_tests
+
+import metrics
+import status_dispatcher
+import status_webhook_integration
+from status_webhook_integration import normalize_status_type
+
+
+def fallback_count() -> float:
+    return float(metrics.STATUS_TYPE_FALLBACK.render().splitlines()[-1].split()[-1])
+
+
+def test_types_are_normalized():
+    """Underscores become dashes; unknown types fall back to info and are counted"""
+    fallbacks = fallback_count()
+    assert normalize_status_type("system_alert") == "system-alert"
+    assert normalize_status_type("Task_List") == "task-list"
+    assert normalize_status_type("animated-progress") == "animated-progress"
+    assert fallback_count() == fallbacks
+
+    assert normalize_status_type("hologram") == "info"
+    assert normalize_status_type(None) == "info"
+    assert fallback_count() == fallbacks + 2
+
+
+def test_status_accepts_client_types():
+    """Types used by the in-repo clients are queued, not rejected"""
+    client = TestClient(status_webhook_integration.app)
+    status_webhook_integration.clear_queue()
+    try:
+        for sent, queued in (("important_alert", "important-alert"), ("task_list", "task-list"),
+                             ("animated_progress", "animated-progress"), ("hologram", "info")):
+            response = client.post("/status", json={"type": sent, "title": "T", "content": "c"})
+            assert response.status_code == 200, response.text
+            assert status_webhook_integration.get_next_status_update()["type"] == queued
+    finally:
+        status_webhook_integration.clear_queue()
+
+
+def test_task_list_and_animated_progress_render():
+    """A task list becomes a Chainlit task list; animated progress runs beside the dispatcher"""
+
+    async def scenario():
+        emitter = chat_context()
+        await status_dispatcher.render_status_update({
+            "type": "task-list",
+            "title": "Pipeline",
+            "tasks": [{"name": "Fetch", "status": "completed"}, {"name": "Parse", "status": "running"},
+                      {"name": "Store", "status": "waiting"}]
+        })
+        tasklist = emitter.sent("send_element")[-1]
+        assert tasklist["type"] == "tasklist"
+
+        await status_dispatcher.render_status_update(
+            {"type": "animated-progress", "title": "Warmup", "content": "", "steps": ["a", "b"], "delay": 0.01}
+        )
+        # Returns before the animation has finished
+        assert status_dispatcher._animations
+        await asyncio.gather(*status_dispatcher._animations)
+        progress = [e["props"]["progress"] for e in emitter.sent("send_element") if e["name"] == "AnimatedProgress"]
+        assert progress[-1] == 100
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "status types")
@@ -0,0 +1,101 @@
+"""
+Test Streaming n8n Requests
+
+Checks that streamed n8n requests go through the same circuit breaker and
+latency/error metrics as buffered ones.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from helpers import run_tests
+
+import config
+# Keep test runs out of the application log
+config.LOG_FILE = ""
+
+import app
+import health
+import metrics
+
+PAYLOAD = {"provider": "stream-test", "model": "m1", "chatInput": "hi"}
+
+
+class N8nHandler(BaseHTTPRequestHandler):
+    status = 200
+    chunks = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for chunk in self.chunks:
+            self.wfile.write((json.dumps(chunk) + "\n").encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def stream(loop, server, status, chunks):
+    N8nHandler.status = status
+    N8nHandler.chunks = chunks
+    config.N8N_WEBHOOK_URL = f"http://127.0.0.1:{server.server_port}/webhook"
+
+    async def collect():
+        return [token async for token in app.stream_n8n_request(dict(PAYLOAD))]
+
+    # One loop for the whole test: a reader thread may still hand its end
+    # marker to the loop after the caller gave up on an error
+    return loop.run_until_complete(collect())
+
+
+def errors(kind):
+    return metrics.N8N_REQUEST_ERRORS.labels("stream-test", "m1", kind).value
+
+
+def test_stream_uses_breaker_and_metrics():
+    """Server errors and n8n error chunks are counted; an open circuit fails fast"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), N8nHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_url, original_breaker = config.N8N_WEBHOOK_URL, health.N8N_BREAKER
+    health.N8N_BREAKER = health.CircuitBreaker("n8n-test", failure_threshold=2, reset_timeout=60)
+    loop = asyncio.new_event_loop()
+    try:
+        assert stream(loop, server, 200, [{"type": "item", "content": "Hel"}, {"type": "item", "content": "lo"}]) == ["Hel", "lo"]
+        assert health.N8N_BREAKER.failures == 0
+
+        try:
+            stream(loop, server, 200, [{"type": "error", "content": "workflow failed"}])
+            assert False, "Expected the n8n error to be raised"
+        except RuntimeError:
+            pass
+        assert errors("n8n_error") == 1
+
+        for _ in range(2):
+            try:
+                stream(loop, server, 502, [])
+                assert False, "Expected the server error to be raised"
+            except RuntimeError:
+                pass
+        assert errors("http") == 2
+        assert health.N8N_BREAKER.state == health.CircuitBreaker.OPEN
+
+        try:
+            stream(loop, server, 200, [{"type": "item", "content": "unreachable"}])
+            assert False, "Expected the open circuit to fail fast"
+        except RuntimeError:
+            pass
+        assert errors("circuit_open") == 1
+        assert "stream-test" in metrics.N8N_REQUEST_LATENCY.render()
+    finally:
+        config.N8N_WEBHOOK_URL, health.N8N_BREAKER = original_url, original_breaker
+        server.shutdown()
+        server.server_close()
+        loop.close()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "streaming n8n")
@@ -0,0 +1,117 @@
+"""
+Test Timing Wheel
+
+Checks timers across wheel levels, recurring timers and cancellation, and the
+parsing of scheduled status updates.
+"""
+
+import random
+
+from helpers import FakeClock, run_tests
+
+from timing_wheel import TimingWheel
+from status_scheduler import StatusScheduler, ScheduleError, SchedulerFull, parse_schedule
+
+
+def test_timers_fire_on_time_across_levels():
+    """Timers in every level fire in the tick they are due, in order"""
+    clock = FakeClock()
+    wheel = TimingWheel(tick=1.0, slots=8, levels=3, clock=clock)
+    delays = random.Random(7).sample(range(1, 500), 100)
+    for delay in delays:
+        wheel.schedule(delay, delay)
+
+    fired = []
+    for second in range(1, 512):
+        clock.now = float(second)
+        for timer in wheel.advance():
+            assert timer.item == second
+            fired.append(timer.item)
+    assert fired == sorted(delays)
+    assert len(wheel) == 0
+
+
+def test_recurring_and_cancel():
+    """Recurring timers repeat `count` times; cancelled timers never fire"""
+    clock = FakeClock()
+    wheel = TimingWheel(tick=1.0, slots=8, levels=2, clock=clock)
+    poll = wheel.schedule(30, "poll", interval=30, count=3)
+    reminder = wheel.schedule(60, "reminder")
+    assert wheel.cancel(reminder)
+    assert not wheel.cancel(reminder)
+
+    fired = []
+    for second in range(1, 200):
+        clock.now = float(second)
+        fired.extend((second, timer.item) for timer in wheel.advance())
+    assert fired == [(30, "poll"), (60, "poll"), (90, "poll")]
+    assert poll not in wheel
+
+
+def test_delay_out_of_range():
+    """Delays beyond the wheel's range are rejected"""
+    wheel = TimingWheel(tick=1.0, slots=4, levels=2, clock=FakeClock())
+    try:
+        wheel.schedule(100, "too late")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_parse_schedule():
+    """Scheduling fields are taken out of the update and validated"""
+    assert parse_schedule({"type": "info"}) is None
+
+    update = {"type": "info", "deliver_at": 1060, "content": "Stand-up"}
+    assert parse_schedule(update, now=1000) == (60, None, None)
+    assert update == {"type": "info", "content": "Stand-up"}
+
+    assert parse_schedule({"deliver_at": "1970-01-01T00:10:00Z"}, now=0) == (600, None, None)
+    assert parse_schedule({"every": 30, "count": 2}) == (30, 30.0, 2)
+
+    for bad in ({"every": 0.1}, {"count": 2}, {"every": 30, "count": 0}, {"deliver_at": "tomorrow"}):
+        try:
+            parse_schedule(bad)
+            assert False, f"Expected ScheduleError for {bad}"
+        except ScheduleError:
+            pass
+
+
+def test_scheduler_delivers_copies_and_limits():
+    """Due updates are delivered as copies; the number of pending timers is capped"""
+    clock = FakeClock()
+    delivered = []
+    scheduler = StatusScheduler(delivered.append, tick=1.0, max_pending=2, clock=clock)
+    update = {"type": "info", "content": "Check the inbox"}
+    scheduler.schedule(update, 10, every=10, count=2)
+    scheduler.schedule({"type": "info"}, 5)
+    try:
+        scheduler.schedule({"type": "info"}, 5)
+        assert False, "Expected SchedulerFull"
+    except SchedulerFull:
+        pass
+
+    clock.now = 25.0
+    assert scheduler.run_due() == 3
+    assert delivered[1] == update and delivered[1] is not update
+    assert len(scheduler) == 0
+
+
+def test_session_timers_are_cancelled_together():
+    """cancel_session drops a session's timers only; finished timers are not tracked"""
+    clock = FakeClock()
+    scheduler = StatusScheduler(lambda update: None, tick=1.0, clock=clock)
+    scheduler.schedule({"sessionID": "s1", "type": "info"}, 10, every=10)
+    scheduler.schedule({"sessionID": "s1", "type": "info"}, 5)
+    scheduler.schedule({"sessionID": "s2", "type": "info"}, 10, every=10)
+
+    clock.now = 5.0
+    scheduler.run_due()
+    assert scheduler._sessions["s1"] and len(scheduler._sessions["s1"]) == 1
+    assert scheduler.cancel_session("s1") == 1
+    assert scheduler.cancel_session("s1") == 0
+    assert len(scheduler) == 1 and "s2" in scheduler._sessions
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "timing wheel")
@@ -0,0 +1,81 @@
+"""
+Test Toast Limiter
+
+Checks the per-session toast rate limiting, dedupe and aggregation logic.
+"""
+
+import asyncio
+
+import chainlit as cl
+
+from helpers import FakeClock, chat_context, run_tests
+
+import status_updates
+from toast_limiter import ToastLimiter, SEND, SUPPRESS, DROP, format_aggregate
+
+
+def test_repeats_are_aggregated():
+    """Identical toasts inside the window are folded into one aggregate"""
+    clock = FakeClock()
+    limiter = ToastLimiter({"info": {"rate": 1.0, "burst": 3, "dedupe_window": 5.0}}, clock=clock)
+
+    assert limiter.admit("Email sent") == SEND
+    for _ in range(6):
+        assert limiter.admit("Email sent") == SUPPRESS
+    assert limiter.pop_aggregates() == []
+
+    clock.now = 5.0
+    assert limiter.pop_aggregates() == [("info", "Email sent", 7)]
+    assert format_aggregate("Email sent", 7) == "Email sent ×7"
+
+
+def test_token_bucket_per_type():
+    """Distinct toasts are rate limited by their type's bucket"""
+    clock = FakeClock()
+    limiter = ToastLimiter({
+        "info": {"rate": 1.0, "burst": 2, "dedupe_window": 1.0},
+        "error": {"rate": 1.0, "burst": 1, "dedupe_window": 1.0}
+    }, clock=clock)
+
+    assert limiter.admit("a") == SEND
+    assert limiter.admit("b") == SEND
+    assert limiter.admit("c") == DROP
+    # Other types have their own bucket
+    assert limiter.admit("boom", "error") == SEND
+
+    clock.now = 1.0
+    assert limiter.admit("c") == SEND
+
+
+def test_expired_window_is_not_lost():
+    """An aggregate survives a new toast arriving before the flush ran"""
+    clock = FakeClock()
+    limiter = ToastLimiter(clock=clock)
+
+    limiter.admit("Saved")
+    limiter.admit("Saved")
+    clock.now = 10.0
+    assert limiter.admit("Saved") == SEND
+    assert limiter.pop_aggregates() == [("info", "Saved", 2)]
+
+
+def test_aggregate_flush_is_kept_until_sent():
+    """The flush task of a folded toast is held until it has sent the aggregate"""
+
+    async def scenario():
+        emitter = chat_context("toast-flush")
+        limits = {"info": {"rate": 10.0, "burst": 10, "dedupe_window": 0.05}}
+        cl.user_session.set("toast_limiter", ToastLimiter(limits))
+        for _ in range(3):
+            await status_updates.show_toast("Saved")
+        assert len(status_updates._toast_flushes) == 1
+        await asyncio.gather(*status_updates._toast_flushes)
+        await asyncio.sleep(0)
+        assert not status_updates._toast_flushes
+        return [toast["message"] for toast in emitter.sent("send_toast")]
+
+    assert asyncio.run(scenario()) == ["Saved", format_aggregate("Saved", 3)]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "toast limiter")
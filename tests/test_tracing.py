@@ -0,0 +1,49 @@
+"""
+Test Tracing
+
+Checks that spans are written only when tracing is configured and that the
+trace file is rotated at its size limit with a bounded number of backups.
+"""
+
+import json
+import os
+import tempfile
+
+from helpers import run_tests
+
+import tracing
+
+
+def test_disabled_tracing_writes_nothing():
+    """Without an exporter spans are dropped"""
+    tracing.configure(None)
+    assert not tracing.enabled()
+    with tracing.span("n8n.call"):
+        pass
+    tracing.record_span("status.render", "trace-1", 0.0, 0.01)
+
+
+def test_trace_file_rotates():
+    """The file is rotated once it reaches max_bytes; only backup_count old files stay"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "traces.ndjson")
+        exporter = tracing.FileSpanExporter(path, max_bytes=500, backup_count=2)
+        for i in range(60):
+            exporter.export(tracing.Span("stage", trace_id=f"trace-{i:02d}"))
+        exporter.shutdown()
+
+        files = sorted(os.listdir(directory))
+        assert files == ["traces.ndjson", "traces.ndjson.1", "traces.ndjson.2"]
+        for name in files[1:]:
+            assert os.path.getsize(os.path.join(directory, name)) >= 500
+        # The kept files hold the newest spans, oldest file first
+        spans = []
+        for name in ("traces.ndjson.2", "traces.ndjson.1", "traces.ndjson"):
+            with open(os.path.join(directory, name)) as f:
+                spans.extend(json.loads(line)["trace_id"] for line in f)
+        assert spans[-1] == "trace-59"
+        assert spans == sorted(spans)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "tracing")
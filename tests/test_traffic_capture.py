@@ -0,0 +1,75 @@
+"""
+Test Traffic Capture
+
+Checks sanitizing, rotation and reading back of captured traffic, and that
+/status records each body with its real outcome.
+"""
+
+import tempfile
+
+from fastapi.testclient import TestClient
+
+from helpers import run_tests
+
+import status_webhook_integration
+import traffic_capture
+from traffic_capture import TrafficRecorder, capture_files, read_records, sanitize
+
+
+def test_sanitize_keeps_shape():
+    """Sensitive text is replaced by same-length filler, everything else is kept"""
+    body = {
+        "type": "progress",
+        "content": "Secret plan",
+        "progress": 40,
+        "sessionID": "abc",
+        "output": {"items": ["hello", 3]}
+    }
+    clean = sanitize(body, ["content", "output"])
+    assert clean == {
+        "type": "progress",
+        "content": "xxxxxxxxxxx",
+        "progress": 40,
+        "sessionID": "abc",
+        "output": {"items": ["xxxxx", 3]}
+    }
+    # The original is untouched
+    assert body["content"] == "Secret plan"
+
+
+def test_recorder_rotates_and_reads_back():
+    """Records are written as gzip NDJSON, rotated by size and bounded in number"""
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = TrafficRecorder(directory, max_bytes=500, max_files=3)
+        for i in range(50):
+            recorder.record("status", body={"type": "info", "content": f"update {i}"}, accepted=True)
+        recorder.shutdown()
+
+        files = capture_files(directory)
+        assert len(files) <= 3
+        records = list(read_records(files))
+        assert records, "no records read back"
+        assert all(record["kind"] == "status" for record in records)
+        assert records[-1]["body"]["content"] == "x" * len("update 49")
+
+
+def test_status_records_the_outcome():
+    """Rejected schedules are captured as not accepted, with their scheduling fields"""
+    recorded = []
+    original = traffic_capture.record_status
+    traffic_capture.record_status = lambda body, accepted: recorded.append((body, accepted))
+    client = TestClient(status_webhook_integration.app)
+    try:
+        assert client.post("/status", json={"type": "info", "every": "often"}).status_code == 400
+        assert client.post("/status", json={"type": "info", "content": "now"}).status_code == 200
+    finally:
+        traffic_capture.record_status = original
+        status_webhook_integration.clear_queue()
+    assert recorded == [
+        ({"type": "info", "every": "often"}, False),
+        ({"type": "info", "content": "now"}, True)
+    ]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Traffic capture")
@@ -0,0 +1,157 @@
+"""
+Timing Wheel Module
+
+A hierarchical timing wheel for large numbers of timers (scheduled status
+updates, see `POST /status` with `deliver_at` or `every`).
+
+Level 0 has `slots` slots of one `tick` each; every higher level has `slots`
+slots each spanning a full turn of the level below. A timer goes into the
+lowest level whose span covers its remaining time. Whenever a lower level
+completes a turn, the next slot of the level above is emptied and its timers
+move down. Inserting and cancelling a timer are O(1) (each slot is a dict),
+and advancing the wheel costs one step per tick plus one move per timer and
+level it passes through.
+"""
+
+import itertools
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Timer:
+    """A scheduled item. `interval` makes it recurring, `remaining` limits how often it fires."""
+
+    __slots__ = ("timer_id", "expires", "item", "interval", "remaining", "level", "slot")
+
+    def __init__(self, timer_id: int, expires: int, item: Any,
+                 interval: Optional[float] = None, remaining: Optional[int] = None):
+        self.timer_id = timer_id
+        # Absolute tick the timer fires at
+        self.expires = expires
+        self.item = item
+        self.interval = interval
+        self.remaining = remaining
+        self.level = 0
+        self.slot = 0
+
+
+class TimingWheel:
+    """Timers with O(1) insert and cancel, fired by `advance()`."""
+
+    def __init__(self, tick: float = 0.1, slots: int = 256, levels: int = 4,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the wheel.
+
+        Args:
+            tick: Resolution in seconds
+            slots: Slots per level
+            levels: Number of levels; the longest delay is tick * slots ** levels
+            clock: Monotonic time source
+        """
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self.wheels: List[List[Dict[int, Timer]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.timers: Dict[int, Timer] = {}
+        self.current = self._ticks(clock())
+        self.max_ticks = slots ** levels - 1
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def __contains__(self, timer_id: int) -> bool:
+        return timer_id in self.timers
+
+    def _ticks(self, now: float) -> int:
+        return int(now / self.tick)
+
+    def schedule(self, delay: float, item: Any, interval: Optional[float] = None,
+                 count: Optional[int] = None) -> int:
+        """
+        Schedule an item.
+
+        Args:
+            delay: Seconds until the item is due (0 or less: at the next tick)
+            item: Returned by advance() when due
+            interval: Seconds between repetitions of a recurring timer
+            count: How many times a recurring timer fires (None: until cancelled)
+
+        Returns:
+            The timer ID, for cancel()
+        """
+        if not self.timers:
+            # An idle wheel is not advanced; catch up before counting from the current tick
+            self.current = max(self.current, self._ticks(self.clock()))
+        ticks = max(1, math.ceil(delay / self.tick))
+        if ticks > self.max_ticks:
+            raise ValueError(f"Delay of {delay}s exceeds the wheel's range of {self.max_ticks * self.tick:.0f}s")
+        timer = Timer(next(self._ids), self.current + ticks, item, interval, count)
+        self.timers[timer.timer_id] = timer
+        self._insert(timer)
+        return timer.timer_id
+
+    def cancel(self, timer_id: int) -> bool:
+        """Cancel a timer. Returns False if it is unknown or has fired for the last time."""
+        timer = self.timers.pop(timer_id, None)
+        if timer is None:
+            return False
+        del self.wheels[timer.level][timer.slot][timer_id]
+        return True
+
+    def _insert(self, timer: Timer) -> None:
+        delta = timer.expires - self.current
+        if delta <= 0:
+            # Due now (moved down by a cascade in the tick it expires)
+            level, slot = 0, self.current % self.slots
+        else:
+            level = 0
+            span = self.slots
+            while delta >= span and level < self.levels - 1:
+                level += 1
+                span *= self.slots
+            slot = (timer.expires // (span // self.slots)) % self.slots
+        timer.level = level
+        timer.slot = slot
+        self.wheels[level][slot][timer.timer_id] = timer
+
+    def advance(self, now: Optional[float] = None) -> List[Timer]:
+        """
+        Move the wheel to `now` and return the timers that came due, in firing order.
+        Recurring timers are rescheduled before they are returned.
+        """
+        target = self._ticks(self.clock() if now is None else now)
+        if not self.timers:
+            # Nothing to move or fire on the way
+            self.current = max(self.current, target)
+            return []
+        fired: List[Timer] = []
+        while self.current < target:
+            self.current += 1
+            # Move the timers of higher levels whose turn starts now down, top level first
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self.current % span == 0:
+                    bucket = self.wheels[level][(self.current // span) % self.slots]
+                    timers = list(bucket.values())
+                    bucket.clear()
+                    for timer in timers:
+                        self._insert(timer)
+            bucket = self.wheels[0][self.current % self.slots]
+            if not bucket:
+                continue
+            timers = list(bucket.values())
+            bucket.clear()
+            for timer in timers:
+                fired.append(timer)
+                if timer.interval is not None and (timer.remaining is None or timer.remaining > 1):
+                    if timer.remaining is not None:
+                        timer.remaining -= 1
+                    timer.expires = self.current + max(1, math.ceil(timer.interval / self.tick))
+                    self._insert(timer)
+                else:
+                    del self.timers[timer.timer_id]
+        return fired
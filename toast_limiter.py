@@ -0,0 +1,145 @@
+"""
+Toast Limiter Module
+
+Per-session rate limiting, deduplication and aggregation of toast notifications.
+Each toast type gets its own token bucket, and identical toasts arriving within
+the dedupe window are folded into a single "message ×N" toast instead of being
+sent to the browser one by one.
+"""
+
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+# Decisions returned by ToastLimiter.admit()
+SEND = "send"
+SUPPRESS = "suppress"
+DROP = "drop"
+
+# Used for toast types that have no explicit configuration
+DEFAULT_LIMIT = {"rate": 1.0, "burst": 3, "dedupe_window": 5.0}
+
+# Expired windows are pruned once this many are open
+MAX_OPEN_WINDOWS = 64
+
+
+class TokenBucket:
+    """A classic token bucket: `rate` tokens per second, up to `burst` tokens."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = now
+
+    def take(self, now: float) -> bool:
+        """Take one token if available. Returns True on success."""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class ToastLimiter:
+    """
+    Decide which toasts of one session actually cross the wire.
+
+    The first occurrence of a toast is sent if its type's bucket has a token.
+    Repeats of the same (type, message) inside the dedupe window are suppressed
+    and counted; once the window closes, `pop_aggregates()` returns them so the
+    caller can emit one summary toast.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None, clock=time.monotonic):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits: Per toast type settings with "rate", "burst" and "dedupe_window"
+            clock: Monotonic clock function (overridable for tests)
+        """
+        self.limits = limits or {}
+        self.clock = clock
+        self.buckets: Dict[str, TokenBucket] = {}
+        # (type, message) -> [window_end, repeat_count]
+        self.windows: Dict[Tuple[str, str], List[float]] = {}
+        # Aggregates whose window closed before pop_aggregates() ran
+        self.closed: List[Tuple[str, str, int]] = []
+        self.dropped = 0
+
+    def _limit(self, type: str) -> Dict[str, Any]:
+        limit = dict(DEFAULT_LIMIT)
+        limit.update(self.limits.get(type, {}))
+        return limit
+
+    def admit(self, message: str, type: str = "info") -> str:
+        """
+        Register a toast and decide what to do with it.
+
+        Args:
+            message: The toast message
+            type: The toast type
+
+        Returns:
+            SEND, SUPPRESS (folded into an aggregate) or DROP (rate limited)
+        """
+        now = self.clock()
+        key = (type, message)
+        window = self.windows.get(key)
+        if window is not None:
+            if now < window[0]:
+                window[1] += 1
+                return SUPPRESS
+            del self.windows[key]
+            if window[1]:
+                self.closed.append((type, message, window[1] + 1))
+        if len(self.windows) > MAX_OPEN_WINDOWS:
+            self._prune(now)
+
+        limit = self._limit(type)
+        bucket = self.buckets.get(type)
+        if bucket is None:
+            bucket = self.buckets[type] = TokenBucket(limit["rate"], limit["burst"], now)
+        if not bucket.take(now):
+            self.dropped += 1
+            return DROP
+
+        self.windows[key] = [now + limit["dedupe_window"], 0]
+        return SEND
+
+    def _prune(self, now: float) -> None:
+        """Forget expired windows that never saw a repeat."""
+        for key in [k for k, w in self.windows.items() if now >= w[0] and not w[1]]:
+            del self.windows[key]
+
+    def window_remaining(self, message: str, type: str = "info") -> float:
+        """Seconds left in the dedupe window of a toast (0 if none is open)."""
+        window = self.windows.get((type, message))
+        if window is None:
+            return 0.0
+        return max(0.0, window[0] - self.clock())
+
+    def pop_aggregates(self) -> List[Tuple[str, str, int]]:
+        """
+        Close expired dedupe windows.
+
+        Returns:
+            A list of (type, message, total_count) for windows that saw repeats
+        """
+        now = self.clock()
+        aggregates, self.closed = self.closed, []
+        for key in [k for k, w in self.windows.items() if now >= w[0]]:
+            _, repeats = self.windows.pop(key)
+            if repeats:
+                aggregates.append((key[0], key[1], repeats + 1))
+        return aggregates
+
+
+def format_aggregate(message: str, count: int) -> str:
+    """Format an aggregated toast message, e.g. "Email sent ×7"."""
+    return f"{message} ×{count}"
@@ -0,0 +1,236 @@
+"""
+Tracing Module
+
+Lightweight end-to-end tracing for chat turns. `on_message` mints a trace ID
+per turn and sends it to n8n as `traceID`; n8n echoes it on every `/status`
+webhook call so status update ingest, queue and render spans can be tied back
+to the turn that caused them.
+
+Spans are written as newline-delimited JSON to a local file by a background
+thread, so recording a span never blocks the event loop on file I/O. The file
+is rotated at a size limit and only a few rotated files are kept:
+
+    {"trace_id": "...", "span_id": "...", "parent_id": "...", "name": "n8n.call",
+     "start": 1710000000.123, "duration_ms": 812.4, "attributes": {...}}
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# The span new spans are parented to (the current turn or stage)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+# The active exporter; None disables tracing
+_exporter: Optional["FileSpanExporter"] = None
+
+
+class Span:
+    """A timed stage of a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "_start_mono", "duration", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self._start_mono = time.monotonic()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+
+    def end(self) -> None:
+        """Stop the span's clock and export it."""
+        if self.duration is None:
+            self.duration = time.monotonic() - self._start_mono
+            export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes
+        }
+
+
+class FileSpanExporter:
+    """Append spans to a size-rotated NDJSON file from a background thread."""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5):
+        """
+        Initialize the exporter.
+
+        Args:
+            path: The file spans are appended to
+            max_bytes: Size at which the file is rotated to `path.1` (0: never)
+            backup_count: Number of rotated files kept (`path.1` is the newest)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+
+    def _rotate(self) -> None:
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _write(self, f, record: Dict[str, Any]):
+        f.write(json.dumps(record) + "\n")
+        if self.max_bytes and f.tell() >= self.max_bytes:
+            f.close()
+            self._rotate()
+            f = open(self.path, "a", encoding="utf-8")
+        return f
+
+    def _run(self) -> None:
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f = self._write(f, record)
+                # Write everything already queued before flushing
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        return
+                    f = self._write(f, record)
+                f.flush()
+        except Exception as e:
+            logger.error(f"Span export stopped: {str(e)}")
+        finally:
+            f.close()
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def configure(path: Optional[str], max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5) -> None:
+    """Enable tracing to the given file, or disable it with None."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    _exporter = FileSpanExporter(path, max_bytes, backup_count) if path else None
+    if path:
+        logger.info(f"Tracing spans to {path}")
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def export(span: Span) -> None:
+    if _exporter is not None:
+        try:
+            _exporter.export(span)
+        except Exception as e:
+            logger.error(f"Error exporting span: {str(e)}")
+
+
+def new_trace_id() -> str:
+    """Create a new trace ID (32 hex characters)."""
+    return uuid.uuid4().hex
+
+
+def start_trace(name: str = "turn", trace_id: Optional[str] = None, **attributes) -> Span:
+    """
+    Start the root span of a trace and make it the current span.
+
+    Args:
+        name: The root span name
+        trace_id: An existing trace ID to use (a new one is minted otherwise)
+        **attributes: Span attributes
+
+    Returns:
+        The root span; pass it to end_trace() when the turn is done
+    """
+    root = Span(name, trace_id or new_trace_id(), **attributes)
+    _current_span.set(root)
+    return root
+
+
+def end_trace(root: Optional[Span]) -> None:
+    """End a root span started with start_trace()."""
+    if root is not None:
+        root.end()
+        if _current_span.get() is root:
+            _current_span.set(None)
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage of the current trace. Does nothing outside a trace.
+
+    Usage:
+        with tracing.span("n8n.call", provider=provider):
+            ...
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace_id, parent.span_id, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def record_span(name: str, trace_id: str, start: float, duration: float, **attributes) -> None:
+    """
+    Export a span measured elsewhere (e.g. across threads).
+
+    Args:
+        name: The span name
+        trace_id: The trace the span belongs to
+        start: Wall-clock start time (seconds since the epoch)
+        duration: Duration in seconds
+        **attributes: Span attributes
+    """
+    if _exporter is None or not trace_id:
+        return
+    recorded = Span(name, trace_id, **attributes)
+    recorded.start = start
+    recorded.duration = duration
+    export(recorded)
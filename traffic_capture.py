@@ -0,0 +1,201 @@
+"""
+Traffic Capture Module
+
+Opt-in recorder for real traffic: `/status` webhook bodies and n8n
+request/response pairs are sanitized, timestamped and appended to gzip
+compressed NDJSON files by a background thread, so real traffic shapes can be
+replayed offline with scripts/replay_traffic.py.
+
+Each line is one record:
+
+    {"kind": "status", "ts": 1710000000.123, "body": {...}, "accepted": true}
+    {"kind": "n8n", "ts": 1710000000.456, "duration_ms": 812.4, "status_code": 200,
+     "request": {...}, "response": {...}}
+
+Sanitizing replaces the text of sensitive fields (chat input, answers, status
+content, credentials) with same-length filler, so sizes survive but content
+does not. Files rotate at a size limit and only the newest files are kept.
+"""
+
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields whose text values are replaced by same-length filler
+DEFAULT_REDACT_FIELDS = (
+    "chatInput", "output", "content", "message", "title",
+    "password", "token", "api_key", "apiKey", "authorization", "email"
+)
+
+# The active recorder; None disables capture
+_recorder: Optional["TrafficRecorder"] = None
+
+
+def sanitize(value: Any, redact_fields: Iterable[str]) -> Any:
+    """
+    Return a copy of a JSON value with the text of sensitive fields redacted.
+
+    Strings are replaced by "x" of the same length; nested values of a
+    redacted field are sanitized recursively so their shape is kept.
+    """
+    redact = redact_fields if isinstance(redact_fields, (set, frozenset)) else frozenset(redact_fields)
+    return _sanitize(value, redact, False)
+
+
+def _sanitize(value: Any, redact: frozenset, redacting: bool) -> Any:
+    if isinstance(value, dict):
+        return {key: _sanitize(item, redact, redacting or key in redact) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_sanitize(item, redact, redacting) for item in value]
+    if redacting and isinstance(value, str):
+        return "x" * len(value)
+    return value
+
+
+class TrafficRecorder:
+    """Write capture records to rotating gzip NDJSON files from a background thread."""
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024, max_files: int = 10,
+                 redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS):
+        """
+        Initialize the recorder.
+
+        Args:
+            directory: Directory the capture files are written to
+            max_bytes: Uncompressed bytes written to a file before it is rotated
+            max_files: Number of capture files kept; the oldest are deleted
+            redact_fields: Fields whose text values are redacted
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.redact_fields = frozenset(redact_fields)
+        self.records_written = 0
+        self.records_dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=10000)
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+
+    def record(self, kind: str, **fields) -> None:
+        """Queue a record; sanitizing happens here so later mutations of the bodies do not leak in."""
+        record = {"kind": kind, "ts": time.time()}
+        record.update(sanitize(fields, self.redact_fields))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Capture must never slow down the traffic it records
+            self.records_dropped += 1
+
+    def _new_file(self):
+        self._sequence += 1
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}.ndjson.gz"
+        path = os.path.join(self.directory, name)
+        self._prune(keep=self.max_files - 1)
+        return path, gzip.open(path, "wt", encoding="utf-8")
+
+    def _prune(self, keep: int) -> None:
+        files = capture_files(self.directory)
+        for path in files[:max(0, len(files) - keep)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old capture file {path}: {str(e)}")
+
+    def _run(self) -> None:
+        path, f = self._new_file()
+        written = 0
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                line = json.dumps(record) + "\n"
+                f.write(line)
+                written += len(line)
+                self.records_written += 1
+                if self._queue.empty():
+                    f.flush()
+                if written >= self.max_bytes:
+                    f.close()
+                    path, f = self._new_file()
+                    written = 0
+        except Exception as e:
+            logger.error(f"Traffic capture stopped: {str(e)}")
+        finally:
+            f.close()
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+def configure(directory: Optional[str], max_bytes: int = 50 * 1024 * 1024, max_files: int = 10,
+              redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS) -> None:
+    """Enable capture to the given directory, or disable it with None."""
+    global _recorder
+    if _recorder is not None:
+        _recorder.shutdown()
+    _recorder = TrafficRecorder(directory, max_bytes, max_files, redact_fields) if directory else None
+    if directory:
+        logger.info(f"Capturing traffic to {directory}")
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def record_status(body: Dict[str, Any], accepted: bool) -> None:
+    """Record a /status webhook body."""
+    if _recorder is not None:
+        _recorder.record("status", body=body, accepted=accepted)
+
+
+def record_n8n(request: Dict[str, Any], response: Any, status_code: Optional[int], duration: float,
+               streamed: bool = False) -> None:
+    """Record an n8n request and its response (the list of chunks when streamed)."""
+    if _recorder is not None:
+        _recorder.record(
+            "n8n",
+            request=request,
+            response=response,
+            status_code=status_code,
+            duration_ms=round(duration * 1000, 3),
+            streamed=streamed
+        )
+
+
+def capture_files(directory: str) -> List[str]:
+    """Capture files in a directory, oldest first."""
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith("capture-") and name.endswith(".ndjson.gz")]
+    except FileNotFoundError:
+        return []
+    paths = [os.path.join(directory, name) for name in names]
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def read_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Read capture records from files (a truncated last line is skipped)."""
+    for path in paths:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping truncated record in {path}")
+        except EOFError:
+            # The file was still being written
+            logger.warning(f"Capture file {path} ends early")